@@ -15,8 +15,10 @@ This class has following LDAP operation methods.
 * unbind_
 * search_
 * paged_search_
+* lookup_many_
 * add_
 * modify_
+* sync_entry_
 * delete_
 * rename_
 * compare_
@@ -27,8 +29,10 @@ This class has following LDAP operation methods.
 * get_option_
 * abandon_
 * cancel
+* extended
 * result_
 * search_result
+* transaction_
 
 __init__
 --------
@@ -67,6 +71,74 @@ You can specify LDAPS uri. This initiate TLS processing on an LDAP session.
     >>> from libldap import LDAP
     >>> ld = LDAP('ldaps://localhost')
 
+If retry parameter is set, search(), compare() and whoami() survive server
+restart and failover. When LDAPServerDown or LDAPConnectError is raised,
+LDAP instance reconnects (to next URI), replays options, start_tls() and
+bind(), and retries the operation after jittered backoff.
+
+    >>> from libldap import LDAP, RetryPolicy
+    >>> ld = LDAP(['ldap://ldap1/', 'ldap://ldap2/'],
+    ...           retry=RetryPolicy(retries=3, backoff=0.1, deadline=2.0))
+
+TLS context can be shared by many LDAP instances with tls_context parameter.
+CA certificates are loaded once, and TLS sessions are resumed when libldap
+uses OpenSSL.
+
+    >>> from libldap import LDAP, TLSContext, LDAP_OPT_X_TLS_CACERTFILE
+    >>> ctx = TLSContext([(LDAP_OPT_X_TLS_CACERTFILE, '/etc/openldap/cacert.pem')])
+    >>> ld = LDAP('ldap://localhost', start_tls=True, tls_context=ctx)
+
+If metrics parameter is set, latency, entries and errors of each operation
+are recorded. One Metrics can be shared by many LDAP instances, and it is
+exported in Prometheus text format (see libldap.metrics).
+
+    >>> from libldap import LDAP, Metrics
+    >>> metrics = Metrics()
+    >>> ld = LDAP('ldap://localhost', metrics=metrics)
+    >>> text = metrics.prometheus()
+
+If tracer parameter is set, its hooks are called at start, send, first result,
+last result and error of each operation. TraceContext given to the hooks has
+base, scope, filter, message ID, entries, bytes and timings of ldap_search_ext()
+and ldap_result() taken in C (see libldap.tracing).
+
+    >>> from libldap import LDAP, Tracer
+    >>> class PrintTracer(Tracer):
+    ...     def last_result(self, context):
+    ...         print(context.operation, context.entries, context.timings)
+    ...
+    >>> ld = LDAP('ldap://localhost', tracer=PrintTracer())
+
+SlowLog is Tracer which records operations over latency or entry-count
+threshold with filter fingerprint, base, scope, attributes, controls and
+call site. top() returns the most expensive filter fingerprints
+(see libldap.slowlog).
+
+    >>> from libldap import LDAP, SlowLog
+    >>> slowlog = SlowLog(latency=0.5, entries=1000)
+    >>> ld = LDAP('ldap://localhost', tracer=slowlog)
+    >>> slowlog.top(10)
+
+If budget parameter is set, search results of the connection are limited by
+number of entries, bytes and values per attribute. The limits are checked in C
+while results are decoded, and search is abandoned with LDAPBudgetExceeded as
+soon as one of them is crossed. search() and paged_search() also receive budget
+parameter, which overrides it.
+
+    >>> from libldap import LDAP, ResultBudget
+    >>> ld = LDAP('ldap://localhost', budget=ResultBudget(max_entries=1000, max_bytes=10 * 1024 * 1024))
+
+LDAP.connect_many() establishes many connections concurrently, for example
+to warm up connection pool. TCP connections, StartTLS and BIND of all
+connections are in flight at the same time, and each connection has
+per-phase timings.
+
+    >>> from libldap import LDAP
+    >>> pool = LDAP.connect_many('ldap://localhost', 64,
+    ...                          'cn=master,dc=example,dc=com', 'secret', start_tls=True)
+    >>> pool[0].timings['bind']
+    0.00123
+
 bind
 -----
 
@@ -217,6 +289,27 @@ paged_search() is generator.
     >>> entries
     <generator object paged_search at 0x7f8d8714fa20>
 
+lookup_many
+-----------
+
+This is the method for resolving many values of one attribute into entries.
+Values are escaped and packed into '(|(uid=user1)(uid=user2)...)' filters of
+at most *chunk* values, and these searches are sent asynchronously with at most
+*concurrency* requests in flight.
+It returns dict-like object which maps each value to its entry. Values which are
+not found are listed in *missing* attribute.
+
+.. code-block:: python
+
+    >>> from libldap import LDAP
+    >>> ld = LDAP('ldap://localhost')
+    >>> ld.bind('cn=master,dc=example,dc=com', 'secret')
+    >>> found = ld.lookup_many('uid', ['user1', 'user2', 'nobody'], 'dc=example,dc=com')
+    >>> [(uid, entry.dn) for uid, entry in found.items()]
+    [('user1', 'uid=user1,ou=Users,dc=example,dc=com'), ('user2', 'uid=user2,ou=Users,dc=example,dc=com')]
+    >>> found.missing
+    ['nobody']
+
 add
 ---
 
@@ -301,6 +394,34 @@ Example.
     ...     ('description', ['Test Group One'], LDAP_MOD_REPLACE),
     ... ])
 
+sync_entry
+----------
+
+This is the method for making attributes of an entry have desired values.
+It compares desired values with current entry and sends modify request which
+has minimal LDAP_MOD_ADD, LDAP_MOD_DELETE and LDAP_MOD_REPLACE changes.
+If there is no difference, no request is sent. Attributes which are not in
+desired values are not changed.
+
+.. code-block:: python
+
+    >>> from libldap import LDAP
+    >>> ld = LDAP('ldap://localhost')
+    >>> ld.bind('cn=master,dc=example,dc=com', 'secret')
+    >>> ld.sync_entry('cn=group1,ou=Groups,dc=example,dc=com', {
+    ...     'memberUid': ['user1', 'user2'],
+    ...     'description': ['Test Group One'],
+    ... })
+    [('memberUid', [b'user2'], 0)]
+    >>> ld.sync_entry('cn=group1,ou=Groups,dc=example,dc=com', {
+    ...     'memberUid': ['user1', 'user2'],
+    ...     'description': ['Test Group One'],
+    ... })
+    []
+
+For bulk synchronization, fetch current entries by lookup_many() and pass them
+as *current* with async=True, so that modify requests are pipelined.
+
 delete
 -------
 
@@ -465,6 +586,24 @@ initiated by one of the LDAP asynchronous operation.
      'referrals': [],
      'return_code': 49}
 
+transaction
+-----------
+
+This is the method for LDAP transaction (RFC 5805). Update operations in with
+statement are sent asynchronously in the transaction, and they are committed
+at once when with statement ends. If exception is raised, the transaction is
+aborted.
+
+.. code-block:: python
+
+    >>> from libldap import LDAP, LDAP_MOD_ADD
+    >>> ld = LDAP('ldap://localhost')
+    >>> ld.bind('cn=master,dc=example,dc=com', 'secret')
+    >>> with ld.transaction() as txn:
+    ...     txn.modify('cn=group1,ou=Groups,dc=example,dc=com',
+    ...                [('memberUid', ['user3'], LDAP_MOD_ADD)])
+    ...     txn.delete('cn=group2,ou=Groups,dc=example,dc=com')
+
 LDAPControl
 ===========
 
@@ -482,8 +621,32 @@ For example:
     >>> ld.modify('cn=test,dc=example,dc=com',
     ...           [('pwdAccountLockedTime', [], LDAP_MOD_DELETE)], controls=c)
     >>>
+
+LDAP_CONTROL_PRE_READ and LDAP_CONTROL_POST_READ take attribute list separated
+by space or comma. add(), modify(), delete() and rename() return dict which has
+the entry before and after the operation, so no follow-up search is needed.
+
+.. code-block:: python
+
+    >>> from libldap import LDAP, LDAPControl, LDAP_CONTROL_POST_READ, LDAP_MOD_REPLACE
+    >>> c = LDAPControl()
+    >>> c.add_control(LDAP_CONTROL_POST_READ, b'entryCSN modifyTimestamp')
+    >>> ld = LDAP('ldap://localhost')
+    >>> ld.bind('cn=master,dc=example,dc=com', 'secret')
+    >>> result = ld.modify('cn=test,dc=example,dc=com',
+    ...                    [('description', ['test'], LDAP_MOD_REPLACE)], controls=c)
+    >>> result['post_read']['modifyTimestamp']
+    [b'20151012093211Z']
 """
 
 from .core import *
 from .constants import *
 from .exceptions import *
+from .filter import *
+from .store import *
+from .group import *
+from .ldif import *
+from .verifier import *
+from .metrics import *
+from .tracing import *
+from .slowlog import *
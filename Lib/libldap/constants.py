@@ -43,6 +43,12 @@ LDAP_CONTROL_X_SEARCH_OPTIONS = '1.2.840.113556.1.4.1340'
 LDAP_CONTROL_X_TREE_DELETE = '1.2.840.113556.1.4.805'
 LDAP_CONTROL_X_EXTENDED_DN = '1.2.840.113556.1.4.529'
 LDAP_CONTROL_VLVREQUEST = '2.16.840.1.113730.3.4.9'
+LDAP_CONTROL_TXN_SPEC = '1.3.6.1.1.21.2'
+
+# LDAP Extended Operations
+LDAP_EXOP_START_TLS = '1.3.6.1.4.1.1466.20037'
+LDAP_EXOP_TXN_START = '1.3.6.1.1.21.1'
+LDAP_EXOP_TXN_END = '1.3.6.1.1.21.3'
 
 # LDAP Options
 LDAP_OPT_API_INFO = 0x0000
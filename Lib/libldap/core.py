@@ -5,21 +5,68 @@
 This module provides LDAP core operations.
 """
 
+import inspect as _inspect
+import random
+import time
 from collections import OrderedDict as _OrderedDict
+from collections import deque as _deque
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from concurrent.futures import wait as _wait_futures
+from contextlib import contextmanager as _contextmanager
+from datetime import timedelta as _timedelta
+from functools import wraps as _wraps
 
 from _libldap import _LDAPError, _LDAPObject, _LDAPObjectControl
-from .constants import LDAP_CONTROL_PAGEDRESULTS, LDAP_OPT_REFERRALS
-from .exceptions import _generate_exception
+from .constants import (
+        LDAP_CONTROL_ASSERT,
+        LDAP_CONTROL_PAGEDRESULTS,
+        LDAP_CONTROL_TXN_SPEC,
+        LDAP_CONTROL_X_TREE_DELETE,
+        LDAP_EXOP_START_TLS,
+        LDAP_EXOP_TXN_END,
+        LDAP_EXOP_TXN_START,
+        LDAP_MOD_ADD,
+        LDAP_MOD_DELETE,
+        LDAP_MOD_REPLACE,
+        LDAP_OPT_CONNECT_ASYNC,
+        LDAP_OPT_NETWORK_TIMEOUT,
+        LDAP_OPT_REFERRALS,
+        LDAP_OPT_TIMEOUT,
+        LDAP_OPT_X_TLS_CTX,
+        LDAP_OPT_X_TLS_NEWCTX,
+        LDAP_SCOPE_BASE,
+        LDAP_SCOPE_SUB,
+)
+from .exceptions import (
+        LDAPAssertionFailed,
+        LDAPConnectError,
+        LDAPError,
+        LDAPNoSuchObject,
+        LDAPServerDown,
+        LDAPTimeout,
+        _generate_exception,
+)
+from .filter import Equal, Filter, Or
+from .tracing import TraceContext
 
 __all__ = (
     'LDAP',
     'LDAPControl',
+    'ResultBudget',
+    'RetryPolicy',
+    'TLSContext',
+    'Transaction',
 )
 
 LDAP_SUCCESS = 0x00
 LDAP_COMPARE_FALSE = 0x05
 LDAP_COMPARE_TRUE = 0x06
+LDAP_NO_SUCH_OBJECT = 0x20
 LDAP_ERROR = -1
+LDAP_MSG_ALL = 0x01
+LDAP_MSG_RECEIVED = 0x02
+_POLL_TIMEOUT = 0.000001
+_HANDSHAKE_WORKERS = 16  # Maximum number of concurrent TLS handshakes in connect_many()
 
 
 class _DictEntry(dict):
@@ -42,6 +89,447 @@ class _OrderedEntry(_OrderedDict):
         return '{%s}' % (content,)
 
 
+class _LookupResult(dict):
+    def __init__(self, *args, **kwargs):
+        self.missing = []
+        super().__init__(*args, **kwargs)
+
+
+def _lookup_key(value):
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value).decode('utf-8', 'replace')
+    return value.lower()
+
+
+def _entry(entry, ordered_attributes=False):
+    # Convert raw entry of result() into _DictEntry or _OrderedEntry
+    if ordered_attributes:
+        return _OrderedEntry(entry.pop('dn'), [(key, entry[key]) for key in entry['__order__']])
+    return _DictEntry(entry.pop('dn'), [(key, value) for key, value in entry.items() if key != '__order__'])
+
+
+def _search_entries(results, ordered_attributes=False):
+    # Convert results of search into entries, or raise LDAPError of its result
+    if results:
+        if results[-1]['return_code'] != LDAP_SUCCESS:
+            raise _generate_exception(**results[-1])
+    return [_entry(entry, ordered_attributes) for entry in results if '__order__' in entry]
+
+
+def _split_dn(dn):
+    # Split DN into list of RDN. Escaped ',' and quoted value are kept.
+    rdns = []
+    current = []
+    escaped = quoted = False
+    for c in dn:
+        if escaped:
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif c == '"':
+            quoted = not quoted
+        elif c in ',;' and not quoted:
+            rdns.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(c)
+    if current or rdns:
+        rdns.append(''.join(current).strip())
+    return rdns
+
+
+def _normalize_dn(dn):
+    # Return DN which is comparable case-insensitively
+    return ','.join(['+'.join(['='.join([x.strip() for x in ava.split('=', 1)])
+                               for ava in rdn.split('+')])
+                     for rdn in _split_dn(dn)]).casefold()
+
+
+def _parent_dn(ndn):
+    rdns = _split_dn(ndn)
+    return ','.join(rdns[1:])
+
+
+def _read_entries(result):
+    # Return pre_read/post_read entries of write operation result or None
+    entries = dict((key, result[key]) for key in ('pre_read', 'post_read') if key in result)
+    return entries or None
+
+
+def _ber_tlv(tag, value):
+    # Encode BER tag-length-value with definite length
+    length = len(value)
+    if length < 0x80:
+        return bytes([tag, length]) + value
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([tag, 0x80 | len(encoded)]) + encoded + value
+
+
+def _txn_end_value(txnid, commit):
+    # txnEndReq ::= SEQUENCE { commit BOOLEAN DEFAULT TRUE, identifier OCTET STRING }
+    content = b'' if commit else b'\x01\x01\x00'
+    return _ber_tlv(0x30, content + _ber_tlv(0x04, txnid))
+
+
+def _value_bytes(value):
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return bytes(value)
+
+
+def _diff_entry(current, desired):
+    # Return minimal modify changes which turn current into desired.
+    # Only attributes in desired are compared; values are compared exactly.
+    names = dict((key.lower(), key) for key in current)
+    if hasattr(desired, 'items'):
+        desired = desired.items()
+    changes = []
+    for attribute, values in desired:
+        if values is None:
+            values = []
+        elif isinstance(values, (str, bytes)):
+            values = [values]
+        wanted = [_value_bytes(x) for x in values]
+        key = names.get(attribute.lower())
+        existing = [_value_bytes(x) for x in current[key]] if key is not None else []
+        if not wanted:
+            if existing:
+                changes.append((attribute, [], LDAP_MOD_DELETE))
+            continue
+        if not existing:
+            changes.append((attribute, wanted, LDAP_MOD_ADD))
+            continue
+        wanted_set = set(wanted)
+        existing_set = set(existing)
+        added = [x for x in wanted if x not in existing_set]
+        removed = [x for x in existing if x not in wanted_set]
+        if not added and not removed:
+            continue
+        if len(added) + len(removed) < len(wanted):
+            # Deletion goes first, so that value which differs only in case
+            # is replaced without attributeOrValueExists
+            if removed:
+                changes.append((attribute, removed, LDAP_MOD_DELETE))
+            if added:
+                changes.append((attribute, added, LDAP_MOD_ADD))
+        else:
+            changes.append((attribute, wanted, LDAP_MOD_REPLACE))
+    return changes
+
+
+def _seconds(value):
+    # Convert timeout (int, float, timedelta or None) into float seconds
+    if value is None:
+        return 0.0
+    if isinstance(value, _timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class RetryPolicy(object):
+    """RetryPolicy is reconnect and retry policy of LDAP
+
+    When LDAPServerDown or LDAPConnectError is raised by idempotent
+    operations (search(), compare() and whoami()), LDAP instance reconnects,
+    replays options, start_tls() and bind(), and retries the operation after
+    jittered exponential backoff.
+
+    :param retries:
+        Maximum number of retries (the default is 3)
+    :param backoff:
+        Base seconds of backoff (the default is 0.1). Delay before n-th retry
+        is random value between 0 and min(max_backoff, backoff * 2 ** n).
+    :param max_backoff:
+        Maximum seconds of backoff (the default is 5.0)
+    :param deadline:
+        Seconds after which no more retry is done (the default is None,
+        which implies only retries limits)
+    :param next_uri:
+        Flag for reconnecting to next URI or not (the default is True).
+        This is effective when multiple URIs are given to LDAP.
+
+    :type retries:
+        int
+    :type backoff:
+        int or float
+    :type max_backoff:
+        int or float
+    :type deadline:
+        int, float or None
+    :type next_uri:
+        bool
+    """
+
+    def __init__(self, retries=3, backoff=0.1, max_backoff=5.0, deadline=None, next_uri=True):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.next_uri = next_uri
+
+    def delay(self, attempt):
+        """Seconds to wait before retry of attempt (0 origin)"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+
+class ResultBudget(object):
+    """ResultBudget limits size of search results
+
+    Limits are checked in C while result messages are decoded. Search
+    results with budget are received as they arrive instead of at once, so
+    that the search is abandoned and LDAPBudgetExceeded is raised as soon
+    as one of the limits is crossed, before the rest is buffered.
+
+    :param max_entries:
+        Maximum number of entries (the default is None, which implies unlimited)
+    :param max_bytes:
+        Maximum bytes of attribute names and values (the default is None,
+        which implies unlimited)
+    :param max_values:
+        Maximum number of values per attribute (the default is None, which
+        implies unlimited)
+
+    :type max_entries:
+        int or None
+    :type max_bytes:
+        int or None
+    :type max_values:
+        int or None
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, max_values=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_values = max_values
+
+    def _remaining(self):
+        # [entries, bytes, values per attribute] which are consumed by
+        # LDAP._receive() and passed to C. -1 implies unlimited.
+        return [-1 if x is None else x for x in (self.max_entries, self.max_bytes, self.max_values)]
+
+
+class TLSContext(object):
+    """TLSContext is TLS context which is shared by many LDAP instances
+
+    CA certificates, client certificate and key are loaded once when
+    TLSContext is created, instead of every StartTLS or LDAPS connection.
+    If libldap uses OpenSSL, the latest TLS session is offered by the next
+    handshake (session ID or session ticket), so reconnecting connections
+    do abbreviated handshakes when server allows resumption.
+
+    .. code-block:: python
+
+        >>> ctx = TLSContext([(LDAP_OPT_X_TLS_CACERTFILE, '/etc/openldap/cacert.pem')])
+        >>> ld = LDAP('ldap://localhost', start_tls=True, tls_context=ctx)
+
+    :param options:
+        TLS options which are set before the context is created (the
+        default is (), which implies global TLS options are used)
+
+    :type options:
+        [(option, value)]
+
+    :raises:
+        LDAPError
+
+    .. note::
+
+        The context is released by ldap_pvt_tls_ctx_free(), which is exported
+        by libldap of OpenLDAP 2.4 or later but is not public API.
+    """
+
+    def __init__(self, options=()):
+        holder = _LDAPObject('ldap://')
+        try:
+            for option, value in options:
+                holder.set_option(option, value, 0)
+            holder.set_option(LDAP_OPT_X_TLS_NEWCTX, 0, 0)
+            self._ctx = holder.get_option(LDAP_OPT_X_TLS_CTX, 0)
+            # Only this context remembers sessions. Contexts which are got by
+            # get_option(LDAP_OPT_X_TLS_CTX) are not changed.
+            holder.cache_tls_sessions(self._ctx)
+        except _LDAPError as e:
+            raise _generate_exception(e) from None
+        finally:
+            holder.unbind()
+
+
+def _measured(method):
+    # Record call of method in LDAP.metrics (see libldap.metrics)
+    operation = method.__name__
+
+    @_wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return method(self, *args, **kwargs)
+        return metrics.measure(operation, method, self, args, kwargs)
+    return wrapper
+
+
+def _budget(method):
+    # Run method within its 'deadline' argument (see LDAP.deadline())
+    names = list(_inspect.signature(method).parameters)[1:]
+
+    def argument(name, args, kwargs):
+        # Argument which may be given by position or keyword
+        if name not in names:
+            return None
+        position = names.index(name)
+        if position < len(args):
+            return args[position]
+        return kwargs.get(name)
+
+    @_wraps(method)
+    def wrapper(self, *args, **kwargs):
+        deadline = argument('deadline', args, kwargs)
+        if deadline is None or argument('async', args, kwargs):
+            return method(self, *args, **kwargs)
+        with self.deadline(deadline):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _idempotent(method):
+    # Retry synchronous call of method according to RetryPolicy
+    @_wraps(method)
+    def wrapper(self, *args, **kwargs):
+        policy = self.retry_policy
+        if policy is None or kwargs.get('async'):
+            return method(self, *args, **kwargs)
+        if policy.deadline is not None:
+            deadline = time.monotonic() + policy.deadline
+        else:
+            deadline = None
+        attempt = 0
+        while True:
+            try:
+                return method(self, *args, **kwargs)
+            except (LDAPServerDown, LDAPConnectError):
+                if attempt >= policy.retries:
+                    raise
+                delay = policy.delay(attempt)
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                try:
+                    self.reconnect(next_uri=policy.next_uri)
+                except (LDAPServerDown, LDAPConnectError):
+                    # Next attempt fails and counts as retry
+                    pass
+    return wrapper
+
+
+def _traced(method):
+    # Call LDAP.tracer hooks around method (see libldap.tracing)
+    operation = method.__name__
+    signature = _inspect.signature(method)
+
+    def start(self, args, kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        del arguments['self']
+        context = TraceContext(operation, arguments)
+        self.tracer.start(context)
+        return context
+
+    def finish(self, context, outer):
+        self._trace = outer
+        if context.arguments.get('async'):
+            # result() calls last_result()
+            context.running = False
+            return
+        for msgid in context.msgids:
+            self._traces.pop(msgid, None)
+
+    if _inspect.isgeneratorfunction(method):
+        @_wraps(method)
+        def generator(self, *args, **kwargs):
+            if self.tracer is None:
+                yield from method(self, *args, **kwargs)
+                return
+            context = start(self, args, kwargs)
+            outer, self._trace = self._trace, context
+            try:
+                yield from method(self, *args, **kwargs)
+            except LDAPError as e:
+                self.tracer.error(context, e)
+                raise
+            finally:
+                finish(self, context, outer)
+            self._last_result(context)
+        return generator
+
+    @_wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.tracer is None:
+            return method(self, *args, **kwargs)
+        context = start(self, args, kwargs)
+        outer, self._trace = self._trace, context
+        try:
+            value = method(self, *args, **kwargs)
+        except LDAPError as e:
+            self.tracer.error(context, e)
+            raise
+        finally:
+            finish(self, context, outer)
+        if context.running:
+            self._last_result(context)
+        return value
+    return wrapper
+
+
+def _wait_many(connections, phase, expires, send):
+    # Send one request on each connection, and poll them in turn until
+    # all results arrive. Elapsed seconds are recorded in timings[phase].
+    pending = []
+    for ld in connections:
+        pending.append((ld, send(ld), time.monotonic()))
+    while pending:
+        waiting = []
+        for ld, msgid, begin in pending:
+            result = ld._poll(msgid)
+            if result is None:
+                waiting.append((ld, msgid, begin))
+                continue
+            if result['return_code'] != LDAP_SUCCESS:
+                raise _generate_exception(**result)
+            ld.timings[phase] = time.monotonic() - begin
+        if waiting and expires is not None and time.monotonic() > expires:
+            raise _generate_exception('Timed out', -5)
+        if waiting and len(waiting) == len(pending):
+            # Nothing arrived in this round
+            time.sleep(0.001)
+        pending = waiting
+
+
+def _handshake_many(connections, expires):
+    # Install TLS on connections concurrently. ldap_install_tls() releases
+    # GIL, so handshakes of different connections overlap.
+    def handshake(ld):
+        begin = time.monotonic()
+        _LDAPObject.install_tls(ld)
+        ld.timings['tls_handshake'] = time.monotonic() - begin
+
+    with _ThreadPoolExecutor(max_workers=min(len(connections), _HANDSHAKE_WORKERS)) as executor:
+        futures = [executor.submit(handshake, ld) for ld in connections]
+        timeout = max(expires - time.monotonic(), 0) if expires is not None else None
+        _, not_done = _wait_futures(futures, timeout=timeout)
+        # Handshakes which have not started are cancelled, and running ones
+        # are waited for by shutdown, so that no thread uses closed connections
+        for future in not_done:
+            future.cancel()
+    if not_done:
+        raise _generate_exception('Timed out', -5)
+    for future in futures:
+        try:
+            future.result()
+        except _LDAPError as e:
+            raise _generate_exception(e) from None
+
+
 class LDAP(_LDAPObject):
     """LDAP is libldap wrapper class
 
@@ -59,6 +547,22 @@ class LDAP(_LDAPObject):
     :param start_tls:
         Flag for start_tls() will be executed or not
         (the default is False, which implies start_tls() is not done)
+    :param retry:
+        Reconnect and retry policy (the default is None, which implies
+        LDAPServerDown is raised without retry)
+    :param tls_context:
+        Shared TLS context (the default is None, which implies TLS context
+        is created from TLS options)
+    :param metrics:
+        Registry of operation statistics (the default is None, which implies
+        statistics are not recorded)
+    :param tracer:
+        Hooks which are called around operations (the default is None,
+        which implies LDAP.tracer, no hooks unless it is set)
+    :param budget:
+        Size limits of every search result on this connection (the default
+        is None, which implies unlimited). search() and paged_search() can
+        override it.
 
     :type uri:
         str, list or tuple
@@ -70,27 +574,49 @@ class LDAP(_LDAPObject):
         [(option, value, is_global)]
     :type start_tls:
         bool
+    :type retry:
+        RetryPolicy or None
+    :type tls_context:
+        TLSContext or None
+    :type metrics:
+        Metrics or None
+    :type tracer:
+        Tracer or None
+    :type budget:
+        ResultBudget or None
 
     :raises:
         LDAPError
     """
 
-    def __init__(self, uri, bind_user=None, bind_password=None, options=[], start_tls=False):
+    retry_policy = None
+    tls_context = None
+    metrics = None
+    tracer = None
+    budget = None
+    _deadline = None
+    _trace = None       # TraceContext of running operation
+    _traces = None      # {msgid: TraceContext} whose last result is awaited
+    _budgets = None     # {msgid: remaining budget} (see ResultBudget._remaining())
+
+    def __init__(self, uri, bind_user=None, bind_password=None, options=[], start_tls=False,
+                 retry=None, tls_context=None, metrics=None, tracer=None, budget=None):
+        self.metrics = metrics
+        self.budget = budget
+        if tracer is not None:
+            self.tracer = tracer
         self.bind_user = 'anonymous'
         self.__bind_password = None
         if bind_user and bind_password:
             self.bind_user = bind_user
             self.__bind_password = bind_password
-        try:
-            if isinstance(uri, (list, tuple)):
-                super().__init__(','.join(uri))
-            else:
-                super().__init__(uri)
-        except _LDAPError as e:
-            raise _generate_exception(e) from None
-        # NOTE: We set LDAP_OPT_REFERRALS False by default. This is same behavior
-        #       with OpenLDAP client tool. You can overwrite by using options parameter.
-        self.set_option(LDAP_OPT_REFERRALS, False)
+        self.retry_policy = retry
+        self.tls_context = tls_context
+        self.__uris = list(uri) if isinstance(uri, (list, tuple)) else [uri]
+        self.__options = _OrderedDict()  # Options which are replayed by reconnect()
+        self.__credentials = None
+        self.__start_tls = False
+        self._connect()
         try:
             for option, value, is_global in options:
                 self.set_option(option, value, is_global)
@@ -99,6 +625,201 @@ class LDAP(_LDAPObject):
         if start_tls:
             self.start_tls()
 
+    def _connect(self):
+        try:
+            super().__init__(','.join(self.__uris))
+        except _LDAPError as e:
+            raise _generate_exception(e) from None
+        # NOTE: We set LDAP_OPT_REFERRALS False by default. This is same behavior
+        #       with OpenLDAP client tool. You can overwrite by using options parameter.
+        self.set_option(LDAP_OPT_REFERRALS, False)
+        if self.tls_context is not None:
+            # Not recorded, because reconnect() calls this method again
+            super().set_option(LDAP_OPT_X_TLS_CTX, self.tls_context._ctx, 0)
+
+    def reconnect(self, next_uri=False):
+        """
+        Create new session, and replay options, start_tls() and the last
+        successful bind().
+
+        :param next_uri:
+            Flag for trying next URI first or not (the default is False)
+        :type next_uri:
+            bool
+
+        :raises:
+            LDAPError
+        """
+        if next_uri and len(self.__uris) > 1:
+            self.__uris.append(self.__uris.pop(0))
+        options, self.__options = self.__options, _OrderedDict()
+        self._connect()
+        # Options are recorded again by replay
+        self.__options = _OrderedDict()
+        for option, value in options.items():
+            self.set_option(option, value)
+        if self.__start_tls:
+            self.start_tls()
+        if self.__credentials is not None:
+            self.bind(*self.__credentials)
+
+    @classmethod
+    def connect_many(cls, uri, count, bind_user=None, bind_password=None, options=[],
+                     start_tls=False, retry=None, timeout=10, tls_context=None, metrics=None):
+        """
+        Establish count connections concurrently. This is useful for warming
+        up connection pool. TCP connections are opened asynchronously
+        (LDAP_OPT_CONNECT_ASYNC), and StartTLS requests and BIND requests
+        of all connections are in flight at the same time. TLS handshakes
+        after StartTLS are done concurrently by up to 16 threads.
+
+        Each connection has 'timings' attribute, which is OrderedDict of
+        seconds spent in each phase: 'initialize', 'start_tls' (TCP connect
+        and StartTLS request), 'tls_handshake', 'bind' (includes TCP connect
+        if start_tls is False) and 'total'.
+
+        .. code-block:: python
+
+            >>> pool = LDAP.connect_many('ldap://localhost', 64,
+            ...                          'cn=master,dc=example,dc=com', 'secret',
+            ...                          start_tls=True)
+            >>> pool[0].timings
+            OrderedDict([('initialize', 3.1e-05), ('start_tls', 0.0021), ...])
+
+        :param uri:
+            LDAP URI (same as LDAP)
+        :param count:
+            Number of connections
+        :param bind_user:
+            LDAP BIND user (the default is None, which implies anonymous BIND
+            is done to establish connection)
+        :param bind_password:
+            LDAP BIND password (the default is None)
+        :param options:
+            LDAP options (same as LDAP)
+        :param start_tls:
+            Flag for StartTLS is done or not (the default is False)
+        :param retry:
+            Reconnect and retry policy of each connection (same as LDAP)
+        :param timeout:
+            Seconds for establishing all connections (the default is 10).
+            This is also used as LDAP_OPT_NETWORK_TIMEOUT, which is required
+            for asynchronous connect, unless it is given by options.
+        :param tls_context:
+            Shared TLS context of each connection (same as LDAP)
+        :param metrics:
+            Registry shared by all connections (same as LDAP)
+
+        :type uri:
+            str, list or tuple
+        :type count:
+            int
+        :type bind_user:
+            str or None
+        :type bind_password:
+            str or None
+        :type options:
+            [(option, value, is_global)]
+        :type start_tls:
+            bool
+        :type retry:
+            RetryPolicy or None
+        :type timeout:
+            int, float or timedelta
+        :type tls_context:
+            TLSContext or None
+        :type metrics:
+            Metrics or None
+
+        :returns:
+            Connections which are established
+        :rtype:
+            [LDAP]
+
+        :raises:
+            LDAPError (all connections are closed)
+        """
+        timeout = _seconds(timeout)
+        started = time.monotonic()
+        expires = started + timeout if timeout > 0 else None
+        connections = []
+        try:
+            for _ in range(count):
+                begin = time.monotonic()
+                ld = cls(uri, options=options, retry=retry, tls_context=tls_context,
+                         metrics=metrics)
+                if not _LDAPObject.get_option(ld, LDAP_OPT_NETWORK_TIMEOUT, 0):
+                    _LDAPObject.set_option(ld, LDAP_OPT_NETWORK_TIMEOUT, timeout or 10, 0)
+                _LDAPObject.set_option(ld, LDAP_OPT_CONNECT_ASYNC, True, 0)
+                ld.timings = _OrderedDict([('initialize', time.monotonic() - begin)])
+                connections.append(ld)
+
+            if start_tls:
+                _wait_many(connections, 'start_tls', expires,
+                           lambda ld: ld.extended(LDAP_EXOP_START_TLS, async=True))
+                if connections:
+                    _handshake_many(connections, expires)
+                for ld in connections:
+                    ld.__start_tls = True
+
+            if bind_user is not None:
+                who, password = bind_user, bind_password
+            else:
+                who, password = '', ''
+            _wait_many(connections, 'bind', expires,
+                       lambda ld: ld.bind(who, password, async=True))
+        except BaseException:
+            for ld in connections:
+                try:
+                    _LDAPObject.unbind(ld)
+                except _LDAPError:
+                    pass
+            raise
+
+        for ld in connections:
+            _LDAPObject.set_option(ld, LDAP_OPT_CONNECT_ASYNC, False, 0)
+            if bind_user is not None:
+                ld.bind_user = bind_user
+                ld.__credentials = (bind_user, bind_password)
+            ld.timings['total'] = time.monotonic() - started
+        return connections
+
+    @_contextmanager
+    def deadline(self, seconds):
+        """
+        Context manager which limits total time of operations in with statement.
+        The budget is shared by connection establishment, bind and every
+        result wait. When it expires, outstanding operation is abandoned
+        and LDAPTimeout is raised.
+
+        .. code-block:: python
+
+            >>> with ld.deadline(0.05):
+            ...     ld.bind('cn=master,dc=example,dc=com', 'secret')
+            ...     ld.search('dc=example,dc=com', LDAP_SCOPE_SUB, '(uid=user1)')
+
+        :param seconds:
+            Budget in seconds (None implies no deadline)
+        :type seconds:
+            int, float, timedelta or None
+        """
+        if seconds is None:
+            yield
+            return
+        outer = self._deadline
+        expires = time.monotonic() + _seconds(seconds)
+        if outer is not None and outer < expires:
+            expires = outer
+        self._deadline = expires
+        # Connection establishment is limited by LDAP_OPT_NETWORK_TIMEOUT
+        network_timeout = super().get_option(LDAP_OPT_NETWORK_TIMEOUT, 0)
+        super().set_option(LDAP_OPT_NETWORK_TIMEOUT, max(expires - time.monotonic(), 0.000001), 0)
+        try:
+            yield
+        finally:
+            self._deadline = outer
+            super().set_option(LDAP_OPT_NETWORK_TIMEOUT, network_timeout or 0, 0)
+
     def __enter__(self):
         if self.bind_user and self.__bind_password:
             self.bind(self.bind_user, self.__bind_password)
@@ -107,7 +828,10 @@ class LDAP(_LDAPObject):
     def __exit__(self, exc_type, exc_value, traceback):
         self.unbind()
 
-    def bind(self, who, password, controls=None, async=False):
+    @_measured
+    @_traced
+    @_budget
+    def bind(self, who, password, controls=None, async=False, deadline=None):
         """
         :param who:
             Who bind to
@@ -118,6 +842,9 @@ class LDAP(_LDAPObject):
         :param async:
             Flag for asynchronous or not (the default is False,
             which implies operation will done synchronously)
+        :param deadline:
+            Seconds for the whole call including connection establishment
+            (the default is None, which implies no deadline). See deadline().
 
         :type who:
             str
@@ -127,6 +854,8 @@ class LDAP(_LDAPObject):
             LDAPControl or None
         :type async:
             bool
+        :type deadline:
+            int, float, timedelta or None
 
         :returns:
             Nothing or message ID
@@ -141,15 +870,18 @@ class LDAP(_LDAPObject):
                 msgid = super().bind(who, password, controls)
             else:
                 msgid = super().bind(who, password)
+            if self._trace is not None:
+                self._sent(msgid)
             if async:
                 # Not set bind_user
                 return msgid
-            result = self.result(msgid, controls=controls)
+            result = self._result(msgid, controls=controls)
         except _LDAPError as e:
             raise _generate_exception(e) from None
         if result['return_code'] != LDAP_SUCCESS:
             raise _generate_exception(**result)
         self.bind_user = who
+        self.__credentials = (who, password)
 
     def unbind(self):
         """
@@ -166,6 +898,10 @@ class LDAP(_LDAPObject):
         except _LDAPError as e:
             raise _generate_exception(e) from None
 
+    @_measured
+    @_traced
+    @_budget
+    @_idempotent
     def search(self,
                base,
                scope=0x0000,
@@ -176,7 +912,9 @@ class LDAP(_LDAPObject):
                sizelimit=0,
                controls=None,
                ordered_attributes=False,
-               async=False):
+               async=False,
+               deadline=None,
+               budget=None):
         """
         :param base:
             DN of the entry at which to start the search.
@@ -185,7 +923,8 @@ class LDAP(_LDAPObject):
             it must be LDAP_SCOPE_BASE, LDAP_SCOPE_ONE, LDAP_SCOPE_SUB or
             LDAP_SCOPE_CHILDREN (the default is LDAP_SCOPE_BASE).
         :param filter:
-             LDAP filter (the default is '(objectClass=*)')
+             LDAP filter (the default is '(objectClass=*)'). Filter object
+             of libldap.filter is also accepted.
         :param attributes:
             Attributes for fetching from LDAP server (the default is None,
             which implies '*')
@@ -205,19 +944,26 @@ class LDAP(_LDAPObject):
             Flag for asynchronous or not (the default is False,
             which implies operation will done synchronously)
             Synchronous operation returns LDAP responses immediately
+        :param deadline:
+            Seconds for the whole call including connection establishment
+            (the default is None, which implies no deadline). See deadline().
+        :param budget:
+            Size limits of the result (the default is None, which implies
+            the budget of this connection). LDAPBudgetExceeded is raised
+            when one of them is crossed.
 
         :type base:
             str
         :type scope:
             int
         :type filter:
-            str
+            str or Filter
         :type attributes:
              [str] or None
         :type attrsonly:
             bool
         :type timeout:
-            int
+            int, float or timedelta
         :type sizelimit:
             int
         :type controls:
@@ -226,7 +972,10 @@ class LDAP(_LDAPObject):
             bool
         :type async:
             bool
-
+        :type deadline:
+            int, float, timedelta or None
+        :type budget:
+            ResultBudget or None
 
         :returns:
             List of entries or message ID
@@ -236,6 +985,11 @@ class LDAP(_LDAPObject):
         :raises:
             LDAPError
         """
+        if isinstance(filter, Filter):
+            filter = str(filter)
+        timeout = _seconds(timeout)
+        if budget is None:
+            budget = self.budget
         try:
             if controls is not None:
                 msgid = super().search(base, scope, filter, attributes,
@@ -243,13 +997,22 @@ class LDAP(_LDAPObject):
             else:
                 msgid = super().search(base, scope, filter, attributes,
                                        int(attrsonly), timeout, sizelimit)
+            if self._trace is not None:
+                self._sent(msgid, search=True)
+            if budget is not None:
+                self._limit(msgid, budget._remaining())
             if async:
                 return msgid
         except _LDAPError as e:
             raise _generate_exception(e) from None
-        return self.search_result(msgid, timeout=timeout, controls=controls,
-                                  ordered_attributes=ordered_attributes)
+        try:
+            return _search_entries(self._result(msgid, timeout=timeout, controls=controls),
+                                   ordered_attributes)
+        finally:
+            if self._budgets:
+                self._budgets.pop(msgid, None)
 
+    @_traced
     def paged_search(self,
                      base,
                      scope=0x0000,
@@ -259,7 +1022,8 @@ class LDAP(_LDAPObject):
                      timeout=0,
                      sizelimit=0,
                      pagesize=100,
-                     ordered_attributes=False):
+                     ordered_attributes=False,
+                     budget=None):
         """
         :param base:
             DN of the entry at which to start the search.
@@ -268,7 +1032,8 @@ class LDAP(_LDAPObject):
             it must be LDAP_SCOPE_BASE, LDAP_SCOPE_ONE, LDAP_SCOPE_SUB or
             LDAP_SCOPE_CHILDREN (the default is LDAP_SCOPE_BASE).
         :param filter:
-             LDAP filter (the default is '(objectClass=*)')
+             LDAP filter (the default is '(objectClass=*)'). Filter object
+             of libldap.filter is also accepted.
         :param attributes:
             Attributes for fetching from LDAP server (the default is None,
             which implies '*')
@@ -285,56 +1050,225 @@ class LDAP(_LDAPObject):
             Flag for attributes order is fixed or not
             (the default is False, which implies attributes order in entry is
             not remembered)
+        :param budget:
+            Size limits of all pages (the default is None, which implies
+            the budget of this connection)
 
         :type base:
             str
         :type scope:
             int
         :type filter:
-            str
+            str or Filter
         :type attributes:
              [str] or None
         :type attrsonly:
             bool
         :type timeout:
-            int
+            int, float or timedelta
         :type sizelimit:
             int
         :type pagesize:
             int
         :type ordered_attributes:
             bool
+        :type budget:
+            ResultBudget or None
 
         :yield:
-            LDAP entries (each item is dict)
+            LDAP entries (each item is dict). Entries are yielded as they
+            arrive. If the generator is closed before the last page, the
+            outstanding request is abandoned and the paged results cookie
+            is released by a request of page size 0.
 
         :raises:
             LDAPError
         """
 
+        if isinstance(filter, Filter):
+            filter = str(filter)
+        timeout = _seconds(timeout)
         _pagesize = ('%d' % (pagesize,)).encode('utf-8')
         controls = _LDAPObjectControl()
         controls.add_control(LDAP_CONTROL_PAGEDRESULTS, _pagesize, False)
-        initial = True
-        while initial or controls.get_pr_cookie() is not None:
-            initial = False
-            try:
-                msgid = super().search(base, scope, filter, attributes,
-                                       int(attrsonly), timeout, sizelimit, controls)
-            except _LDAPError as e:
-                raise _generate_exception(e) from None
-            yield from self.search_result(msgid, timeout=timeout, controls=controls,
-                                          ordered_attributes=ordered_attributes)
+        if budget is None:
+            budget = self.budget
+        remaining = budget._remaining() if budget is not None else None
+        msgid = None
+        done = False
+        try:
+            initial = True
+            while initial or controls.get_pr_cookie() is not None:
+                initial = False
+                try:
+                    msgid = super().search(base, scope, filter, attributes,
+                                           int(attrsonly), timeout, sizelimit, controls)
+                except _LDAPError as e:
+                    raise _generate_exception(e) from None
+                if self._trace is not None:
+                    self._sent(msgid, search=True)
+                if remaining is not None:
+                    # Shared by all pages
+                    self._limit(msgid, remaining)
+                # Entries are yielded as they arrive
+                while msgid is not None:
+                    results = self.result(msgid, all=LDAP_MSG_RECEIVED, timeout=timeout,
+                                          controls=controls)
+                    for result in results:
+                        if '__order__' in result:
+                            yield _entry(result, ordered_attributes)
+                        else:
+                            msgid = None
+                            if result['return_code'] != LDAP_SUCCESS:
+                                raise _generate_exception(**result)
+            done = True
+        finally:
+            if not done:
+                # Closed, garbage-collected or failed partway through
+                self._release_paged(msgid, controls, base, scope, filter, timeout)
+
+    def _release_paged(self, msgid, controls, base, scope, filter, timeout):
+        # Abandon outstanding page and release paged results cookie
+        if self._budgets:
+            self._budgets.pop(msgid, None)
+        try:
+            if msgid is not None:
+                super().abandon(msgid)
+            if controls.get_pr_cookie() is not None:
+                controls.set_pagesize(0)
+                msgid = super().search(base, scope, filter, ['1.1'], 1, timeout, 0, controls)
+                super().result(msgid, 1, timeout or 3, controls)
+        except _LDAPError:
+            pass
+
+    def lookup_many(self,
+                    attribute,
+                    values,
+                    base,
+                    attributes=None,
+                    scope=0x0002,
+                    chunk=100,
+                    concurrency=8,
+                    timeout=0,
+                    controls=None):
+        """
+        :param attribute:
+            Attribute to look up values by (e.g. 'uid'). If 'dn' is specified,
+            each value is treated as DN and fetched by base scope search.
+        :param values:
+            Values of attribute to look up
+        :param base:
+            DN of the entry at which to start the search.
+        :param attributes:
+            Attributes for fetching from LDAP server (the default is None,
+            which implies '*'). *attribute* is always fetched.
+        :param scope:
+            Scope of the search (the default is LDAP_SCOPE_SUB).
+        :param chunk:
+            Maximum number of values packed into one
+            '(|(attribute=value1)(attribute=value2)...)' filter (the default is 100)
+        :param concurrency:
+            Maximum number of search requests in flight (the default is 8)
+        :param timeout:
+            Timeout for each search operation (the default is 0, which implies unlimited)
+        :param controls:
+            LDAP Controls (the default is None, which implies no controls are set)
 
+        :type attribute:
+            str
+        :type values:
+            iterable of str or bytes
+        :type base:
+            str
+        :type attributes:
+            [str] or None
+        :type scope:
+            int
+        :type chunk:
+            int
+        :type concurrency:
+            int
+        :type timeout:
+            int, float or timedelta
+        :type controls:
+            LDAPControl or None
+
+        :returns:
+            Mapping from value to LDAP entry. Values are compared case-insensitively.
+            Values which are not found are listed in 'missing' attribute.
+        :rtype:
+            _LookupResult
+
+        :raises:
+            LDAPError
+        """
+        if chunk < 1 or concurrency < 1:
+            raise ValueError("Invalid parameter: 'chunk' and 'concurrency' MUST be positive integer")
+        wanted = _OrderedDict()
+        for value in values:
+            wanted.setdefault(_lookup_key(value), value)
+
+        by_dn = attribute.lower() == 'dn'
+        if by_dn:
+            requests = [(key, value, 0x0000, '(objectClass=*)') for key, value in wanted.items()]
+        else:
+            if attributes is not None and '*' not in attributes and \
+                    attribute.lower() not in [x.lower() for x in attributes]:
+                attributes = list(attributes) + [attribute]
+            chunked = list(wanted.values())
+            requests = [(None, base, scope, Or(*[Equal(attribute, x) for x in chunked[i:i + chunk]]))
+                        for i in range(0, len(chunked), chunk)]
+
+        found = _LookupResult()
+        pending = _deque()
+        requests = iter(requests)
+        try:
+            while True:
+                while len(pending) < concurrency:
+                    request = next(requests, None)
+                    if request is None:
+                        break
+                    key, _base, _scope, _filter = request
+                    msgid = self.search(_base, _scope, _filter, attributes, timeout=timeout,
+                                        controls=controls, async=True)
+                    pending.append((msgid, key))
+                if not pending:
+                    break
+                msgid, key = pending.popleft()
+                try:
+                    entries = self.search_result(msgid, timeout=timeout, controls=controls)
+                except LDAPNoSuchObject:
+                    continue
+                for entry in entries:
+                    if by_dn:
+                        found.setdefault(wanted[key], entry)
+                        continue
+                    for name, entry_values in entry.items():
+                        if name.lower() != attribute.lower():
+                            continue
+                        for entry_value in entry_values:
+                            value = wanted.get(_lookup_key(entry_value))
+                            if value is not None:
+                                found.setdefault(value, entry)
+        except Exception:
+            for msgid, _ in pending:
+                self.abandon(msgid)
+            raise
+        found.missing = [value for value in wanted.values() if value not in found]
+        return found
+
+    @_measured
+    @_traced
     def add(self, dn, attributes, controls=None, async=False):
         """
         :param dn:
             DN
         :param attributes:
-            List of tuple. tuple has two items:
+            List of tuple (or dict which maps attr to values). tuple has two items:
 
             * attr   - Attribute name
-            * values - List of value
+            * values - List, tuple or set of value. bytes-like object (e.g.
+              bytearray, memoryview, mmap) is sent without copy.
         :param controls:
             LDAP Controls (the default is None, which implies no controls are set)
         :param async:
@@ -344,17 +1278,19 @@ class LDAP(_LDAPObject):
         :type dn:
             str
         :type attributes:
-            [(str, [str])] or [(str, [bytes])]
+            [(str, [str])], [(str, [bytes])] or dict
         :type controls:
             LDAPControl or None
         :type async:
             bool
 
         :returns:
-            If operation is succeeded, None object is returned.
+            If operation is succeeded, None object is returned. If
+            LDAP_CONTROL_PRE_READ or LDAP_CONTROL_POST_READ is set in controls,
+            dict which has 'pre_read' and/or 'post_read' _DictEntry is returned.
             If async is True, return message ID.
         :rtype:
-            None or int
+            None, dict or int
 
         :raises:
             LDAPError
@@ -364,14 +1300,19 @@ class LDAP(_LDAPObject):
                 msgid = super().add(dn, attributes, controls)
             else:
                 msgid = super().add(dn, attributes)
+            if self._trace is not None:
+                self._sent(msgid)
             if async:
                 return msgid
-            result = self.result(msgid, controls=controls)
+            result = self._result(msgid, controls=controls)
         except _LDAPError as e:
             raise _generate_exception(e) from None
         if result['return_code'] != LDAP_SUCCESS:
             raise _generate_exception(**result)
+        return _read_entries(result)
 
+    @_measured
+    @_traced
     def modify(self, dn, changes, controls=None, async=False):
         """
         :param dn:
@@ -380,7 +1321,8 @@ class LDAP(_LDAPObject):
             List of tuple. tuple has three items:
 
             * attr   - Attribute name
-            * values - List of value
+            * values - List, tuple or set of value. bytes-like object (e.g.
+              bytearray, memoryview, mmap) is sent without copy.
             * mod_op - Modify operation (e.g.: LDAP_MOD_REPLACE)
         :param controls:
             LDAP Controls (the default is None, which implies no controls are set)
@@ -398,10 +1340,12 @@ class LDAP(_LDAPObject):
             bool
 
         :returns:
-            If operation is succeeded, None object is returned.
+            If operation is succeeded, None object is returned. If
+            LDAP_CONTROL_PRE_READ or LDAP_CONTROL_POST_READ is set in controls,
+            dict which has 'pre_read' and/or 'post_read' _DictEntry is returned.
             If async is True, return message ID.
         :rtype:
-            None or int
+            None, dict or int
 
         :raises:
             LDAPError
@@ -411,14 +1355,149 @@ class LDAP(_LDAPObject):
                 msgid = super().modify(dn, changes, controls)
             else:
                 msgid = super().modify(dn, changes)
+            if self._trace is not None:
+                self._sent(msgid)
             if async:
                 return msgid
-            result = self.result(msgid, controls=controls)
+            result = self._result(msgid, controls=controls)
         except _LDAPError as e:
             raise _generate_exception(e) from None
         if result['return_code'] != LDAP_SUCCESS:
             raise _generate_exception(**result)
+        return _read_entries(result)
+
+    def sync_entry(self, dn, desired, current=None, controls=None, async=False):
+        """
+        Modify entry with minimal changes so that attributes in desired have
+        desired values. Attributes which are not in desired are not changed.
+        If there is no difference, no modify request is sent.
+
+        :param dn:
+            DN
+        :param desired:
+            Desired attributes. Empty list or None as values means the
+            attribute is deleted.
+        :param current:
+            Current entry (the default is None, which implies the entry is
+            fetched by base scope search of attributes in desired). For bulk
+            synchronization, fetch entries by lookup_many('dn', ...) and pass
+            them here with async=True.
+        :param controls:
+            LDAP Controls (the default is None, which implies no controls are set)
+        :param async:
+            Flag for asynchronous or not (the default is False,
+            which implies operation will done synchronously)
+
+        :type dn:
+            str
+        :type desired:
+            dict or [(str, [str])] or [(str, [bytes])]
+        :type current:
+            _DictEntry, _OrderedEntry, dict or None
+        :type controls:
+            LDAPControl or None
+        :type async:
+            bool
+
+        :returns:
+            Applied changes (empty list if entry is already synchronized).
+            If async is True, return message ID or None if no request is sent.
+        :rtype:
+            [(str, [bytes], int)], int or None
+
+        :raises:
+            LDAPError
+        """
+        if current is None:
+            if hasattr(desired, 'keys'):
+                names = list(desired.keys())
+            else:
+                desired = list(desired)
+                names = [attribute for attribute, _ in desired]
+            if not names:
+                return None if async else []
+            current = self.search(dn, LDAP_SCOPE_BASE, attributes=names)[0]
+        changes = _diff_entry(current, desired)
+        if not changes:
+            return None if async else []
+        msgid = self.modify(dn, changes, controls=controls, async=async)
+        if async:
+            return msgid
+        return changes
+
+    def compare_and_modify(self, dn, assertion_filter, changes, retries=3, attributes=None):
+        """
+        Modify entry only if it matches assertion_filter (LDAP_CONTROL_ASSERT).
+        This is optimistic concurrency control without external lock.
+
+        If assertion_filter or changes is callable, the entry is fetched by base
+        scope search and passed to it, and the call is retried up to *retries*
+        times while assertion fails (i.e. the entry was changed by others
+        between read and write).
+
+        .. code-block:: python
+
+            >>> def assertion(entry):
+            ...     return Equal('uidNumber', entry['uidNumber'][0])
+            >>> def changes(entry):
+            ...     return [('uidNumber', [str(int(entry['uidNumber'][0]) + 1)], LDAP_MOD_REPLACE)]
+            >>> ld.compare_and_modify('cn=uidNext,dc=example,dc=com', assertion, changes)
+
+        :param dn:
+            DN
+        :param assertion_filter:
+            LDAP filter which entry must match, or callable which receives
+            current entry and returns it
+        :param changes:
+            Same changes as modify(), or callable which receives current entry
+            and returns them
+        :param retries:
+            Maximum number of retries after assertion failure (the default is 3)
+        :param attributes:
+            Attributes fetched for callables (the default is None, which implies '*')
+
+        :type dn:
+            str
+        :type assertion_filter:
+            str, Filter or callable
+        :type changes:
+            [(str, [str], int)], [(str, [bytes], int)] or callable
+        :type retries:
+            int
+        :type attributes:
+            [str] or None
+
+        :returns:
+            Applied changes
+        :rtype:
+            [(str, [str], int)] or [(str, [bytes], int)]
 
+        :raises:
+            LDAPError (LDAPAssertionFailed if assertion fails after retries)
+        """
+        dynamic = callable(assertion_filter) or callable(changes)
+        attempt = 0
+        while True:
+            _filter, _changes = assertion_filter, changes
+            if dynamic:
+                entry = self.search(dn, LDAP_SCOPE_BASE, attributes=attributes)[0]
+                if callable(_filter):
+                    _filter = _filter(entry)
+                if callable(_changes):
+                    _changes = _changes(entry)
+            c = LDAPControl()
+            c.add_control(LDAP_CONTROL_ASSERT, str(_filter).encode('utf-8'), True)
+            try:
+                self.modify(dn, _changes, controls=c)
+            except LDAPAssertionFailed:
+                if not dynamic or attempt >= retries:
+                    raise
+                attempt += 1
+                continue
+            return _changes
+
+    @_measured
+    @_traced
     def delete(self, dn, controls=None, async=False):
         """
         :param dn:
@@ -437,10 +1516,12 @@ class LDAP(_LDAPObject):
             bool
 
         :returns:
-            If operation is succeeded, None object is returned.
+            If operation is succeeded, None object is returned. If
+            LDAP_CONTROL_PRE_READ or LDAP_CONTROL_POST_READ is set in controls,
+            dict which has 'pre_read' and/or 'post_read' _DictEntry is returned.
             If async is True, return message ID.
         :rtype:
-            None or int
+            None, dict or int
 
         :raises:
             LDAPError
@@ -450,14 +1531,141 @@ class LDAP(_LDAPObject):
                 msgid = super().delete(dn, controls)
             else:
                 msgid = super().delete(dn)
+            if self._trace is not None:
+                self._sent(msgid)
             if async:
                 return msgid
-            result = self.result(msgid, controls=controls)
+            result = self._result(msgid, controls=controls)
         except _LDAPError as e:
             raise _generate_exception(e) from None
         if result['return_code'] != LDAP_SUCCESS:
             raise _generate_exception(**result)
+        return _read_entries(result)
+
+    def supported_controls(self):
+        """
+        :returns:
+            OIDs of controls which are advertised by root DSE (supportedControl)
+        :rtype:
+            set
+
+        :raises:
+            LDAPError
+        """
+        entries = self.search('', LDAP_SCOPE_BASE, attributes=['supportedControl'])
+        controls = set()
+        for entry in entries:
+            for key, values in entry.items():
+                if key.lower() == 'supportedcontrol':
+                    controls.update(x.decode('utf-8') for x in values)
+        return controls
+
+    def delete_tree(self, dn, connections=None, window=32, use_control=True, progress=None,
+                    timeout=0):
+        """
+        Delete dn and all entries under it. If LDAP server advertises
+        LDAP_CONTROL_X_TREE_DELETE, the subtree is deleted by one request.
+        Otherwise entries are deleted from the deepest level: entries of
+        the same depth are deleted concurrently by asynchronous delete
+        requests over all connections.
+
+        :param dn:
+            DN of the subtree root
+        :param connections:
+            Additional LDAP instances which have already been bound
+            (the default is None, which implies only this instance is used)
+        :param window:
+            Maximum number of requests in flight per connection (the default is 32)
+        :param use_control:
+            Flag for using LDAP_CONTROL_X_TREE_DELETE if it is advertised
+            (the default is True)
+        :param progress:
+            Callable which is called as progress(deleted, total, elapsed) after
+            each level (the default is None)
+        :param timeout:
+            Timeout for each result (the default is 0, which implies wait forever)
+
+        :type dn:
+            str
+        :type connections:
+            [LDAP] or None
+        :type window:
+            int
+        :type use_control:
+            bool
+        :type progress:
+            callable or None
+        :type timeout:
+            int, float or timedelta
+
+        :returns:
+            Statistics which has following keys:
+
+            * deleted            - Number of deleted entries (None if tree delete
+              control is used)
+            * elapsed            - Seconds
+            * entries_per_second - Throughput
+            * tree_delete        - Whether LDAP_CONTROL_X_TREE_DELETE is used
+        :rtype:
+            dict
+
+        :raises:
+            LDAPError
+        """
+        if window < 1:
+            raise ValueError("Invalid parameter: 'window' MUST be positive integer")
+        started = time.monotonic()
+        if use_control and LDAP_CONTROL_X_TREE_DELETE in self.supported_controls():
+            c = LDAPControl()
+            c.add_control(LDAP_CONTROL_X_TREE_DELETE)
+            self.delete(dn, controls=c)
+            elapsed = time.monotonic() - started
+            return {'deleted': None, 'elapsed': elapsed, 'entries_per_second': None,
+                    'tree_delete': True}
+
+        levels = {}
+        for entry in self.paged_search(dn, LDAP_SCOPE_SUB, attributes=['1.1']):
+            levels.setdefault(len(_split_dn(entry.dn)), []).append(entry.dn)
+        total = sum(len(x) for x in levels.values())
+        lds = [self] + list(connections or [])
+        pending = [_deque() for _ in lds]
+        deleted = 0
+
+        def complete(number):
+            msgid = pending[number].popleft()
+            result = lds[number].result(msgid, timeout=timeout)
+            if result['return_code'] == LDAP_SUCCESS:
+                return True
+            if result['return_code'] == LDAP_NO_SUCH_OBJECT:
+                # Already deleted by others
+                return False
+            raise _generate_exception(**result)
 
+        for depth in sorted(levels, reverse=True):
+            # Entries of the same depth are not parent and child each other
+            try:
+                for i, _dn in enumerate(levels[depth]):
+                    number = i % len(lds)
+                    if len(pending[number]) >= window:
+                        deleted += complete(number)
+                    pending[number].append(lds[number].delete(_dn, async=True))
+                for number in range(len(lds)):
+                    while pending[number]:
+                        deleted += complete(number)
+            except Exception:
+                for number, msgids in enumerate(pending):
+                    for msgid in msgids:
+                        lds[number].abandon(msgid)
+                raise
+            if progress is not None:
+                progress(deleted, total, time.monotonic() - started)
+        elapsed = time.monotonic() - started
+        return {'deleted': deleted, 'elapsed': elapsed,
+                'entries_per_second': deleted / elapsed if elapsed > 0 else 0.0,
+                'tree_delete': False}
+
+    @_measured
+    @_traced
     def rename(self, dn, newrdn, newparent=None, deleteoldrdn=False, controls=None, async=False):
         """
         :param dn:
@@ -490,10 +1698,12 @@ class LDAP(_LDAPObject):
             bool
 
         :returns:
-            If operation is succeeded, None object is returned.
+            If operation is succeeded, None object is returned. If
+            LDAP_CONTROL_PRE_READ or LDAP_CONTROL_POST_READ is set in controls,
+            dict which has 'pre_read' and/or 'post_read' _DictEntry is returned.
             If async is True, return message ID.
         :rtype:
-            None or int
+            None, dict or int
 
         :raises:
             LDAPError
@@ -508,15 +1718,22 @@ class LDAP(_LDAPObject):
                 msgid = super().rename(dn, newrdn, newparent, int(deleteoldrdn), controls)
             else:
                 msgid = super().rename(dn, newrdn, newparent, int(deleteoldrdn))
+            if self._trace is not None:
+                self._sent(msgid)
             if async:
                 return msgid
-            result = self.result(msgid, controls=controls)
+            result = self._result(msgid, controls=controls)
         except _LDAPError as e:
             raise _generate_exception(e) from None
         if result['return_code'] != LDAP_SUCCESS:
             raise _generate_exception(**result)
+        return _read_entries(result)
 
-    def compare(self, dn, attribute, value, controls=None):
+    @_measured
+    @_traced
+    @_budget
+    @_idempotent
+    def compare(self, dn, attribute, value, controls=None, deadline=None):
         """
         :param dn:
             DN
@@ -526,6 +1743,9 @@ class LDAP(_LDAPObject):
             Value for comparing
         :param controls:
             LDAP Controls (the default is None, which implies no controls are set)
+        :param deadline:
+            Seconds for the whole call including connection establishment
+            (the default is None, which implies no deadline). See deadline().
 
         :type dn:
             str
@@ -535,6 +1755,8 @@ class LDAP(_LDAPObject):
             str
         :type controls:
             LDAPControl or None
+        :type deadline:
+            int, float, timedelta or None
 
         :returns:
             Attribute and value found in specified DN or not
@@ -553,7 +1775,9 @@ class LDAP(_LDAPObject):
                 msgid = super().compare(dn, attribute, value, controls)
             else:
                 msgid = super().compare(dn, attribute, value)
-            result = self.result(msgid, controls=controls)
+            if self._trace is not None:
+                self._sent(msgid)
+            result = self._result(msgid, controls=controls)
         except _LDAPError as e:
             raise _generate_exception(e) from None
         if result['return_code'] == LDAP_COMPARE_TRUE:
@@ -563,13 +1787,22 @@ class LDAP(_LDAPObject):
         else:
             raise _generate_exception(**result)
 
-    def whoami(self, controls=None):
+    @_measured
+    @_traced
+    @_budget
+    @_idempotent
+    def whoami(self, controls=None, deadline=None):
         """
         :param controls:
             LDAP Controls (the default is None, which implies no controls are set)
+        :param deadline:
+            Seconds for the whole call including connection establishment
+            (the default is None, which implies no deadline). See deadline().
 
         :type controls:
             LDAPControl or None
+        :type deadline:
+            int, float, timedelta or None
 
         :returns:
             If operation is succeeded, DN is returned.
@@ -588,7 +1821,9 @@ class LDAP(_LDAPObject):
                 msgid = super().whoami(controls)
             else:
                 msgid = super().whoami()
-            result = self.result(msgid, controls=controls)
+            if self._trace is not None:
+                self._sent(msgid)
+            result = self._result(msgid, controls=controls)
         except _LDAPError as e:
             raise _generate_exception(e) from None
         if result['return_code'] != LDAP_SUCCESS:
@@ -598,6 +1833,8 @@ class LDAP(_LDAPObject):
         else:
             return 'anonymous'
 
+    @_measured
+    @_traced
     def passwd(self, user, oldpw=None, newpw=None, controls=None):
         """
         :param user:
@@ -637,7 +1874,9 @@ class LDAP(_LDAPObject):
                 msgid = super().passwd(user, oldpw, newpw, controls)
             else:
                 msgid = super().passwd(user, oldpw, newpw)
-            result = self.result(msgid, controls=controls)
+            if self._trace is not None:
+                self._sent(msgid)
+            result = self._result(msgid, controls=controls)
         except _LDAPError as e:
             raise _generate_exception(e) from None
         if result['return_code'] != LDAP_SUCCESS:
@@ -648,6 +1887,8 @@ class LDAP(_LDAPObject):
         else:
             return newpw
 
+    @_measured
+    @_traced
     def start_tls(self, controls=None):
         """
         :param controls:
@@ -671,6 +1912,7 @@ class LDAP(_LDAPObject):
                 super().start_tls()
         except _LDAPError as e:
             raise _generate_exception(e) from None
+        self.__start_tls = True
 
     def set_option(self, option, value, is_global=False):
         """
@@ -717,6 +1959,7 @@ class LDAP(_LDAPObject):
             * LDAP_OPT_X_KEEPALIVE_PROBES
             * LDAP_OPT_X_KEEPALIVE_INTERVAL
             * LDAP_OPT_X_TLS_CRLCHECK
+            * LDAP_OPT_X_TLS_NEWCTX
             * LDAP_OPT_X_TLS_PROTOCOL_MIN
             * LDAP_OPT_X_TLS_REQUIRE_CERT
             * LDAP_OPT_X_SASL_NOCANON
@@ -748,12 +1991,22 @@ class LDAP(_LDAPObject):
 
             LDAP_OPT_REFERRAL_URLS option expects value parameter to be [str].
 
+            LDAP_OPT_X_TLS_CTX option expects value parameter to be TLSContext.
+
             Other options are not supported.
         """
+        if option in (LDAP_OPT_TIMEOUT, LDAP_OPT_NETWORK_TIMEOUT):
+            value = _seconds(value)
+        elif option == LDAP_OPT_X_TLS_CTX and isinstance(value, TLSContext):
+            value = value._ctx
         try:
             super().set_option(option, value, int(is_global))
         except _LDAPError as e:
             raise _generate_exception(e) from None
+        if not is_global:
+            # The latest value is replayed after options which are set before it
+            self.__options.pop(option, None)
+            self.__options[option] = value
 
     def get_option(self, option, is_global=False):
         """
@@ -842,6 +2095,9 @@ class LDAP(_LDAPObject):
                 + api_vendor_name: Vendor Name
                 + api_vendor_version: Vendor Version
 
+            LDAP_OPT_X_TLS_CTX option parameter returns opaque TLS context
+            or None. It can be given to set_option() of other instances.
+
             Other options are not supported.
         """
         try:
@@ -869,6 +2125,8 @@ class LDAP(_LDAPObject):
         :raises:
             LDAPError
         """
+        if self._budgets:
+            self._budgets.pop(msgid, None)
         try:
             if controls is not None:
                 return super().abandon(msgid, controls)
@@ -905,6 +2163,70 @@ class LDAP(_LDAPObject):
         except _LDAPError as e:
             raise _generate_exception(e) from None
 
+    @_measured
+    @_traced
+    def extended(self, oid, value=None, controls=None, async=False):
+        """
+        :param oid:
+            OID of extended operation
+        :param value:
+            BER encoded request value (the default is None, which implies
+            request has no value)
+        :param controls:
+            LDAP Controls (the default is None, which implies no controls are set)
+        :param async:
+            Flag for asynchronous or not (the default is False,
+            which implies operation will done synchronously)
+
+        :type oid:
+            str
+        :type value:
+            bytes or None
+        :type controls:
+            LDAPControl or None
+        :type async:
+            bool
+
+        :returns:
+            Result which has 'oid' and 'data' of response.
+            If async is True, return message ID.
+        :rtype:
+            dict or int
+
+        :raises:
+            LDAPError
+        """
+        try:
+            if controls is not None:
+                msgid = super().extended(oid, value, controls)
+            else:
+                msgid = super().extended(oid, value)
+            if self._trace is not None:
+                self._sent(msgid)
+            if async:
+                return msgid
+            result = self._result(msgid, controls=controls)
+        except _LDAPError as e:
+            raise _generate_exception(e) from None
+        if result['return_code'] != LDAP_SUCCESS:
+            raise _generate_exception(**result)
+        return result
+
+    def transaction(self, timeout=0):
+        """
+        :param timeout:
+            Timeout for each result (the default is 0, which implies wait forever)
+        :type timeout:
+            int, float or timedelta
+
+        :returns:
+            LDAP transaction (RFC 5805). Use it as context manager.
+        :rtype:
+            Transaction
+        """
+        return Transaction(self, timeout=timeout)
+
+    @_measured
     def result(self, msgid, all=True, timeout=3, controls=None):
         """
         :param msgid:
@@ -918,14 +2240,15 @@ class LDAP(_LDAPObject):
         :param controls:
             LDAP Controls (the default is None, which implies no controls are set).
             If controls is set and LDAP response has control message, return value
-            has control key-value.
+            has control key-value. Entries of LDAP_CONTROL_PRE_READ and
+            LDAP_CONTROL_POST_READ are set as 'pre_read' and 'post_read' (_DictEntry).
 
         :type msgid:
             int
         :type all:
             int
         :type timeout:
-            int
+            int, float or timedelta
         :type controls:
             LDAPControl or None
 
@@ -943,13 +2266,162 @@ class LDAP(_LDAPObject):
             instead of result(). result() get raw data, raw data has __order__ key,
             which has attribute order.
         """
+        return self._result(msgid, all, timeout, controls)
+
+    def _result(self, msgid, all=True, timeout=3, controls=None):
+        # result() which is not recorded in metrics, so that synchronous
+        # operations waiting for their own result are counted once
+        timeout = _seconds(timeout)
+        bounded = False
+        if self._deadline is not None:
+            remaining = self._deadline - time.monotonic()
+            if remaining <= 0:
+                self._expire(msgid)
+            if timeout <= 0 or timeout > remaining:
+                timeout = remaining
+                bounded = True
         try:
+            result = self._receive(msgid, int(all), timeout, controls)
+        except _LDAPError as e:
+            error = _generate_exception(e)
+            if not (bounded and isinstance(error, LDAPTimeout)):
+                if self._traces and not isinstance(error, LDAPTimeout):
+                    self._abort_trace(msgid, error)
+                raise error from None
+            result = None
+        if result is None:
+            if self._traces:
+                self._abort_trace(msgid, _generate_exception('Deadline exceeded', -5))
+            self._expire(msgid)
+        if isinstance(result, dict):
+            for key in ('pre_read', 'post_read'):
+                if key in result:
+                    result[key] = _entry(result[key])
+        return result
+
+    def _receive(self, msgid, all, timeout, controls):
+        # super().result() which enforces ResultBudget of msgid in C
+        remaining = self._budgets.get(msgid) if self._budgets else None
+        if remaining is None:
             if controls is not None:
-                return super().result(msgid, int(all), timeout, controls)
+                result = super().result(msgid, all, timeout, controls)
             else:
-                return super().result(msgid, int(all), timeout)
+                result = super().result(msgid, all, timeout)
+            if self._traces:
+                self._received(msgid, result)
+            return result
+
+        # Messages are decoded as they arrive, so that the search is
+        # abandoned before the rest of results is buffered
+        expires = time.monotonic() + timeout if timeout > 0 else None
+        results = []
+        while True:
+            wait = timeout
+            if expires is not None:
+                wait = expires - time.monotonic()
+                if wait <= 0:
+                    raise _LDAPError('Timed out (-5)')
+            try:
+                result = super().result(msgid, LDAP_MSG_RECEIVED if all == LDAP_MSG_ALL else all, wait,
+                                        controls, tuple(remaining))
+            except _LDAPError as e:
+                if not isinstance(_generate_exception(e), LDAPTimeout):
+                    # Abandoned in C or connection is lost
+                    self._budgets.pop(msgid, None)
+                raise
+            timings = super().get_timings()
+            if remaining[0] >= 0:
+                remaining[0] -= timings['entries']
+            if remaining[1] >= 0:
+                remaining[1] -= timings['bytes']
+            if self._traces:
+                self._received(msgid, result)
+            if not isinstance(result, list):
+                self._budgets.pop(msgid, None)
+                return result
+            results.extend(result)
+            if results and 'return_code' in results[-1]:
+                self._budgets.pop(msgid, None)
+                return results
+            if all != LDAP_MSG_ALL:
+                return results
+
+    def _limit(self, msgid, remaining):
+        # Enforce remaining budget on results of msgid
+        if self._budgets is None:
+            self._budgets = {}
+        self._budgets[msgid] = remaining
+
+    def _poll(self, msgid, controls=None):
+        # Return result of msgid if it has arrived, otherwise None.
+        # This is not recorded in metrics, so that polling is not counted.
+        try:
+            if controls is not None:
+                result = super().result(msgid, 1, _POLL_TIMEOUT, controls)
+            else:
+                result = super().result(msgid, 1, _POLL_TIMEOUT)
         except _LDAPError as e:
-            raise _generate_exception(e) from None
+            error = _generate_exception(e)
+            if isinstance(error, LDAPTimeout):
+                return None
+            raise error from None
+        if self._traces:
+            self._received(msgid, result)
+        return result
+
+    def _sent(self, msgid, search=False):
+        # Request of running traced operation has been sent
+        context = self._trace
+        context.msgid = msgid
+        context.msgids.append(msgid)
+        if search:
+            # Only ldap_search_ext() is timed in C
+            context.timings['send'] += super().get_timings()['send']
+        if self._traces is None:
+            self._traces = {}
+        self._traces[msgid] = context
+        self.tracer.send(context)
+
+    def _received(self, msgid, result):
+        # Accumulate C timings of result() into TraceContext of msgid
+        context = self._traces.get(msgid)
+        if context is None:
+            return
+        timings = super().get_timings()
+        context.timings['wait'] += timings['wait']
+        context.timings['decode'] += timings['decode']
+        context.entries += timings['entries']
+        context.bytes += timings['bytes']
+        context.results += 1
+        if context.results == 1:
+            context.timings['first_result'] = context.elapsed()
+            self.tracer.first_result(context)
+        if isinstance(result, dict) or (result and 'return_code' in result[-1]):
+            del self._traces[msgid]
+            context.timings['last_result'] = context.elapsed()
+            if not context.running:
+                # Asynchronous operation has returned its message ID
+                self.tracer.last_result(context)
+
+    def _abort_trace(self, msgid, error):
+        # result() of asynchronous traced operation has failed
+        context = self._traces.get(msgid)
+        if context is not None and not context.running:
+            del self._traces[msgid]
+            self.tracer.error(context, error)
+
+    def _last_result(self, context):
+        # Synchronous traced operation has completed
+        context.timings.setdefault('last_result', context.elapsed())
+        self.tracer.last_result(context)
+
+    def _expire(self, msgid):
+        # Abandon msgid whose deadline has expired
+        try:
+            super().abandon(msgid)
+        except _LDAPError:
+            pass
+        raise _generate_exception('Deadline exceeded', -5)
 
     def search_result(self, *args, **kwargs):
         """
@@ -977,16 +2449,126 @@ class LDAP(_LDAPObject):
             LDAPError
         """
         ordered_attributes = kwargs.pop('ordered_attributes', False)
-        results = self.result(*args, **kwargs)
-        if results:
-            if results[-1]['return_code'] != LDAP_SUCCESS:
-                raise _generate_exception(**results[-1])
-        if ordered_attributes:
-            return [_OrderedEntry(entry.pop('dn'), [(key, entry[key]) for key in entry['__order__']])
-                    for entry in results if '__order__' in entry]
+        return _search_entries(self.result(*args, **kwargs), ordered_attributes)
+
+
+class Transaction(object):
+    """Transaction is LDAP transaction (RFC 5805)
+
+    Update operations are sent asynchronously with transaction specification
+    control, so they are pipelined, and are applied at once by commit().
+    If exception is raised in with statement, transaction is aborted.
+
+    .. code-block:: python
+
+        >>> with ld.transaction() as txn:
+        ...     txn.add('cn=group2,ou=Groups,dc=example,dc=com', attributes)
+        ...     txn.modify('cn=group1,ou=Groups,dc=example,dc=com', changes)
+
+    :param ldap:
+        LDAP instance which has already been bound
+    :param timeout:
+        Timeout for each result (the default is 0, which implies wait forever)
+
+    :type ldap:
+        LDAP
+    :type timeout:
+        int, float or timedelta
+    """
+
+    def __init__(self, ldap, timeout=0):
+        self.ldap = ldap
+        self.timeout = timeout
+        #: Transaction identifier given by LDAP server
+        self.id = None
+        self._controls = None
+        self._pending = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.id is None:
+            return
+        if exc_type is None:
+            self.commit()
         else:
-            return [_DictEntry(entry.pop('dn'), [(key, value) for key, value in entry.items() if key != '__order__'])
-                    for entry in results if '__order__' in entry]
+            self.abort()
+
+    def start(self):
+        """
+        Send start transaction request
+
+        :raises:
+            LDAPError
+        """
+        msgid = self.ldap.extended(LDAP_EXOP_TXN_START, async=True)
+        result = self.ldap.result(msgid, timeout=self.timeout)
+        if result['return_code'] != LDAP_SUCCESS:
+            raise _generate_exception(**result)
+        self.id = result.get('data', b'')
+        self._controls = LDAPControl()
+        self._controls.add_control(LDAP_CONTROL_TXN_SPEC, self.id, True)
+        self._pending = []
+
+    def _send(self, method, *args):
+        if self.id is None:
+            raise _generate_exception('Transaction is not started', -9)
+        msgid = method(*args, controls=self._controls, async=True)
+        self._pending.append(msgid)
+        return msgid
+
+    def add(self, dn, attributes):
+        """Same as LDAP.add() in transaction. Message ID is returned."""
+        return self._send(self.ldap.add, dn, attributes)
+
+    def modify(self, dn, changes):
+        """Same as LDAP.modify() in transaction. Message ID is returned."""
+        return self._send(self.ldap.modify, dn, changes)
+
+    def delete(self, dn):
+        """Same as LDAP.delete() in transaction. Message ID is returned."""
+        return self._send(self.ldap.delete, dn)
+
+    def rename(self, dn, newrdn, newparent=None, deleteoldrdn=False):
+        """Same as LDAP.rename() in transaction. Message ID is returned."""
+        return self._send(self.ldap.rename, dn, newrdn, newparent, deleteoldrdn)
+
+    def _end(self, commit):
+        # End request is sent before results of updates are read, because
+        # LDAP server may defer them until transaction is settled.
+        msgid = self.ldap.extended(LDAP_EXOP_TXN_END, _txn_end_value(self.id, commit), async=True)
+        pending, self._pending = self._pending, []
+        self.id = None
+        errors = []
+        for _msgid in pending:
+            result = self.ldap.result(_msgid, timeout=self.timeout)
+            if result['return_code'] != LDAP_SUCCESS:
+                errors.append(result)
+        result = self.ldap.result(msgid, timeout=self.timeout)
+        if result['return_code'] != LDAP_SUCCESS:
+            raise _generate_exception(**result)
+        if commit and errors:
+            raise _generate_exception(**errors[0])
+
+    def commit(self):
+        """
+        Commit all operations at once
+
+        :raises:
+            LDAPError
+        """
+        self._end(True)
+
+    def abort(self):
+        """
+        Abort all operations
+
+        :raises:
+            LDAPError
+        """
+        self._end(False)
 
 
 class LDAPControl(_LDAPObjectControl):
@@ -995,4 +2577,12 @@ class LDAPControl(_LDAPObjectControl):
 
         Hide _LDAPObjectControl methods.
     """
-    pass
+
+    def __init__(self):
+        super().__init__()
+        #: OIDs of added controls
+        self.oids = []
+
+    def add_control(self, oid, *args):
+        super().add_control(oid, *args)
+        self.oids.append(oid)
@@ -10,6 +10,7 @@ libldap exceptions hierarchy::
     LDAPError
     ├── LDAPAPIError
     │   ├── LDAPAuthUnknown
+    │   ├── LDAPBudgetExceeded
     │   ├── LDAPClientLoop
     │   ├── LDAPConnectError
     │   ├── LDAPControlNotFound
@@ -33,6 +34,7 @@ libldap exceptions hierarchy::
         ├── LDAPAliasDerefProblem
         ├── LDAPAliasProblem
         ├── LDAPAlreadyExists
+        ├── LDAPAssertionFailed
         ├── LDAPAuthMethodNotSupported
         ├── LDAPBusy
         ├── LDAPCompareFalse
@@ -122,6 +124,8 @@ LDAPMoreResultsToReturn = type('LDAPMoreResultsToReturn', (LDAPAPIError,), {})
 LDAPClientLoop = type('LDAPClientLoop', (LDAPAPIError,), {})
 LDAPReferralLimitExceeded = type('LDAPReferralLimitExceeded', (LDAPAPIError,), {})
 LDAPXConnecting = type('LDAPXConnecting', (LDAPAPIError,), {})
+# Raised when search results cross ResultBudget (not libldap error)
+LDAPBudgetExceeded = type('LDAPBudgetExceeded', (LDAPAPIError,), {})
 
 # Sub classes of LDAPFailedResult
 
@@ -167,6 +171,7 @@ LDAPResultsTooLarge = type('LDAPResultsTooLarge', (LDAPFailedResult,), {})
 LDAPAffectsMultipleDsas = type('LDAPAffectsMultipleDsas', (LDAPFailedResult,), {})
 LDAPVlvError = type('LDAPVlvError', (LDAPFailedResult,), {})
 LDAPOther = type('LDAPOther', (LDAPFailedResult,), {})
+LDAPAssertionFailed = type('LDAPAssertionFailed', (LDAPFailedResult,), {})
 
 
 def _generate_exception(message, return_code=None, *args, **kwargs):
@@ -194,6 +199,7 @@ def _generate_exception(message, return_code=None, *args, **kwargs):
             -16: LDAPClientLoop,
             -17: LDAPReferralLimitExceeded,
             -18: LDAPXConnecting,
+            -100: LDAPBudgetExceeded,
             0x01: LDAPOperationsError,
             0x02: LDAPProtocolError,
             0x03: LDAPTimelimitExceeded,
@@ -236,6 +242,7 @@ def _generate_exception(message, return_code=None, *args, **kwargs):
             0x47: LDAPAffectsMultipleDsas,
             0x4c: LDAPVlvError,
             0x50: LDAPOther,
+            0x7a: LDAPAssertionFailed,
         }[return_code](str(message), return_code, *args, **kwargs)
     except KeyError:
         return LDAPError(str(message), None, *args, **kwargs)
@@ -0,0 +1,749 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""libldap.filter module
+
+This module provides helpers for building LDAP search filters (RFC 4515).
+
+Filters can be built as tree of Filter objects. Values are always escaped
+when the filter is rendered:
+
+    >>> from libldap.filter import And, Equal, Present
+    >>> str(And(Equal('objectClass', 'person'), Equal('cn', 'a*b'), Present('mail')))
+    '(&(objectClass=person)(cn=a\\\\2ab)(mail=*))'
+
+Param can be used as placeholder of value. compile() returns FilterTemplate,
+which substitutes escaped values only:
+
+    >>> from libldap.filter import Equal, Param
+    >>> template = Equal('uid', Param('uid')).compile()
+    >>> template(uid='user1')
+    '(uid=user1)'
+
+compile_filter() builds FilterTemplate from string with '{name}' slots, and
+caches it. So hot-path filters are parsed only once:
+
+    >>> from libldap.filter import compile_filter
+    >>> compile_filter('(&(objectClass=person)(uid={uid}))')(uid='user1')
+    '(&(objectClass=person)(uid=user1))'
+
+parse_filter() parses filter string into Filter tree. Filter can be evaluated
+against LDAP entries (e.g. entries returned by LDAP.search()) without server
+round trip. Attribute names and values are compared case-insensitively:
+
+    >>> from libldap.filter import parse_filter
+    >>> f = parse_filter('(&(objectClass=person)(|(uid=user*)(mail=*)))')
+    >>> f.match({'objectClass': [b'top', b'Person'], 'uid': [b'USER1']})
+    True
+
+To evaluate one filter over many entries, use matcher(). It returns function
+which is compiled once:
+
+    >>> match = f.matcher()
+    >>> [entry.dn for entry in entries if match(entry)]
+
+filter_fingerprint() strips values from filter, so that filters of same
+shape (e.g. for slow query analysis) have same fingerprint:
+
+    >>> from libldap.filter import filter_fingerprint
+    >>> filter_fingerprint('(&(uid=user1)(objectClass=person))')
+    '(&(objectclass=?)(uid=?))'
+"""
+
+import re
+from functools import lru_cache as _lru_cache
+from string import Formatter as _Formatter
+
+from .exceptions import LDAPError, _generate_exception
+
+__all__ = (
+    'Filter',
+    'And',
+    'Or',
+    'Not',
+    'Equal',
+    'Approx',
+    'GreaterOrEqual',
+    'LessOrEqual',
+    'Present',
+    'Substring',
+    'Param',
+    'FilterTemplate',
+    'compile_filter',
+    'escape_filter_value',
+    'filter_fingerprint',
+    'normalize_value',
+    'parse_filter',
+)
+
+_ESCAPE_CHARS = {
+    ord('*'): '\\2a',
+    ord('('): '\\28',
+    ord(')'): '\\29',
+    ord('\\'): '\\5c',
+    0: '\\00',
+}
+
+
+def escape_filter_value(value):
+    """
+    :param value:
+        Assertion value which is embedded in LDAP filter
+    :type value:
+        str or bytes
+
+    :returns:
+        Escaped value. '*', '(', ')', '\\' and NUL are always escaped.
+        If value is bytes, non-printable and non-ASCII octets are also escaped.
+    :rtype:
+        str
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return ''.join(chr(c) if 0x20 <= c < 0x7f and c not in _ESCAPE_CHARS
+                       else '\\%02x' % (c,) for c in value)
+    return str(value).translate(_ESCAPE_CHARS)
+
+
+class Param(object):
+    """Placeholder of assertion value in Filter
+
+    :param name:
+        Parameter name which is passed to FilterTemplate
+    :type name:
+        str
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'Param(%r)' % (self.name,)
+
+
+class FilterTemplate(object):
+    """Compiled LDAP filter
+
+    Literal parts of filter are rendered beforehand. Calling this object
+    substitutes escaped values for parameters.
+
+    :param parts:
+        List of literal str and Param
+    :type parts:
+        [str or Param]
+    """
+
+    def __init__(self, parts):
+        merged = []
+        for part in parts:
+            if isinstance(part, Param):
+                merged.append((None, part.name))
+            elif merged and merged[-1][1] is None:
+                merged[-1] = (merged[-1][0] + part, None)
+            else:
+                merged.append((part, None))
+        self._parts = tuple(merged)
+        self.params = tuple(sorted(set(name for _, name in merged if name is not None)))
+
+    def __repr__(self):
+        return 'FilterTemplate(%r)' % (self._pattern(),)
+
+    def _pattern(self):
+        return self.render(**dict((x, Param(x)) for x in self.params))
+
+    def render(self, **params):
+        """
+        :param `**params`:
+            Values for parameters
+
+        :returns:
+            LDAP filter string
+        :rtype:
+            str
+
+        :raises:
+            ValueError
+        """
+        result = []
+        for literal, name in self._parts:
+            if name is None:
+                result.append(literal)
+                continue
+            try:
+                value = params[name]
+            except KeyError:
+                raise ValueError('Missing filter parameter: %s' % (name,)) from None
+            if isinstance(value, Param):
+                result.append('{%s}' % (value.name,))
+            else:
+                result.append(escape_filter_value(value))
+        return ''.join(result)
+
+    __call__ = render
+
+
+@_lru_cache(maxsize=256)
+def compile_filter(template):
+    """
+    :param template:
+        LDAP filter string with '{name}' parameter slots.
+        Use '{{' and '}}' for literal braces.
+    :type template:
+        str
+
+    :returns:
+        Compiled filter. The result is cached, so same template is parsed only once.
+    :rtype:
+        FilterTemplate
+
+    :raises:
+        ValueError
+    """
+    parts = []
+    for literal, name, spec, conversion in _Formatter().parse(template):
+        if literal:
+            parts.append(literal)
+        if name is not None:
+            if not name or spec or conversion:
+                raise ValueError('Invalid filter parameter slot in %r' % (template,))
+            parts.append(Param(name))
+    return FilterTemplate(parts)
+
+
+class Filter(object):
+    """Base class of LDAP filter tree
+
+    Filters can be combined with '&', '|' and '~' operators.
+    """
+
+    _template = None
+    _match = None
+
+    def __str__(self):
+        return self.compile().render()
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.compile()._pattern())
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def compile(self):
+        """
+        :returns:
+            Compiled filter. The result is cached in this object.
+        :rtype:
+            FilterTemplate
+        """
+        if self._template is None:
+            parts = []
+            self._build(parts)
+            self._template = FilterTemplate(parts)
+        return self._template
+
+    def matcher(self):
+        """
+        :returns:
+            Function which receives LDAP entry (dict of attribute and list of
+            values) and returns whether the entry matches this filter or not.
+            The result is cached in this object.
+        :rtype:
+            function
+
+        :raises:
+            ValueError
+        """
+        if self._match is None:
+            self._match = self._matcher()
+        return self._match
+
+    def match(self, entry):
+        """
+        :param entry:
+            LDAP entry
+        :type entry:
+            _DictEntry, _OrderedEntry or dict
+
+        :returns:
+            Entry matches this filter or not
+        :rtype:
+            bool
+        """
+        return self.matcher()(entry)
+
+    def _build(self, parts):
+        raise NotImplementedError
+
+    def _matcher(self):
+        raise NotImplementedError
+
+    def _fingerprint(self):
+        raise NotImplementedError
+
+
+_ASCII = bytes(range(0x80))
+
+
+# Attributes of DN syntax. Their values are compared as DN by equality matching.
+_DN_ATTRIBUTES = frozenset([
+    'member',
+    'uniquemember',
+    'memberof',
+    'owner',
+    'seealso',
+    'manager',
+    'secretary',
+    'roleoccupant',
+    'creatorsname',
+    'modifiersname',
+    'entrydn',
+])
+
+
+def normalize_value(value, attribute=None):
+    """
+    :param value:
+        Attribute value or assertion value
+    :param attribute:
+        Attribute name (the default is None, which implies value is not
+        normalized as DN)
+
+    :type value:
+        str or bytes
+    :type attribute:
+        str or None
+
+    :returns:
+        Value which is compared by equality matching. This is case-folded,
+        and values of DN-syntax attributes (e.g. member) are normalized as DN.
+    :rtype:
+        str
+
+    :raises:
+        ValueError
+    """
+    if isinstance(value, Param):
+        raise ValueError('Filter with Param cannot be evaluated: %r' % (value,))
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value).decode('utf-8', 'replace')
+    if attribute is not None and attribute.lower() in _DN_ATTRIBUTES:
+        # Imported here because libldap.core imports this module
+        from .core import _normalize_dn
+        return _normalize_dn(str(value))
+    return str(value).casefold()
+
+
+def _normalize_fast(value):
+    # Fast path: ASCII values returned by LDAP server are compared as bytes.
+    # Others are decoded and case-folded.
+    if value.__class__ is bytes and not value.translate(None, _ASCII):
+        return value.lower()
+    return normalize_value(value)
+
+
+def _assertion(value):
+    # Return assertion value for both str and bytes normalized values
+    value = normalize_value(value)
+    return value, value.encode('utf-8')
+
+
+def _values_getter(attribute):
+    lower = attribute.lower()
+
+    def get(entry):
+        values = entry.get(attribute)
+        if values is not None:
+            return values
+        for key, values in entry.items():
+            if key.lower() == lower:
+                return values
+        return ()
+    return get
+
+
+class _Composite(Filter):
+    _operator = None
+
+    def __init__(self, *filters):
+        if not filters:
+            raise ValueError('%s requires at least one filter' % (self.__class__.__name__,))
+        self.filters = filters
+
+    def _build(self, parts):
+        parts.append('(' + self._operator)
+        for item in self.filters:
+            item._build(parts)
+        parts.append(')')
+
+    def _fingerprint(self):
+        # Order and repetition of same shape (e.g. '(|(uid=a)(uid=b))') are ignored
+        return '(%s%s)' % (self._operator, ''.join(sorted(set(x._fingerprint() for x in self.filters))))
+
+
+class And(_Composite):
+    """'(&(filter1)(filter2)...)'"""
+    _operator = '&'
+
+    def _matcher(self):
+        matchers = tuple(x.matcher() for x in self.filters)
+
+        def match(entry):
+            for m in matchers:
+                if not m(entry):
+                    return False
+            return True
+        return match
+
+
+class Or(_Composite):
+    """'(|(filter1)(filter2)...)'"""
+    _operator = '|'
+
+    def _matcher(self):
+        matchers = tuple(x.matcher() for x in self.filters)
+
+        def match(entry):
+            for m in matchers:
+                if m(entry):
+                    return True
+            return False
+        return match
+
+
+class Not(Filter):
+    """'(!(filter))'"""
+
+    def __init__(self, filter):
+        self.filter = filter
+
+    def _build(self, parts):
+        parts.append('(!')
+        self.filter._build(parts)
+        parts.append(')')
+
+    def _matcher(self):
+        m = self.filter.matcher()
+        return lambda entry: not m(entry)
+
+    def _fingerprint(self):
+        return '(!%s)' % (self.filter._fingerprint(),)
+
+
+def _add_value(parts, value):
+    if isinstance(value, Param):
+        parts.append(value)
+    else:
+        parts.append(escape_filter_value(value))
+
+
+class _Item(Filter):
+    _operator = None
+
+    def __init__(self, attribute, value):
+        self.attribute = attribute
+        self.value = value
+
+    def _build(self, parts):
+        parts.append('(%s%s' % (self.attribute, self._operator))
+        _add_value(parts, self.value)
+        parts.append(')')
+
+    def _fingerprint(self):
+        return '(%s%s?)' % (self.attribute.lower(), self._operator)
+
+
+class Equal(_Item):
+    """'(attribute=value)'"""
+    _operator = '='
+
+    def _matcher(self):
+        get = _values_getter(self.attribute)
+        if self.attribute.lower() in _DN_ATTRIBUTES:
+            return self._dn_matcher(get)
+        expected, expected_bytes = _assertion(self.value)
+
+        def match(entry):
+            for value in get(entry):
+                value = _normalize_fast(value)
+                if value == (expected_bytes if value.__class__ is bytes else expected):
+                    return True
+            return False
+        return match
+
+    def _dn_matcher(self, get):
+        attribute = self.attribute
+        expected = normalize_value(self.value, attribute)
+
+        def match(entry):
+            for value in get(entry):
+                if normalize_value(value, attribute) == expected:
+                    return True
+            return False
+        return match
+
+
+class Approx(Equal):
+    """'(attribute~=value)'
+
+    Approximate matching is evaluated as equality matching on client side.
+    """
+    _operator = '~='
+
+
+class _Ordering(_Item):
+    def _matcher(self):
+        get = _values_getter(self.attribute)
+        expected, expected_bytes = _assertion(self.value)
+        try:
+            number = int(expected)
+        except ValueError:
+            number = None
+        compare = self._compare
+
+        def match(entry):
+            for value in get(entry):
+                value = _normalize_fast(value)
+                if number is not None:
+                    try:
+                        if compare(int(value), number):
+                            return True
+                        continue
+                    except ValueError:
+                        pass
+                if compare(value, expected_bytes if value.__class__ is bytes else expected):
+                    return True
+            return False
+        return match
+
+
+class GreaterOrEqual(_Ordering):
+    """'(attribute>=value)'
+
+    If both values are integer, they are compared numerically.
+    """
+    _operator = '>='
+
+    @staticmethod
+    def _compare(x, y):
+        return x >= y
+
+
+class LessOrEqual(_Ordering):
+    """'(attribute<=value)'
+
+    If both values are integer, they are compared numerically.
+    """
+    _operator = '<='
+
+    @staticmethod
+    def _compare(x, y):
+        return x <= y
+
+
+class Present(Filter):
+    """'(attribute=*)'"""
+
+    def __init__(self, attribute):
+        self.attribute = attribute
+
+    def _build(self, parts):
+        parts.append('(%s=*)' % (self.attribute,))
+
+    def _fingerprint(self):
+        return '(%s=*)' % (self.attribute.lower(),)
+
+    def _matcher(self):
+        get = _values_getter(self.attribute)
+        return lambda entry: len(get(entry)) > 0
+
+
+class Substring(Filter):
+    """'(attribute=initial*any1*any2*final)'"""
+
+    def __init__(self, attribute, initial=None, any=(), final=None):
+        if initial is None and not any and final is None:
+            raise ValueError('Substring requires initial, any or final')
+        self.attribute = attribute
+        self.initial = initial
+        self.any = tuple(any)
+        self.final = final
+
+    def _build(self, parts):
+        parts.append('(%s=' % (self.attribute,))
+        if self.initial is not None:
+            _add_value(parts, self.initial)
+        parts.append('*')
+        for value in self.any:
+            _add_value(parts, value)
+            parts.append('*')
+        if self.final is not None:
+            _add_value(parts, self.final)
+        parts.append(')')
+
+    def _fingerprint(self):
+        # Position of values matters for indexes, but the number of 'any' does not
+        return '(%s=%s*%s%s)' % (self.attribute.lower(),
+                                 '?' if self.initial is not None else '',
+                                 '?*' if self.any else '',
+                                 '?' if self.final is not None else '')
+
+    def _matcher(self):
+        get = _values_getter(self.attribute)
+        pieces = [_assertion(x if x is not None else '') for x in (self.initial,) + self.any + (self.final,)]
+        # Index 0 is used for str values and index 1 is used for bytes values
+        patterns = tuple((x[0][i], tuple(y[i] for y in x[1:-1]), x[-1][i])
+                         for x in (pieces,) for i in (0, 1))
+        minimum = (sum(len(x[0]) for x in pieces), sum(len(x[1]) for x in pieces))
+
+        def match(entry):
+            for value in get(entry):
+                value = _normalize_fast(value)
+                i = value.__class__ is bytes
+                initial, any, final = patterns[i]
+                if len(value) < minimum[i] or not value.startswith(initial) or not value.endswith(final):
+                    continue
+                end = len(value) - len(final)
+                pos = len(initial)
+                for x in any:
+                    pos = value.find(x, pos, end)
+                    if pos == -1:
+                        break
+                    pos += len(x)
+                else:
+                    return True
+            return False
+        return match
+
+
+_ITEM_RE = re.compile(r'([A-Za-z0-9][A-Za-z0-9;.-]*)(~=|>=|<=|=)([^()]*)', re.DOTALL)
+_ESCAPED_RE = re.compile(r'(\\[0-9A-Fa-f]{2})')
+
+
+def _filter_error(text):
+    return _generate_exception('Bad search filter: %r' % (text,), -7)
+
+
+def _unescape(text, original):
+    if '\\' not in text:
+        return text
+    raw = []
+    for index, part in enumerate(_ESCAPED_RE.split(text)):
+        if index % 2:
+            raw.append(bytes((int(part[1:], 16),)))
+        elif '\\' in part:
+            raise _filter_error(original)
+        else:
+            raw.append(part.encode('utf-8'))
+    raw = b''.join(raw)
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw
+
+
+def _parse_item(text, original):
+    matched = _ITEM_RE.fullmatch(text)
+    if matched is None:
+        raise _filter_error(original)
+    attribute, operator, value = matched.groups()
+    if operator == '~=':
+        return Approx(attribute, _unescape(value, original))
+    elif operator == '>=':
+        return GreaterOrEqual(attribute, _unescape(value, original))
+    elif operator == '<=':
+        return LessOrEqual(attribute, _unescape(value, original))
+    elif value == '*':
+        return Present(attribute)
+    elif '*' in value:
+        pieces = [_unescape(x, original) for x in value.split('*')]
+        return Substring(attribute,
+                         pieces[0] if pieces[0] != '' else None,
+                         [x for x in pieces[1:-1] if x != ''],
+                         pieces[-1] if pieces[-1] != '' else None)
+    else:
+        return Equal(attribute, _unescape(value, original))
+
+
+def _parse(text, pos, original):
+    # text[pos] is '('
+    pos += 1
+    if pos >= len(text):
+        raise _filter_error(original)
+    operator = text[pos]
+    if operator in '&|!':
+        pos += 1
+        filters = []
+        while pos < len(text) and text[pos] == '(':
+            item, pos = _parse(text, pos, original)
+            filters.append(item)
+        if pos >= len(text) or text[pos] != ')' or not filters:
+            raise _filter_error(original)
+        if operator == '!':
+            if len(filters) != 1:
+                raise _filter_error(original)
+            return Not(filters[0]), pos + 1
+        return (And if operator == '&' else Or)(*filters), pos + 1
+    end = text.find(')', pos)
+    if end == -1:
+        raise _filter_error(original)
+    return _parse_item(text[pos:end], original), end + 1
+
+
+@_lru_cache(maxsize=256)
+def parse_filter(text):
+    """
+    :param text:
+        LDAP filter string (RFC 4515). Parentheses around simple filter can be omitted.
+        Extensible match is not supported.
+    :type text:
+        str
+
+    :returns:
+        Filter tree. The result is cached, so same filter is parsed only once.
+    :rtype:
+        Filter
+
+    :raises:
+        LDAPFilterError
+    """
+    stripped = text.strip()
+    if not stripped.startswith('('):
+        stripped = '(%s)' % (stripped,)
+    result, pos = _parse(stripped, 0, text)
+    if pos != len(stripped):
+        raise _filter_error(text)
+    return result
+
+
+_VALUE_RE = re.compile(r'=(?!\*\))[^()]*\)')
+
+
+@_lru_cache(maxsize=1024)
+def _fingerprint(text):
+    try:
+        return parse_filter(text)._fingerprint()
+    except LDAPError:
+        # Extensible match and broken filters: values are stripped only
+        return _VALUE_RE.sub('=?)', text.strip()).lower()
+
+
+def filter_fingerprint(filter):
+    """
+    :param filter:
+        LDAP filter
+    :type filter:
+        str or Filter
+
+    :returns:
+        Filter whose values are replaced with '?'. Attribute names are
+        lower-cased, and operands of '&' and '|' are sorted and deduplicated.
+    :rtype:
+        str
+    """
+    if isinstance(filter, Filter):
+        return filter._fingerprint()
+    return _fingerprint(filter)
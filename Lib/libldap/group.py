@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""libldap.group module
+
+This module provides GroupResolver, which resolves nested group membership.
+
+GroupResolver expands groups breadth-first. DNs in the same level are fetched
+by subtree searches under *base* whose filters are
+'(|(entryDN=dn1)(entryDN=dn2)...)' of up to *chunk* DNs (see
+LDAP.lookup_many()). Direct members of each DN and transitive members of each
+group are memoized until *ttl* seconds pass or invalidate() is called, so
+repeated questions are answered without LDAP server round trip.
+
+Memoized members are not invalidated by changes on LDAP server, including
+changes by modify(), delete() and rename() of the same LDAP instance. Call
+invalidate() after changing groups, or use short *ttl*.
+
+    >>> from libldap import LDAP, GroupResolver
+    >>> ld = LDAP('ldap://localhost')
+    >>> ld.bind('cn=master,dc=example,dc=com', 'secret')
+    >>> resolver = GroupResolver(ld, 'dc=example,dc=com')
+    >>> resolver.is_member('uid=user1,ou=Users,dc=example,dc=com',
+    ...                    'cn=all,ou=Groups,dc=example,dc=com')
+    True
+"""
+
+import time
+
+from .constants import LDAP_SCOPE_SUB
+from .core import _normalize_dn
+from .filter import Present
+
+__all__ = (
+    'GroupResolver',
+)
+
+
+class GroupResolver(object):
+    """GroupResolver resolves transitive group membership
+
+    :param ldap:
+        LDAP instance which is used for searching
+    :param base:
+        DN of the entry at which to start the search in preload()
+    :param member_attribute:
+        Attribute which has DN of members (the default is 'member')
+    :param ttl:
+        Seconds while memoized members are valid (the default is 300).
+        Zero or negative value means they never expire.
+    :param chunk:
+        Maximum number of DNs fetched by one search (the default is 100)
+    :param dn_attribute:
+        Attribute which has DN of entry and can be used in equality filter
+        (the default is 'entryDN' of OpenLDAP, which is 'distinguishedName'
+        on Active Directory). If None, each DN is fetched by its own base
+        scope search, which also finds DNs outside *base*.
+
+    :type ldap:
+        LDAP
+    :type base:
+        str
+    :type member_attribute:
+        str
+    :type ttl:
+        int or float
+    :type chunk:
+        int
+    :type dn_attribute:
+        str or None
+    """
+
+    def __init__(self, ldap, base, member_attribute='member', ttl=300, chunk=100,
+                 dn_attribute='entryDN'):
+        self.ldap = ldap
+        self.base = base
+        self.member_attribute = member_attribute
+        self.ttl = ttl
+        self.chunk = chunk
+        self.dn_attribute = dn_attribute
+        #: DNs of expanded groups which contain themselves transitively.
+        #: Only the group given to members() or is_member() is recorded, so
+        #: other groups in the same cycle are added when they are expanded.
+        self.cycles = set()
+        self._direct = {}      # normalized DN -> (expires, {normalized DN: DN})
+        self._transitive = {}  # normalized DN -> (expires, {normalized DN: DN})
+        self._preloaded = None  # (expires,) while all groups are in self._direct
+        self._invalidated = set()  # normalized DNs invalidated after preload()
+
+    def _expires(self):
+        if self.ttl > 0:
+            return time.monotonic() + self.ttl
+        return None
+
+    @staticmethod
+    def _valid(cached, now):
+        return cached is not None and (cached[0] is None or cached[0] > now)
+
+    def _members_of(self, entry):
+        members = {}
+        for key, values in entry.items():
+            if key.lower() == self.member_attribute.lower():
+                for value in values:
+                    if isinstance(value, bytes):
+                        value = value.decode('utf-8')
+                    members[_normalize_dn(value)] = value
+        return members
+
+    def _fetch(self, dns):
+        # Fetch direct members of dns. Normalized DNs are looked up, so that
+        # DN values returned by LDAP server are matched regardless of spaces.
+        ndns = [_normalize_dn(dn) for dn in dns]
+        found = self.ldap.lookup_many(self.dn_attribute or 'dn', ndns, self.base,
+                                      attributes=[self.member_attribute], chunk=self.chunk)
+        entries = dict((_normalize_dn(entry.dn), entry) for entry in found.values())
+        expires = self._expires()
+        for ndn in ndns:
+            entry = entries.get(ndn)
+            members = self._members_of(entry) if entry is not None else {}
+            self._direct[ndn] = (expires, members)
+            self._invalidated.discard(ndn)
+
+    def preload(self, filter=None):
+        """
+        Load all groups under *base* by paged search. Until *ttl* seconds pass,
+        DNs which are not loaded are regarded as non-group entries, so that
+        expansion needs no LDAP server round trip.
+
+        :param filter:
+            LDAP filter for groups (the default is None,
+            which implies '(member_attribute=*)')
+        :type filter:
+            str, Filter or None
+
+        :returns:
+            Number of loaded groups
+        :rtype:
+            int
+
+        :raises:
+            LDAPError
+        """
+        if filter is None:
+            filter = Present(self.member_attribute)
+        expires = self._expires()
+        count = 0
+        for entry in self.ldap.paged_search(self.base, LDAP_SCOPE_SUB, filter,
+                                            attributes=[self.member_attribute]):
+            self._direct[_normalize_dn(entry.dn)] = (expires, self._members_of(entry))
+            count += 1
+        self._preloaded = (expires,)
+        self._invalidated.clear()
+        return count
+
+    def _expand(self, group_dn):
+        now = time.monotonic()
+        root = _normalize_dn(group_dn)
+        cached = self._transitive.get(root)
+        if self._valid(cached, now):
+            return cached[1]
+
+        members = {}
+        visited = set([root])
+        level = {root: group_dn}
+        while level:
+            if self._valid(self._preloaded, now):
+                # DNs which are not loaded are non-group entries unless invalidated
+                unknown = [dn for ndn, dn in level.items() if ndn in self._invalidated]
+            else:
+                unknown = [dn for ndn, dn in level.items()
+                           if not self._valid(self._direct.get(ndn), now)]
+            for i in range(0, len(unknown), self.chunk):
+                self._fetch(unknown[i:i + self.chunk])
+            next_level = {}
+            for ndn in level:
+                for member, dn in self._direct.get(ndn, (None, {}))[1].items():
+                    if member == root:
+                        # Group contains itself transitively
+                        self.cycles.add(group_dn)
+                        continue
+                    members[member] = dn
+                    if member not in visited:
+                        # Visited groups (cycles and diamonds) are not expanded again
+                        visited.add(member)
+                        next_level[member] = dn
+            level = next_level
+        self._transitive[root] = (self._expires(), members)
+        return members
+
+    def members(self, group_dn):
+        """
+        :param group_dn:
+            DN of group
+
+        :type group_dn:
+            str
+
+        :returns:
+            DNs of transitive members (members of nested groups are included)
+        :rtype:
+            set
+
+        :raises:
+            LDAPError
+        """
+        return set(self._expand(group_dn).values())
+
+    def is_member(self, dn, group_dn):
+        """
+        :param dn:
+            DN of user (or group)
+        :param group_dn:
+            DN of group
+
+        :type dn:
+            str
+        :type group_dn:
+            str
+
+        :returns:
+            dn is member of group_dn transitively or not
+        :rtype:
+            bool
+
+        :raises:
+            LDAPError
+        """
+        return _normalize_dn(dn) in self._expand(group_dn)
+
+    def invalidate(self, dn=None):
+        """
+        Drop memoized members. Call this method after changing group members.
+
+        :param dn:
+            DN of changed entry (the default is None, which implies all memoized
+            members are dropped)
+        :type dn:
+            str or None
+        """
+        if dn is None:
+            self._direct.clear()
+            self._transitive.clear()
+            self._preloaded = None
+            self._invalidated.clear()
+            self.cycles.clear()
+            return
+        ndn = _normalize_dn(dn)
+        self._direct.pop(ndn, None)
+        if self._preloaded is not None:
+            self._invalidated.add(ndn)
+        for key in [k for k, v in self._transitive.items() if k == ndn or ndn in v[1]]:
+            del self._transitive[key]
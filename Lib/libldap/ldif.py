@@ -0,0 +1,644 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""libldap.ldif module
+
+This module provides LDIF (RFC 2849) writer, reader and importer.
+
+LDIFWriter writes each entry as soon as it is given, so entries from
+LDAP.paged_search() are exported with constant memory:
+
+    >>> from libldap import LDAP, LDAP_SCOPE_SUB
+    >>> from libldap.ldif import export_ldif
+    >>> ld = LDAP('ldap://localhost')
+    >>> ld.bind('cn=master,dc=example,dc=com', 'secret')
+    >>> writer = export_ldif(ld, 'dc=example,dc=com', '/tmp/snapshot.ldif.gz', LDAP_SCOPE_SUB)
+    >>> writer.entries, writer.entries_per_second
+    (100000, 52341.7)
+
+LDIFReader parses content and change records one by one. LDIFImporter sends
+them by asynchronous add(), modify(), delete() and rename() over several
+connections, keeping at most *window* requests in flight per connection:
+
+    >>> from libldap import LDAP
+    >>> from libldap.ldif import import_ldif
+    >>> connections = [LDAP('ldap://localhost') for _ in range(4)]
+    >>> for ld in connections:
+    ...     ld.bind('cn=master,dc=example,dc=com', 'secret')
+    ...
+    >>> importer = import_ldif(connections, '/tmp/snapshot.ldif.gz',
+    ...                        checkpoint='/tmp/snapshot.checkpoint')
+    >>> importer.completed, len(importer.errors), importer.records_per_second
+    (100000, 0, 8512.3)
+
+If importing is interrupted, same call resumes after the records recorded
+in checkpoint file.
+"""
+
+import base64
+import bz2
+import gzip
+import lzma
+import os
+import re
+import time
+from collections import deque as _deque
+from collections import namedtuple as _namedtuple
+from urllib.parse import urlparse as _urlparse
+from urllib.request import url2pathname as _url2pathname
+
+from .constants import (
+        LDAP_MOD_ADD,
+        LDAP_MOD_DELETE,
+        LDAP_MOD_INCREMENT,
+        LDAP_MOD_REPLACE,
+        LDAP_SCOPE_SUB,
+)
+from .core import LDAP_SUCCESS, _normalize_dn, _parent_dn, _split_dn
+from .exceptions import _generate_exception
+
+__all__ = (
+    'LDIFWriter',
+    'LDIFReader',
+    'LDIFRecord',
+    'LDIFImporter',
+    'export_ldif',
+    'import_ldif',
+)
+
+_SAFE_STRING = re.compile(b'(?:[\x01-\x09\x0b\x0c\x0e-\x1f\x21-\x39\x3b\x3d-\x7f]'
+                          b'[\x01-\x09\x0b\x0c\x0e-\x7f]*)?\\Z')
+
+_OPENERS = {
+    None: open,
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+
+def _guess_compress(path):
+    for suffix, compress in (('.gz', 'gzip'), ('.bz2', 'bz2'), ('.xz', 'xz')):
+        if path.endswith(suffix):
+            return compress
+    return None
+
+
+class LDIFWriter(object):
+    """LDIFWriter writes LDAP entries in LDIF format
+
+    :param output:
+        Binary file-like object which has write() method
+        (e.g. file, socket.makefile('wb'), gzip.GzipFile)
+    :param cols:
+        Maximum line length. Longer lines are folded (the default is 76).
+        Zero means lines are not folded.
+    :param version:
+        Flag for writing 'version: 1' line or not (the default is True)
+
+    :type output:
+        file-like object
+    :type cols:
+        int
+    :type version:
+        bool
+    """
+
+    def __init__(self, output, cols=76, version=True):
+        self.output = output
+        self.cols = cols
+        self.entries = 0
+        self.bytes = 0
+        self._started = time.monotonic()
+        if version:
+            self._write(b'version: 1\n\n')
+
+    @property
+    def elapsed(self):
+        """Seconds since this writer is created"""
+        return time.monotonic() - self._started
+
+    @property
+    def entries_per_second(self):
+        """Throughput of written entries"""
+        elapsed = self.elapsed
+        return self.entries / elapsed if elapsed > 0 else 0.0
+
+    def _write(self, data):
+        self.output.write(data)
+        self.bytes += len(data)
+
+    def _line(self, lines, name, value):
+        if _SAFE_STRING.match(value) and not value.endswith(b' '):
+            line = name + b': ' + value
+        else:
+            line = name + b':: ' + base64.b64encode(value)
+        cols = self.cols
+        if cols and len(line) > cols:
+            lines.append(line[:cols])
+            for i in range(cols, len(line), cols - 1):
+                lines.append(b' ' + line[i:i + cols - 1])
+        else:
+            lines.append(line)
+
+    def write(self, entry):
+        """
+        :param entry:
+            LDAP entry which has 'dn' attribute. Values are str or bytes.
+        :type entry:
+            _DictEntry or _OrderedEntry
+        """
+        lines = []
+        self._line(lines, b'dn', entry.dn.encode('utf-8'))
+        for attribute, values in entry.items():
+            name = attribute.encode('utf-8')
+            for value in values:
+                if isinstance(value, str):
+                    value = value.encode('utf-8')
+                self._line(lines, name, value)
+        lines.append(b'\n')
+        self._write(b'\n'.join(lines))
+        self.entries += 1
+
+    def write_entries(self, entries):
+        """
+        :param entries:
+            LDAP entries (e.g. generator returned by LDAP.paged_search())
+        :type entries:
+            iterable
+
+        :returns:
+            Number of written entries
+        :rtype:
+            int
+        """
+        count = 0
+        for entry in entries:
+            self.write(entry)
+            count += 1
+        return count
+
+
+def export_ldif(ldap, base, output, scope=LDAP_SCOPE_SUB, filter='(objectClass=*)',
+                attributes=None, pagesize=500, compress=None, cols=76):
+    """
+    :param ldap:
+        LDAP instance
+    :param base:
+        DN of the entry at which to start the search.
+    :param output:
+        File path or binary file-like object
+    :param scope:
+        Scope of the search (the default is LDAP_SCOPE_SUB)
+    :param filter:
+        LDAP filter (the default is '(objectClass=*)')
+    :param attributes:
+        Attributes for fetching from LDAP server (the default is None,
+        which implies '*')
+    :param pagesize:
+        LDAP page size (the default is 500)
+    :param compress:
+        'gzip', 'bz2', 'xz' or None. If output is path and this is None,
+        compression is chosen by the suffix of path (the default is None)
+    :param cols:
+        Maximum line length (the default is 76)
+
+    :type ldap:
+        LDAP
+    :type base:
+        str
+    :type output:
+        str or file-like object
+    :type scope:
+        int
+    :type filter:
+        str or Filter
+    :type attributes:
+        [str] or None
+    :type pagesize:
+        int
+    :type compress:
+        str or None
+    :type cols:
+        int
+
+    :returns:
+        Writer which has statistics (entries, bytes, entries_per_second)
+    :rtype:
+        LDIFWriter
+
+    :raises:
+        LDAPError
+    """
+    entries = ldap.paged_search(base, scope, filter, attributes, pagesize=pagesize)
+    if isinstance(output, str):
+        if compress is None:
+            compress = _guess_compress(output)
+        with _OPENERS[compress](output, 'wb') as f:
+            writer = LDIFWriter(f, cols=cols)
+            writer.write_entries(entries)
+    else:
+        if compress is not None:
+            output = _OPENERS[compress](output, 'wb')
+        writer = LDIFWriter(output, cols=cols)
+        writer.write_entries(entries)
+        if compress is not None:
+            output.close()
+    return writer
+
+
+#: LDIF record. *changes* varies by *changetype*:
+#:
+#: * 'add'    - [(attr, [bytes])]
+#: * 'modify' - [(attr, [bytes], mod_op)]
+#: * 'delete' - None
+#: * 'modrdn' - (newrdn, deleteoldrdn, newsuperior or None)
+#:
+#: *index* is the position of record (starts from 0) and *line* is the line
+#: number where record starts.
+LDIFRecord = _namedtuple('LDIFRecord', ('index', 'line', 'dn', 'changetype', 'changes'))
+
+_MOD_OPS = {
+    'add': LDAP_MOD_ADD,
+    'delete': LDAP_MOD_DELETE,
+    'replace': LDAP_MOD_REPLACE,
+    'increment': LDAP_MOD_INCREMENT,
+}
+
+
+class LDIFReader(object):
+    """LDIFReader parses LDIF content and change records
+
+    Records are parsed one by one while iterating, so large LDIF file is
+    read with constant memory.
+
+    :param input:
+        Binary file-like object or iterable of bytes lines
+
+    :type input:
+        file-like object
+
+    :raises:
+        ValueError
+    """
+
+    def __init__(self, input):
+        self.input = input
+
+    def _logical_lines(self):
+        # Yield (line number, line) of unfolded lines. None is yielded for
+        # blank line which separates records.
+        current = None
+        start = 0
+        number = 0
+        for raw in self.input:
+            number += 1
+            line = raw.rstrip(b'\r\n')
+            if line.startswith(b' '):
+                if current is None:
+                    raise ValueError('Invalid LDIF at line %d: unexpected continuation' % (number,))
+                current += line[1:]
+                continue
+            if current is not None and not current.startswith(b'#'):
+                yield start, current
+            current = None
+            if not line:
+                yield number, None
+            else:
+                current = line
+                start = number
+        if current is not None and not current.startswith(b'#'):
+            yield start, current
+        yield number + 1, None
+
+    @staticmethod
+    def _split(number, line):
+        try:
+            name, value = line.split(b':', 1)
+        except ValueError:
+            raise ValueError('Invalid LDIF at line %d: missing ":"' % (number,)) from None
+        name = name.decode('utf-8').strip()
+        if value.startswith(b':'):
+            value = base64.b64decode(value[1:].strip())
+        elif value.startswith(b'<'):
+            url = _urlparse(value[1:].strip().decode('utf-8'))
+            if url.scheme != 'file':
+                raise ValueError('Invalid LDIF at line %d: unsupported URL' % (number,))
+            with open(_url2pathname(url.path), 'rb') as f:
+                value = f.read()
+        else:
+            value = value.lstrip(b' ')
+        return name, value
+
+    @staticmethod
+    def _attributes(lines):
+        attributes = []
+        for name, value, _ in lines:
+            if attributes and attributes[-1][0] == name:
+                attributes[-1][1].append(value)
+            else:
+                attributes.append((name, [value]))
+        return attributes
+
+    def _record(self, index, lines):
+        start = lines[0][0]
+        name, dn = self._split(*lines[0])
+        if name.lower() != 'dn':
+            raise ValueError('Invalid LDIF at line %d: record MUST start with dn' % (start,))
+        dn = dn.decode('utf-8')
+        lines = [self._split(number, line) + (number,) for number, line in lines[1:]]
+        # Controls are not supported, so they are skipped
+        while lines and lines[0][0].lower() == 'control':
+            lines.pop(0)
+        if not lines or lines[0][0].lower() != 'changetype':
+            return LDIFRecord(index, start, dn, 'add', self._attributes(lines))
+
+        changetype = lines.pop(0)[1].decode('utf-8').strip().lower()
+        if changetype == 'add':
+            return LDIFRecord(index, start, dn, 'add', self._attributes(lines))
+        elif changetype == 'delete':
+            return LDIFRecord(index, start, dn, 'delete', None)
+        elif changetype in ('modrdn', 'moddn'):
+            values = dict((name.lower(), value.decode('utf-8')) for name, value, _ in lines)
+            try:
+                return LDIFRecord(index, start, dn, 'modrdn', (values['newrdn'],
+                                                               values.get('deleteoldrdn', '0').strip() == '1',
+                                                               values.get('newsuperior')))
+            except KeyError:
+                raise ValueError('Invalid LDIF at line %d: modrdn requires newrdn' % (start,)) from None
+        elif changetype == 'modify':
+            changes = []
+            current = None
+            for name, value, number in lines:
+                if current is None:
+                    mod_op = _MOD_OPS.get(name.lower())
+                    if mod_op is None:
+                        raise ValueError('Invalid LDIF at line %d: unknown modify operation' % (number,))
+                    current = (value.decode('utf-8').strip(), [], mod_op)
+                elif name == '-':
+                    changes.append(current)
+                    current = None
+                elif name.lower() == current[0].lower():
+                    current[1].append(value)
+                else:
+                    raise ValueError('Invalid LDIF at line %d: unexpected attribute' % (number,))
+            if current is not None:
+                changes.append(current)
+            return LDIFRecord(index, start, dn, 'modify', changes)
+        raise ValueError('Invalid LDIF at line %d: unknown changetype' % (start,))
+
+    def __iter__(self):
+        lines = []
+        index = 0
+        for number, line in self._logical_lines():
+            if line == b'-':
+                # Separator of modify operations
+                line = b'-:'
+            if line is not None:
+                if not lines and line.lower().startswith(b'version:'):
+                    continue
+                lines.append((number, line))
+            elif lines:
+                yield self._record(index, lines)
+                index += 1
+                lines = []
+
+
+def _open_input(input):
+    if isinstance(input, str):
+        compress = _guess_compress(input)
+        return _OPENERS[compress](input, 'rb')
+    return input
+
+
+class LDIFImporter(object):
+    """LDIFImporter sends LDIF records to LDAP server
+
+    Records are sent by asynchronous operations. Each connection has at most
+    *window* requests in flight. Record is not sent while its superior or
+    its subordinate entry is in flight, so entries of tree are applied in
+    order of LDIF. Renames (modrdn and moddn) hold both the old DN and the
+    new DN, so records in either subtree wait for them.
+
+    :param connections:
+        LDAP instances which have already been bound
+    :param window:
+        Maximum number of requests in flight per connection (the default is 32)
+    :param checkpoint:
+        File path where index of last completed record is saved (the default
+        is None, which implies checkpoint is not saved). If this file exists,
+        records up to saved index are skipped.
+    :param checkpoint_interval:
+        Checkpoint is saved every this number of records (the default is 1000)
+    :param stop_on_error:
+        Flag for raising LDAPError when record fails or not (the default is
+        False, which implies failures are recorded in *errors*)
+    :param timeout:
+        Timeout for each result (the default is 0, which implies wait forever)
+
+    :type connections:
+        [LDAP]
+    :type window:
+        int
+    :type checkpoint:
+        str or None
+    :type checkpoint_interval:
+        int
+    :type stop_on_error:
+        bool
+    :type timeout:
+        int
+    """
+
+    def __init__(self, connections, window=32, checkpoint=None, checkpoint_interval=1000,
+                 stop_on_error=False, timeout=0):
+        if not connections or window < 1:
+            raise ValueError("Invalid parameter: 'connections' and 'window' MUST not be empty")
+        self.connections = list(connections)
+        self.window = window
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.stop_on_error = stop_on_error
+        self.timeout = timeout
+        #: Number of records which have been applied
+        self.completed = 0
+        #: Number of records which are skipped by checkpoint
+        self.skipped = 0
+        #: List of (LDIFRecord, LDAPError)
+        self.errors = []
+        self._pending = [_deque() for _ in self.connections]
+        self._inflight = {}   # normalized DN -> connection number
+        self._done = set()    # indexes of records completed out of order
+        self._watermark = -1  # every record up to this index is completed
+        self._started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        """Seconds since this importer is created"""
+        return time.monotonic() - self._started
+
+    @property
+    def records_per_second(self):
+        """Throughput of applied records"""
+        elapsed = self.elapsed
+        return (self.completed + len(self.errors)) / elapsed if elapsed > 0 else 0.0
+
+    def _load_checkpoint(self):
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return -1
+        with open(self.checkpoint) as f:
+            return int(f.read().strip() or -1)
+
+    def _save_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        tmp = '%s.tmp' % (self.checkpoint,)
+        with open(tmp, 'w') as f:
+            f.write('%d\n' % (self._watermark,))
+        os.replace(tmp, self.checkpoint)
+
+    def _send(self, ld, record):
+        if record.changetype == 'add':
+            return ld.add(record.dn, record.changes, async=True)
+        elif record.changetype == 'modify':
+            return ld.modify(record.dn, record.changes, async=True)
+        elif record.changetype == 'delete':
+            return ld.delete(record.dn, async=True)
+        else:
+            newrdn, deleteoldrdn, newsuperior = record.changes
+            return ld.rename(record.dn, newrdn, newsuperior, deleteoldrdn, async=True)
+
+    @staticmethod
+    def _target_dns(ndn, record):
+        # Normalized DNs which record holds while it is in flight
+        if record.changetype != 'modrdn':
+            return (ndn,)
+        newrdn, _, newsuperior = record.changes
+        if newsuperior is None:
+            newsuperior = _parent_dn(ndn)
+        return (ndn, _normalize_dn('%s,%s' % (newrdn, newsuperior) if newsuperior else newrdn))
+
+    def _complete(self, number):
+        msgid, ndns, record = self._pending[number].popleft()
+        for ndn in ndns:
+            if self._inflight.get(ndn) == number:
+                del self._inflight[ndn]
+        result = self.connections[number].result(msgid, timeout=self.timeout)
+        if result['return_code'] == LDAP_SUCCESS:
+            self.completed += 1
+        else:
+            error = _generate_exception(**result)
+            self.errors.append((record, error))
+            if self.stop_on_error:
+                raise error
+        self._done.add(record.index)
+        while self._watermark + 1 in self._done:
+            self._watermark += 1
+            self._done.remove(self._watermark)
+            if self._watermark % self.checkpoint_interval == 0:
+                self._save_checkpoint()
+
+    def _wait_for(self, number, ndn):
+        # Complete requests of connection until ndn is not in flight
+        while self._inflight.get(ndn) == number:
+            self._complete(number)
+
+    def _wait_for_related(self, ndn):
+        # Superiors (e.g. renamed subtree), the entry itself and subordinates
+        rdns = _split_dn(ndn)
+        for i in range(1, len(rdns)):
+            superior = ','.join(rdns[i:])
+            if superior in self._inflight:
+                self._wait_for(self._inflight[superior], superior)
+        if ndn in self._inflight:
+            self._wait_for(self._inflight[ndn], ndn)
+        suffix = ',' + ndn
+        for other, number in list(self._inflight.items()):
+            if other.endswith(suffix):
+                self._wait_for(number, other)
+
+    def run(self, records):
+        """
+        :param records:
+            LDIF records (e.g. LDIFReader)
+        :type records:
+            iterable of LDIFRecord
+
+        :returns:
+            Number of records which have been applied
+        :rtype:
+            int
+
+        :raises:
+            LDAPError
+        """
+        resume = self._load_checkpoint()
+        self._watermark = max(self._watermark, resume)
+        next_connection = 0
+        try:
+            for record in records:
+                if record.index <= resume:
+                    self.skipped += 1
+                    continue
+                ndns = self._target_dns(_normalize_dn(record.dn), record)
+                for ndn in ndns:
+                    self._wait_for_related(ndn)
+                number = next_connection
+                next_connection = (next_connection + 1) % len(self.connections)
+                if len(self._pending[number]) >= self.window:
+                    self._complete(number)
+                msgid = self._send(self.connections[number], record)
+                self._pending[number].append((msgid, ndns, record))
+                for ndn in ndns:
+                    self._inflight[ndn] = number
+            for number, pending in enumerate(self._pending):
+                while pending:
+                    self._complete(number)
+        finally:
+            self._save_checkpoint()
+        return self.completed
+
+
+def import_ldif(connections, input, window=32, checkpoint=None, stop_on_error=False):
+    """
+    :param connections:
+        LDAP instance or list of LDAP instances which have already been bound
+    :param input:
+        File path or binary file-like object. If path ends with '.gz', '.bz2'
+        or '.xz', it is decompressed.
+    :param window:
+        Maximum number of requests in flight per connection (the default is 32)
+    :param checkpoint:
+        File path of checkpoint (the default is None)
+    :param stop_on_error:
+        Flag for raising LDAPError when record fails or not (the default is False)
+
+    :type connections:
+        LDAP or [LDAP]
+    :type input:
+        str or file-like object
+    :type window:
+        int
+    :type checkpoint:
+        str or None
+    :type stop_on_error:
+        bool
+
+    :returns:
+        Importer which has statistics (completed, errors, records_per_second)
+    :rtype:
+        LDIFImporter
+
+    :raises:
+        LDAPError, ValueError
+    """
+    if not isinstance(connections, (list, tuple)):
+        connections = [connections]
+    importer = LDIFImporter(connections, window=window, checkpoint=checkpoint,
+                            stop_on_error=stop_on_error)
+    f = _open_input(input)
+    try:
+        importer.run(LDIFReader(f))
+    finally:
+        if f is not input:
+            f.close()
+    return importer
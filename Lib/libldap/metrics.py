@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""libldap.metrics module
+
+This module provides Metrics, opt-in registry of per-operation statistics.
+
+Metrics is given to LDAP instances (or LDAP.connect_many() for a pool).
+Each call of bind(), search(), add(), modify(), delete(), rename(),
+compare(), whoami(), passwd(), extended(), start_tls() and result() is
+counted with its latency, the number and bytes of returned entries, and
+LDAPError subclass if it fails. Synchronous operation is counted once, as
+it waits for its own result without result() being counted. result() (and
+search_result()) is counted when it is called for asynchronous operation.
+LDAP instance without Metrics only checks that its metrics attribute is None.
+
+    >>> from libldap import LDAP, Metrics
+    >>> metrics = Metrics()
+    >>> ld = LDAP('ldap://localhost', metrics=metrics)
+    >>> ld.bind('cn=master,dc=example,dc=com', 'secret')
+    >>> ld.search('dc=example,dc=com')
+    >>> print(metrics.prometheus())
+    # HELP libldap_operations_total Number of LDAP operations
+    # TYPE libldap_operations_total counter
+    libldap_operations_total{operation="bind"} 1
+    libldap_operations_total{operation="search"} 1
+    ...
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from .exceptions import LDAPError
+
+__all__ = (
+    'Metrics',
+)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ENTRY_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+class _Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+def _entries(result):
+    # Return (number, bytes) of entries in result of search() or result()
+    if not isinstance(result, list):
+        return None
+    count = size = 0
+    for entry in result:
+        if not isinstance(entry, dict) or 'return_code' in entry:
+            continue
+        count += 1
+        for key, values in entry.items():
+            if key == '__order__' or key == 'dn':
+                continue
+            size += len(key)
+            for value in values:
+                size += len(value)
+    return count, size
+
+
+def _format_bound(bound):
+    if bound == float('inf'):
+        return '+Inf'
+    return repr(float(bound))
+
+
+class Metrics(object):
+    """Metrics is registry of LDAP operation statistics
+
+    One Metrics can be shared by many LDAP instances. It is thread-safe.
+
+    :param namespace:
+        Prefix of metric names in prometheus() (the default is 'libldap')
+    :param buckets:
+        Upper bounds of latency histogram in seconds
+
+    :type namespace:
+        str
+    :type buckets:
+        tuple of float
+    """
+
+    def __init__(self, namespace='libldap', buckets=LATENCY_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all statistics except in-flight gauges"""
+        with self._lock:
+            #: Number of calls by operation
+            self.operations = {}
+            #: Number of failed calls by (operation, LDAPError subclass name)
+            self.errors = {}
+            #: Latency histogram by operation
+            self.latency = {}
+            #: Histogram of entries per call by operation
+            self.entries = {}
+            #: Bytes of entries (attribute names and values) by operation
+            self.bytes = {}
+            if not hasattr(self, 'in_flight'):
+                #: Number of running calls by operation
+                self.in_flight = {}
+
+    def measure(self, operation, method, ldap, args, kwargs):
+        """Call method and record its statistics as operation"""
+        with self._lock:
+            self.in_flight[operation] = self.in_flight.get(operation, 0) + 1
+        begin = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = method(ldap, *args, **kwargs)
+            return result
+        except LDAPError as e:
+            error = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - begin
+            with self._lock:
+                self.in_flight[operation] -= 1
+            self.observe(operation, seconds, error, _entries(result))
+
+    def observe(self, operation, seconds, error=None, entries=None):
+        """
+        Record one call. measure() calls this method, and this can be used
+        for operations outside LDAP class.
+
+        :param operation:
+            Operation name (e.g. 'search')
+        :param seconds:
+            Latency
+        :param error:
+            Name of LDAPError subclass or None
+        :param entries:
+            (number, bytes) of returned entries or None
+
+        :type operation:
+            str
+        :type seconds:
+            float
+        :type error:
+            str or None
+        :type entries:
+            (int, int) or None
+        """
+        with self._lock:
+            self.operations[operation] = self.operations.get(operation, 0) + 1
+            histogram = self.latency.get(operation)
+            if histogram is None:
+                histogram = self.latency[operation] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+            if error is not None:
+                key = (operation, error)
+                self.errors[key] = self.errors.get(key, 0) + 1
+            if entries is not None:
+                histogram = self.entries.get(operation)
+                if histogram is None:
+                    histogram = self.entries[operation] = _Histogram(ENTRY_BUCKETS)
+                histogram.observe(entries[0])
+                self.bytes[operation] = self.bytes.get(operation, 0) + entries[1]
+
+    def prometheus(self):
+        """
+        :returns:
+            Statistics in Prometheus text exposition format
+        :rtype:
+            str
+        """
+        name = self.namespace
+        lines = []
+
+        def header(metric, kind, text):
+            lines.append('# HELP %s_%s %s' % (name, metric, text))
+            lines.append('# TYPE %s_%s %s' % (name, metric, kind))
+
+        def histogram(metric, histograms):
+            for operation, value in sorted(histograms.items()):
+                for bound, count in value.cumulative():
+                    lines.append('%s_%s_bucket{operation="%s",le="%s"} %d' % (
+                        name, metric, operation, _format_bound(bound), count))
+                lines.append('%s_%s_sum{operation="%s"} %r' % (name, metric, operation, value.sum))
+                lines.append('%s_%s_count{operation="%s"} %d' % (name, metric, operation, value.count))
+
+        with self._lock:
+            header('operations_total', 'counter', 'Number of LDAP operations')
+            for operation, count in sorted(self.operations.items()):
+                lines.append('%s_operations_total{operation="%s"} %d' % (name, operation, count))
+            header('errors_total', 'counter', 'Number of failed LDAP operations')
+            for (operation, error), count in sorted(self.errors.items()):
+                lines.append('%s_errors_total{operation="%s",error="%s"} %d' % (
+                    name, operation, error, count))
+            header('operation_duration_seconds', 'histogram', 'Latency of LDAP operations')
+            histogram('operation_duration_seconds', self.latency)
+            header('entries', 'histogram', 'Number of entries returned per operation')
+            histogram('entries', self.entries)
+            header('entry_bytes_total', 'counter', 'Bytes of attribute names and values returned')
+            for operation, size in sorted(self.bytes.items()):
+                lines.append('%s_entry_bytes_total{operation="%s"} %d' % (name, operation, size))
+            header('in_flight', 'gauge', 'Number of running LDAP operations')
+            for operation, count in sorted(self.in_flight.items()):
+                lines.append('%s_in_flight{operation="%s"} %d' % (name, operation, count))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""libldap.slowlog module
+
+This module provides SlowLog, Tracer which records operations over latency
+or entry-count threshold.
+
+Each record has filter fingerprint (filter whose values are stripped, see
+libldap.filter.filter_fingerprint()), base, scope, attributes, controls and
+the call site outside libldap. Records are also aggregated by fingerprint,
+so that expensive query shapes (e.g. unindexed filters) can be found from
+client side.
+
+    >>> from libldap import LDAP, SlowLog
+    >>> slowlog = SlowLog(latency=0.5, entries=1000)
+    >>> ld = LDAP('ldap://localhost', tracer=slowlog)
+    >>> ...
+    >>> slowlog.top(1)
+    [{'fingerprint': '(&(description=*?*)(objectclass=?))', 'count': 12,
+      'elapsed': 9.81, 'max_elapsed': 1.02, 'entries': 24, ...}]
+"""
+
+import logging
+import os
+import sys
+import threading
+from collections import deque
+
+from .filter import filter_fingerprint
+from .tracing import Tracer
+
+__all__ = (
+    'SlowLog',
+)
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_SAMPLES = 10   # Bases and call sites which are kept per fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def _call_site():
+    # First frame outside libldap package
+    frame = sys._getframe(1)
+    while frame is not None and os.path.dirname(frame.f_code.co_filename) == _PACKAGE_DIR:
+        frame = frame.f_back
+    if frame is None:
+        return None
+    return '%s:%d in %s' % (frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)
+
+
+class SlowLog(Tracer):
+    """SlowLog records slow operations
+
+    Operation is recorded if its latency or number of entries reaches the
+    threshold. Each record is also logged to 'libldap.slowlog' logger at
+    WARNING level. One SlowLog can be shared by many LDAP instances, and
+    it is thread-safe.
+
+    :param latency:
+        Threshold of seconds (the default is 1.0). None disables it.
+    :param entries:
+        Threshold of returned entries (the default is 1000). None disables it.
+    :param maxlen:
+        Number of the latest records which are kept (the default is 1000)
+    :param log:
+        Flag for records are logged or not (the default is True)
+
+    :type latency:
+        int, float or None
+    :type entries:
+        int or None
+    :type maxlen:
+        int
+    :type log:
+        bool
+    """
+
+    def __init__(self, latency=1.0, entries=1000, maxlen=1000, log=True):
+        self.latency = latency
+        self.entries = entries
+        self.log = log
+        self._lock = threading.Lock()
+        #: The latest records (dict)
+        self.records = deque(maxlen=maxlen)
+        self._fingerprints = {}
+
+    def start(self, context):
+        context.data['call_site'] = _call_site()
+
+    def last_result(self, context):
+        self._check(context, None)
+
+    def error(self, context, error):
+        self._check(context, error)
+
+    def _check(self, context, error):
+        elapsed = context.elapsed()
+        if ((self.latency is None or elapsed < self.latency) and
+                (self.entries is None or context.entries < self.entries)):
+            return
+        self.record(context, elapsed, error)
+
+    def record(self, context, elapsed, error=None):
+        """
+        Record operation. This is called when operation exceeds threshold.
+
+        :param context:
+            Context of the operation
+        :param elapsed:
+            Seconds from start of the operation
+        :param error:
+            LDAPError raised by the operation or None
+
+        :type context:
+            TraceContext
+        :type elapsed:
+            float
+        :type error:
+            LDAPError or None
+        """
+        controls = getattr(context.controls, 'oids', None)
+        fingerprint = filter_fingerprint(context.filter) if context.filter is not None else None
+        record = {
+            'operation': context.operation,
+            'fingerprint': fingerprint,
+            'filter': context.filter,
+            'base': context.base if context.base is not None else context.dn,
+            'scope': context.scope,
+            'attributes': context.attributes,
+            'controls': list(controls) if controls is not None else None,
+            'elapsed': elapsed,
+            'entries': context.entries,
+            'bytes': context.bytes,
+            'timings': dict(context.timings),
+            'error': type(error).__name__ if error is not None else None,
+            'call_site': context.data.get('call_site'),
+        }
+        key = (context.operation, fingerprint, record['scope'])
+        with self._lock:
+            self.records.append(record)
+            stat = self._fingerprints.get(key)
+            if stat is None:
+                stat = self._fingerprints[key] = {
+                    'operation': context.operation,
+                    'fingerprint': fingerprint,
+                    'scope': record['scope'],
+                    'count': 0,
+                    'elapsed': 0.0,
+                    'max_elapsed': 0.0,
+                    'entries': 0,
+                    'bytes': 0,
+                    'errors': 0,
+                    'bases': set(),
+                    'call_sites': set(),
+                }
+            stat['count'] += 1
+            stat['elapsed'] += elapsed
+            stat['max_elapsed'] = max(stat['max_elapsed'], elapsed)
+            stat['entries'] += context.entries
+            stat['bytes'] += context.bytes
+            stat['errors'] += error is not None
+            for name in ('bases', 'call_sites'):
+                if len(stat[name]) < _SAMPLES:
+                    stat[name].add(record[name[:-1]])
+        if self.log:
+            logger.warning('Slow LDAP %s %.3fs entries=%d base=%r scope=%r filter=%r at %s',
+                           record['operation'], elapsed, record['entries'], record['base'],
+                           record['scope'], fingerprint, record['call_site'])
+
+    def top(self, n=10, key='elapsed'):
+        """
+        :param n:
+            Number of fingerprints (the default is 10)
+        :param key:
+            Sort key. It must be 'elapsed' (total seconds), 'count',
+            'max_elapsed', 'entries' or 'bytes' (the default is 'elapsed').
+
+        :type n:
+            int
+        :type key:
+            str
+
+        :returns:
+            Aggregated records by operation, filter fingerprint and scope in
+            descending order of key. 'bases' and 'call_sites' are sorted
+            lists of at most 10 samples, so that the result can be dumped
+            as JSON.
+        :rtype:
+            [dict]
+        """
+        with self._lock:
+            stats = sorted(self._fingerprints.values(), key=lambda x: x[key], reverse=True)[:n]
+            result = []
+            for stat in stats:
+                stat = dict(stat)
+                stat['bases'] = sorted(x for x in stat['bases'] if x is not None)
+                stat['call_sites'] = sorted(x for x in stat['call_sites'] if x is not None)
+                result.append(stat)
+        return result
+
+    def reset(self):
+        """Clear records and aggregation"""
+        with self._lock:
+            self.records.clear()
+            self._fingerprints.clear()
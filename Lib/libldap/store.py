@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""libldap.store module
+
+This module provides EntryStore, in-memory collection of LDAP entries.
+
+EntryStore keeps hash indexes on selected attributes and DN index with
+parent/child links. Indexes are updated incrementally when entries are added,
+modified or deleted.
+
+    >>> from libldap import LDAP, LDAP_SCOPE_SUB, EntryStore
+    >>> ld = LDAP('ldap://localhost')
+    >>> ld.bind('cn=master,dc=example,dc=com', 'secret')
+    >>> store = EntryStore(indexes=['uid', 'mail', 'member'])
+    >>> store.update(ld.paged_search('dc=example,dc=com', LDAP_SCOPE_SUB))
+    >>> [entry.dn for entry in store.find('uid', 'user1')]
+    ['uid=user1,ou=Users,dc=example,dc=com']
+    >>> len(list(store.subtree('ou=Users,dc=example,dc=com')))
+    3
+"""
+
+from .constants import (
+        LDAP_MOD_ADD,
+        LDAP_MOD_DELETE,
+        LDAP_MOD_REPLACE,
+        LDAP_SCOPE_BASE,
+        LDAP_SCOPE_CHILDREN,
+        LDAP_SCOPE_ONE,
+        LDAP_SCOPE_SUB,
+)
+from .core import _DictEntry, _normalize_dn, _parent_dn
+from .filter import And, Equal, Filter, normalize_value, parse_filter
+
+__all__ = (
+    'EntryStore',
+)
+
+
+def _to_bytes(value):
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return bytes(value)
+
+
+class EntryStore(object):
+    """EntryStore is in-memory collection of LDAP entries
+
+    :param indexes:
+        Attributes which are indexed for equality lookup (the default is (),
+        which implies only DN is indexed)
+    :param entries:
+        Initial entries (the default is (), which implies store is empty)
+
+    :type indexes:
+        [str]
+    :type entries:
+        iterable of _DictEntry or _OrderedEntry
+    """
+
+    def __init__(self, indexes=(), entries=()):
+        self._entries = {}
+        self._children = {}
+        self._indexes = dict((x.lower(), {}) for x in indexes)
+        self.update(entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries.values()))
+
+    def __contains__(self, dn):
+        return _normalize_dn(dn) in self._entries
+
+    @property
+    def indexes(self):
+        """Indexed attribute names (lower case)"""
+        return tuple(self._indexes)
+
+    def get(self, dn, default=None):
+        """
+        :param dn:
+            DN
+        :type dn:
+            str
+
+        :returns:
+            Entry which has dn or default
+        :rtype:
+            _DictEntry, _OrderedEntry or object
+        """
+        return self._entries.get(_normalize_dn(dn), default)
+
+    def add(self, entry):
+        """
+        :param entry:
+            LDAP entry which has 'dn' attribute. If entry with same DN exists,
+            it is replaced.
+        :type entry:
+            _DictEntry or _OrderedEntry
+        """
+        ndn = _normalize_dn(entry.dn)
+        old = self._entries.get(ndn)
+        if old is not None:
+            self._unindex(ndn, old)
+        elif ndn:
+            self._children.setdefault(_parent_dn(ndn), set()).add(ndn)
+        self._entries[ndn] = entry
+        self._index(ndn, entry)
+
+    def update(self, entries):
+        """
+        :param entries:
+            LDAP entries. Each entry is added by add().
+        :type entries:
+            iterable of _DictEntry or _OrderedEntry
+        """
+        for entry in entries:
+            self.add(entry)
+
+    def delete(self, dn):
+        """
+        :param dn:
+            DN of entry to be deleted. Its children are not deleted.
+        :type dn:
+            str
+
+        :returns:
+            Deleted entry
+        :rtype:
+            _DictEntry or _OrderedEntry
+
+        :raises:
+            KeyError
+        """
+        ndn = _normalize_dn(dn)
+        entry = self._entries.pop(ndn)
+        self._unindex(ndn, entry)
+        parent = _parent_dn(ndn)
+        siblings = self._children.get(parent) if ndn else None
+        if siblings is not None:
+            siblings.discard(ndn)
+            if not siblings:
+                del self._children[parent]
+        return entry
+
+    def modify(self, dn, changes):
+        """
+        :param dn:
+            DN of entry to be modified
+        :param changes:
+            Same changes as LDAP.modify(). Values are stored as bytes.
+
+        :type dn:
+            str
+        :type changes:
+            [(str, [str], int)] or [(str, [bytes], int)]
+
+        :returns:
+            Modified entry. This is new object, so entries which have been
+            returned before are not changed.
+        :rtype:
+            _DictEntry
+
+        :raises:
+            KeyError, ValueError
+        """
+        old = self._entries[_normalize_dn(dn)]
+        entry = _DictEntry(old.dn, [(key, list(values)) for key, values in old.items()])
+        names = dict((key.lower(), key) for key in entry)
+        for attribute, values, mod_op in changes:
+            key = names.setdefault(attribute.lower(), attribute)
+            values = [_to_bytes(x) for x in values]
+            current = entry.get(key, [])
+            if mod_op == LDAP_MOD_ADD:
+                current = current + [x for x in values if x not in current]
+            elif mod_op == LDAP_MOD_DELETE:
+                if values:
+                    deleted = set(normalize_value(x, key) for x in values)
+                    current = [x for x in current if normalize_value(x, key) not in deleted]
+                else:
+                    current = []
+            elif mod_op == LDAP_MOD_REPLACE:
+                current = values
+            else:
+                raise ValueError('Unsupported modify operation: %r' % (mod_op,))
+            if current:
+                entry[key] = current
+            else:
+                entry.pop(key, None)
+        self.add(entry)
+        return entry
+
+    def find(self, attribute, value):
+        """
+        :param attribute:
+            Attribute name
+        :param value:
+            Attribute value. This is compared case-insensitively, and values
+            of DN-syntax attributes (e.g. member) are compared as DN.
+
+        :type attribute:
+            str
+        :type value:
+            str or bytes
+
+        :returns:
+            Entries which have attribute value. If attribute is not indexed,
+            all entries are scanned.
+        :rtype:
+            list
+        """
+        index = self._indexes.get(attribute.lower())
+        if index is None:
+            match = Equal(attribute, value).matcher()
+            return [entry for entry in self._entries.values() if match(entry)]
+        return [self._entries[ndn] for ndn in index.get(normalize_value(value, attribute), ())]
+
+    def parent(self, dn):
+        """
+        :returns:
+            Parent entry of dn or None if parent is not stored
+        :rtype:
+            _DictEntry, _OrderedEntry or None
+        """
+        return self._entries.get(_parent_dn(_normalize_dn(dn)))
+
+    def children(self, dn):
+        """
+        :returns:
+            Entries just under dn
+        :rtype:
+            list
+        """
+        return [self._entries[ndn] for ndn in self._children.get(_normalize_dn(dn), ())]
+
+    def subtree(self, dn, include_base=True):
+        """
+        :param dn:
+            DN of base entry
+        :param include_base:
+            Flag for base entry is yielded or not (the default is True)
+
+        :type dn:
+            str
+        :type include_base:
+            bool
+
+        :yield:
+            Entries under dn. Parents are yielded before their children.
+        """
+        for ndn in self._subtree(_normalize_dn(dn), include_base):
+            yield self._entries[ndn]
+
+    def search(self, base=None, scope=LDAP_SCOPE_SUB, filter='(objectClass=*)'):
+        """
+        :param base:
+            DN of the entry at which to start the search (the default is None,
+            which implies all entries are searched)
+        :param scope:
+            Scope of the search (the default is LDAP_SCOPE_SUB)
+        :param filter:
+            LDAP filter. Equality assertions on indexed attributes are
+            looked up by index.
+
+        :type base:
+            str or None
+        :type scope:
+            int
+        :type filter:
+            str or Filter
+
+        :returns:
+            Matched entries
+        :rtype:
+            list
+        """
+        if not isinstance(filter, Filter):
+            filter = parse_filter(filter)
+        candidates = self._indexed_candidates(filter)
+        if base is not None:
+            nbase = _normalize_dn(base)
+            if scope == LDAP_SCOPE_BASE:
+                scoped = [nbase] if nbase in self._entries else []
+            elif scope == LDAP_SCOPE_ONE:
+                scoped = self._children.get(nbase, ())
+            elif scope in (LDAP_SCOPE_SUB, LDAP_SCOPE_CHILDREN):
+                if candidates is not None:
+                    scoped = [x for x in candidates if self._in_subtree(x, nbase, scope == LDAP_SCOPE_SUB)]
+                    candidates = None
+                else:
+                    scoped = self._subtree(nbase, scope == LDAP_SCOPE_SUB)
+            else:
+                raise ValueError('Invalid scope: %r' % (scope,))
+            if candidates is not None:
+                candidates = [x for x in scoped if x in candidates]
+            else:
+                candidates = scoped
+        elif candidates is None:
+            candidates = self._entries
+        match = filter.matcher()
+        return [self._entries[ndn] for ndn in candidates if match(self._entries[ndn])]
+
+    def _subtree(self, ndn, include_base):
+        if include_base and ndn in self._entries:
+            yield ndn
+        stack = [ndn]
+        while stack:
+            for child in self._children.get(stack.pop(), ()):
+                yield child
+                stack.append(child)
+
+    @staticmethod
+    def _in_subtree(ndn, nbase, include_base):
+        if ndn == nbase:
+            return include_base
+        return ndn.endswith(',' + nbase) or (nbase == '' and ndn != '')
+
+    def _indexed_candidates(self, filter):
+        # Return DNs which may match filter, or None if index can not be used
+        items = filter.filters if isinstance(filter, And) else (filter,)
+        candidates = None
+        for item in items:
+            if type(item) is not Equal:
+                continue
+            index = self._indexes.get(item.attribute.lower())
+            if index is None:
+                continue
+            found = index.get(normalize_value(item.value, item.attribute), set())
+            candidates = found if candidates is None else candidates & found
+        return candidates
+
+    def _attribute_values(self, entry):
+        for key, values in entry.items():
+            index = self._indexes.get(key.lower())
+            if index is not None:
+                yield key, index, values
+
+    def _index(self, ndn, entry):
+        for attribute, index, values in self._attribute_values(entry):
+            for value in values:
+                index.setdefault(normalize_value(value, attribute), set()).add(ndn)
+
+    def _unindex(self, ndn, entry):
+        for attribute, index, values in self._attribute_values(entry):
+            for value in values:
+                key = normalize_value(value, attribute)
+                dns = index.get(key)
+                if dns is not None:
+                    dns.discard(ndn)
+                    if not dns:
+                        del index[key]
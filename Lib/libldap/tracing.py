@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""libldap.tracing module
+
+This module provides Tracer, hook interface which is called around LDAP
+operations, and TraceContext, which is given to the hooks.
+
+Subclass Tracer and set it to LDAP instance (or LDAP class for all
+instances). Hooks are called at operation start, send of each request,
+first result, last result and error. LDAP instance without Tracer only
+checks that its tracer attribute is None.
+
+    >>> from libldap import LDAP, Tracer
+    >>> class PrintTracer(Tracer):
+    ...     def last_result(self, context):
+    ...         print(context.operation, context.filter, context.entries,
+    ...               context.timings['wait'])
+    ...
+    >>> ld = LDAP('ldap://localhost', tracer=PrintTracer())
+    >>> ld.search('dc=example,dc=com', LDAP_SCOPE_SUB, '(uid=user1)')
+    search (uid=user1) 1 0.000412
+"""
+
+import time
+
+__all__ = (
+    'TraceContext',
+    'Tracer',
+)
+
+
+class TraceContext(object):
+    """TraceContext describes one traced operation
+
+    Attributes:
+
+        + operation: Method name (e.g. 'search', 'bind')
+        + arguments: Arguments of the method (dict)
+        + dn, base, scope, filter, attributes, controls: Same as arguments,
+          or None if the method does not have it
+        + msgid: Message ID of the latest request
+        + msgids: Message IDs of all requests (paged_search() sends many)
+        + entries: Number of entries which are received
+        + bytes: Bytes of attribute names and values which are received
+        + timings: Seconds. 'send' is spent in ldap_search_ext(), 'wait' in
+          ldap_result() and 'decode' in converting messages; they are taken
+          in C. 'first_result' and 'last_result' are elapsed from start.
+        + started: time.perf_counter() at start
+        + results: Number of result() calls which returned messages
+        + data: Free dict for Tracer (e.g. span object)
+    """
+
+    def __init__(self, operation, arguments):
+        self.operation = operation
+        self.arguments = arguments
+        self.dn = arguments.get('dn')
+        self.base = arguments.get('base')
+        self.scope = arguments.get('scope')
+        filter = arguments.get('filter')
+        self.filter = str(filter) if filter is not None else None
+        self.attributes = arguments.get('attributes')
+        self.controls = arguments.get('controls')
+        self.msgid = None
+        self.msgids = []
+        self.entries = 0
+        self.bytes = 0
+        self.timings = {'send': 0.0, 'wait': 0.0, 'decode': 0.0}
+        self.started = time.perf_counter()
+        self.results = 0
+        self.running = True
+        self.data = {}
+
+    def __repr__(self):
+        return '<TraceContext %s msgid=%r entries=%d>' % (self.operation, self.msgid, self.entries)
+
+    def elapsed(self):
+        """Seconds from start"""
+        return time.perf_counter() - self.started
+
+
+class Tracer(object):
+    """Tracer is base class of tracing hooks
+
+    Override methods which you need. Exceptions raised by hooks are
+    propagated to the caller of LDAP operation.
+    """
+
+    def start(self, context):
+        """Called when operation starts, before any request is sent"""
+
+    def send(self, context):
+        """Called after each request is sent (context.msgid is set)"""
+
+    def first_result(self, context):
+        """Called when the first result message arrives"""
+
+    def last_result(self, context):
+        """Called when the final result message arrives"""
+
+    def error(self, context, error):
+        """Called when operation raises LDAPError"""
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""libldap.verifier module
+
+This module provides BindVerifier, which verifies passwords by simple BIND
+on a pool of dedicated connections.
+
+A connection must not send another request until its BIND response arrives,
+so BindVerifier keeps one BIND in flight on each connection and sends
+the next BIND as soon as a connection becomes idle. Many logins are verified
+by a few TCP connections.
+
+    >>> from libldap import LDAP, BindVerifier
+    >>> verifier = BindVerifier(LDAP.connect_many('ldap://localhost', 8))
+    >>> results = verifier.verify_many([
+    ...     ('uid=user1,ou=Users,dc=example,dc=com', 'secret'),
+    ...     ('uid=user2,ou=Users,dc=example,dc=com', 'wrong'),
+    ... ])
+    >>> [(x['who'], x['return_code'], x.get('ppolicy_msg')) for x in results]
+    [('uid=user1,ou=Users,dc=example,dc=com', 0, None),
+     ('uid=user2,ou=Users,dc=example,dc=com', 49, None)]
+"""
+
+import time
+from collections import deque
+
+from .constants import LDAP_CONTROL_PASSWORDPOLICYREQUEST
+from .core import LDAPControl
+from .exceptions import LDAPConnectError, LDAPError, LDAPServerDown, LDAPTimeout, _generate_exception
+
+__all__ = (
+    'BindVerifier',
+)
+
+
+class BindVerifier(object):
+    """BindVerifier verifies credentials by pipelined simple BIND
+
+    :param connections:
+        Dedicated connections (e.g. returned by LDAP.connect_many()).
+        Their bound identity changes with every verification.
+    :param ppolicy:
+        Flag for LDAP_CONTROL_PASSWORDPOLICYREQUEST is sent or not
+        (the default is True)
+    :param timeout:
+        Seconds to wait for each BIND response (the default is 10)
+
+    :type connections:
+        [LDAP]
+    :type ppolicy:
+        bool
+    :type timeout:
+        int or float
+    """
+
+    def __init__(self, connections, ppolicy=True, timeout=10):
+        if not connections:
+            raise ValueError('BindVerifier requires at least one connection')
+        self.connections = list(connections)
+        self.timeout = timeout
+        self._controls = None
+        if ppolicy:
+            self._controls = LDAPControl()
+            self._controls.add_control(LDAP_CONTROL_PASSWORDPOLICYREQUEST)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Unbind all connections"""
+        for ld in self.connections:
+            try:
+                ld.unbind()
+            except LDAPError:
+                pass
+
+    def verify(self, who, password):
+        """
+        :param who:
+            DN to bind
+        :param password:
+            Password
+
+        :type who:
+            str
+        :type password:
+            str
+
+        :returns:
+            Same as verify_many()
+        :rtype:
+            dict
+        """
+        return self.verify_many([(who, password)])[0]
+
+    def verify_many(self, credentials):
+        """
+        :param credentials:
+            Pairs of DN and password
+
+        :type credentials:
+            iterable of (str, str)
+
+        :returns:
+            Result of each BIND in the order of credentials. This is the dict
+            returned by LDAP.result() with 'who' and 'elapsed' (seconds) keys.
+            'return_code' is 0 when the password is valid, and 'ppolicy_msg',
+            'ppolicy_expire' and 'ppolicy_grace' are set when server returns
+            password policy response. If BIND could not be done, 'return_code'
+            is the code of LDAPError and 'error' is the exception.
+        :rtype:
+            [dict]
+        """
+        queue = deque((i, who, password, 0) for i, (who, password) in enumerate(credentials))
+        results = [None] * len(queue)
+        idle = deque(self.connections)
+        inflight = []   # [(ld, msgid, request, begin)]
+        while queue or inflight:
+            while queue and idle:
+                ld = idle.popleft()
+                request = queue.popleft()
+                try:
+                    msgid = ld.bind(request[1], request[2], controls=self._controls, async=True)
+                except LDAPError as e:
+                    self._failed(ld, request, e, queue, results, time.monotonic())
+                    idle.append(ld)
+                    continue
+                inflight.append((ld, msgid, request, time.monotonic()))
+
+            waiting = []
+            for ld, msgid, request, begin in inflight:
+                try:
+                    result = ld._poll(msgid, self._controls)
+                except LDAPError as e:
+                    self._failed(ld, request, e, queue, results, begin)
+                else:
+                    if result is None:
+                        if time.monotonic() - begin < self.timeout:
+                            waiting.append((ld, msgid, request, begin))
+                            continue
+                        # BIND can not be abandoned, so the connection is renewed
+                        self._failed(ld, request, LDAPTimeout('Timed out', -5), queue, results,
+                                     begin, reconnect=True)
+                    else:
+                        result['who'] = request[1]
+                        result['elapsed'] = time.monotonic() - begin
+                        results[request[0]] = result
+                        self._observe(ld, result)
+                idle.append(ld)
+            if waiting and len(waiting) == len(inflight):
+                # Nothing arrived in this round
+                time.sleep(0.001)
+            inflight = waiting
+        return results
+
+    @staticmethod
+    def _observe(ld, result):
+        # Record completed BIND as 'verify' operation (see libldap.metrics)
+        metrics = getattr(ld, 'metrics', None)
+        if metrics is not None:
+            error = None
+            if result['return_code'] != 0:
+                error = type(_generate_exception(**result)).__name__
+            metrics.observe('verify', result['elapsed'], error)
+
+    def _failed(self, ld, request, error, queue, results, begin, reconnect=False):
+        # Connection is reconnected and request is retried once if server is down
+        down = isinstance(error, (LDAPServerDown, LDAPConnectError))
+        if down or reconnect:
+            try:
+                ld.reconnect()
+            except LDAPError as e:
+                error = e
+            else:
+                if down and request[3] == 0:
+                    queue.appendleft(request[:3] + (1,))
+                    return
+        results[request[0]] = {
+            'who': request[1],
+            'return_code': error.return_code,
+            'message': error.message,
+            'error_message': getattr(error, 'error_message', None),
+            'referrals': [],
+            'error': error,
+            'elapsed': time.monotonic() - begin,
+        }
+        self._observe(ld, results[request[0]])
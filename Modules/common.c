@@ -11,6 +11,29 @@
 #define TUPLE_SIZE_MOD 3
 
 
+/* berval which refers to memory of Python object.
+ * view is released in free_LDAPMods(), so the memory is not copied
+ * and is kept valid for the lifetime of the call. */
+typedef struct {
+	struct berval bv;  /* MUST be the first member */
+	Py_buffer view;
+} BufferBerval;
+
+
+/* LDAPMod array and everything it points to are allocated as one arena:
+ *
+ *   LDAPModsArena | LDAPMod *[nmods + 1] | BufferBerval[nvalues] |
+ *   LDAPMod[nmods] | struct berval *[nvalues + nmods]
+ *
+ * python2LDAPMods() returns the address just after the header, so
+ * free_LDAPMods() finds the header from it and frees the arena at once. */
+typedef struct {
+	PyObject *keep;         /* Sequences which own attribute names and values */
+	BufferBerval *values;
+	Py_ssize_t nvalues;     /* Number of values which have been filled */
+} LDAPModsArena;
+
+
 void
 _XDECREF_MANY(PyObject *objs[], size_t count)
 {
@@ -23,168 +46,195 @@ _XDECREF_MANY(PyObject *objs[], size_t count)
 
 
 void
-int2timeval(struct timeval *tv, int i)
+double2timeval(struct timeval *tv, double d)
+{
+	tv->tv_sec = (long)d;
+	tv->tv_usec = (long)((d - (double)tv->tv_sec) * 1000000.0);
+	if (tv->tv_sec == 0 && tv->tv_usec == 0) {
+		/* Zero means no limit in libldap, so round up positive value */
+		tv->tv_usec = 1;
+	}
+}
+
+/* Seconds of monotonic clock, which is used for timings of libldap calls */
+double
+monotonic(void)
 {
-	tv->tv_usec = 0;
-	tv->tv_sec = (long)i;
+	struct timespec ts;
+
+	clock_gettime(CLOCK_MONOTONIC, &ts);
+	return (double)ts.tv_sec + (double)ts.tv_nsec / 1000000000.0;
 }
 
 void
 free_LDAPMods(LDAPMod **mods)
 {
-	LDAPMod **init_mods = mods;
-	struct berval **bv = NULL;
-	struct berval **init_bv = NULL;
+	LDAPModsArena *arena;
+	Py_ssize_t i;
 
-	if (init_mods == NULL)
+	if (mods == NULL)
 		return;
-	for (; *mods; mods++) {
-		if ((*mods)->mod_bvalues) {
-			bv = (*mods)->mod_bvalues;
-			init_bv = bv;
-			for (; *bv; bv++) {
-				/* Fill the free space with poison */
-				memset(*bv, 0xFF, sizeof(struct berval));
-				PyMem_RawFree(*bv);
-			}
-			PyMem_RawFree(init_bv);
-		}
-		PyMem_RawFree(*mods);
+	arena = ((LDAPModsArena *)mods) - 1;
+	for (i = 0; i < arena->nvalues; i++) {
+		if (arena->values[i].view.obj != NULL)
+			PyBuffer_Release(&arena->values[i].view);
 	}
-	PyMem_RawFree(init_mods);
+	Py_XDECREF(arena->keep);
+	PyMem_RawFree(arena);
 }
 
 
-static struct berval *
-str2berval(PyObject *str)
+static int
+str2berval(PyObject *str, BufferBerval *bbv)
 {
-	struct berval *bv;
-
-	bv = (struct berval *)PyMem_RawMalloc(sizeof(struct berval));
-	if (bv == NULL) {
-		PyErr_NoMemory();
-		return NULL;
-	}
+	Py_ssize_t len;
 
+	bbv->view.obj = NULL;
 	if (PyUnicode_Check(str)) {  /* str -> (char *) */
-		bv->bv_val = PyUnicode_AsUTF8(str);
-		if (bv->bv_val == NULL)
-			return NULL;
-		bv->bv_len = (ber_len_t)strlen(bv->bv_val);
-	} else if (PyBytes_Check(str)) {  /* bytes -> (char *) */
-		bv->bv_val = PyBytes_AsString(str);
-		bv->bv_len = (ber_len_t)PyBytes_GET_SIZE(str);
-		if (bv->bv_val == NULL)
-			return NULL;
+		bbv->bv.bv_val = (char *)PyUnicode_AsUTF8AndSize(str, &len);
+		if (bbv->bv.bv_val == NULL)
+			return -1;
+		bbv->bv.bv_len = (ber_len_t)len;
+	} else if (PyObject_CheckBuffer(str)) {
+		/* bytes, bytearray, memoryview, mmap, ... -> (char *) without copy */
+		if (PyObject_GetBuffer(str, &bbv->view, PyBUF_SIMPLE) == -1)
+			return -1;
+		bbv->bv.bv_val = (char *)bbv->view.buf;
+		bbv->bv.bv_len = (ber_len_t)bbv->view.len;
 	} else {
-		PyErr_SetString(LDAPError, "Each Item of value MUST be str or bytes type");
-		return NULL;
+		PyErr_SetString(LDAPError, "Each Item of value MUST be str or bytes-like object");
+		return -1;
 	}
-	return bv;
+	return 0;
 }
 
 
-static LDAPMod *
-attribute_spec2LDAPMod(PyObject *attribute, PyObject *value, int mod_op)
+static PyObject *
+attribute_values(PyObject *value)
 {
-	LDAPMod *mod;
-	int len;
-	Py_ssize_t i;
-	PyObject *val;
-
-	if (!PyUnicode_Check(attribute)) {
-		PyErr_SetString(PyExc_ValueError, "Attribute MUST be str type");
-		return NULL;
-	}
-
-	if (!PyList_Check(value)) {
-		PyErr_SetString(PyExc_ValueError, "Value MUST be list type");
+	/* list, tuple, set or any iterable of values, but not a single value */
+	if (PyUnicode_Check(value) || PyObject_CheckBuffer(value)) {
+		PyErr_SetString(PyExc_ValueError, "Value MUST be list, tuple or set of values");
 		return NULL;
 	}
+	return PySequence_Fast(value, "Value MUST be list, tuple or set of values");
+}
 
-	mod = (LDAPMod *)PyMem_RawMalloc(sizeof(LDAPMod));
-	if (mod == NULL) {
-		PyErr_NoMemory();
-		return NULL;
-	}
 
-	len = PyList_GET_SIZE(value);
-	mod->mod_op = mod_op;
-	mod->mod_type = PyUnicode_AsUTF8(attribute);
-	if (mod->mod_type == NULL) {
-		return NULL;
+static int
+attribute_spec(PyObject *spec, PyObject **attribute, PyObject **value, int *mod_op)
+{
+	if (!PyTuple_Check(spec)) {
+		PyErr_SetString(LDAPError, "Each Item of list MUST be tuple type");
+		return -1;
 	}
-	mod->mod_bvalues = (struct berval **)PyMem_RawMalloc(sizeof(struct berval *) * (len + 1));
-	memset(mod->mod_bvalues, 0, sizeof(struct berval *) * (len + 1));
-	if (mod ->mod_bvalues == NULL) {
-		PyErr_NoMemory();
-		return NULL;
+	if (PyTuple_GET_SIZE(spec) == TUPLE_SIZE_ADD) {
+		*mod_op = LDAP_MOD_ADD;
+	} else if (PyTuple_GET_SIZE(spec) == TUPLE_SIZE_MOD) {
+		*mod_op = (int)PyLong_AsLong(PyTuple_GET_ITEM(spec, 2));
+		if (*mod_op == -1 && PyErr_Occurred())
+			return -1;
+	} else {
+		PyErr_SetString(LDAPError, "Each tuple item MUST have two or three items");
+		return -1;
 	}
-	for (i = 0; i < len; i++) {
-		val = PyList_GET_ITEM(value, i);
-		mod->mod_bvalues[i] = str2berval(val);
-		if (mod->mod_bvalues[i] == NULL) {
-			return NULL;
-		}
+	*attribute = PyTuple_GET_ITEM(spec, 0);
+	*value = PyTuple_GET_ITEM(spec, 1);
+	if (!PyUnicode_Check(*attribute)) {
+		PyErr_SetString(PyExc_ValueError, "Attribute MUST be str type");
+		return -1;
 	}
-	mod->mod_bvalues[len] = NULL;
-	return mod;
+	return 0;
 }
 
 
 LDAPMod **
 python2LDAPMods(PyObject *list)
 {
-	Py_ssize_t len;
+	PyObject *keep = NULL;
+	PyObject *specs = NULL;
+	PyObject *values = NULL;
+	PyObject *attribute, *value;
+	LDAPModsArena *arena;
 	LDAPMod **mods;
-	Py_ssize_t i;
-	PyObject *attribute_spec;
-	Py_ssize_t tuple_size;
-	PyObject *attribute = NULL;
-	PyObject *value = NULL;
+	LDAPMod *mod;
+	struct berval **bvp;
+	Py_ssize_t nmods, nvalues = 0;
+	Py_ssize_t i, j;
 	int mod_op;
 
-	if (!PyList_Check(list)) {
-		PyErr_SetString(PyExc_ValueError, "Object MUST be list type");
+	/* dict is regarded as [(attribute, values)] */
+	if (PyDict_Check(list))
+		specs = PyDict_Items(list);
+	else
+		specs = PySequence_Fast(list, "Object MUST be list, tuple or dict");
+	if (specs == NULL)
 		return NULL;
-	}
-
-	len = PyList_GET_SIZE(list);
-	mods = (LDAPMod **)PyMem_RawMalloc(sizeof(LDAPMod *) * (len + 1));
-	if (mods == NULL) {
-		PyErr_NoMemory();
+	keep = PyList_New(0);
+	if (keep == NULL || PyList_Append(keep, specs) == -1) {
+		XDECREF_MANY(keep, specs);
 		return NULL;
 	}
-	memset(mods, 0, sizeof(LDAPMod *) * (len + 1));
+	Py_DECREF(specs);
 
-	for (i = 0; i < len; i++) {
-		attribute_spec = PyList_GET_ITEM(list, i);
-		if (!PyTuple_Check(attribute_spec)) {
-			free_LDAPMods(mods);
-			PyErr_SetString(LDAPError, "Each Item of list MUST be tuple type");
+	/* First pass: validate and count values */
+	nmods = PySequence_Fast_GET_SIZE(specs);
+	for (i = 0; i < nmods; i++) {
+		if (attribute_spec(PySequence_Fast_GET_ITEM(specs, i), &attribute, &value, &mod_op) == -1) {
+			Py_DECREF(keep);
 			return NULL;
 		}
-		tuple_size = PyTuple_GET_SIZE(attribute_spec);
-		if (tuple_size == TUPLE_SIZE_ADD) {
-			attribute = PyTuple_GET_ITEM(attribute_spec, 0);
-			value = PyTuple_GET_ITEM(attribute_spec, 1);
-			mod_op = LDAP_MOD_ADD | LDAP_MOD_BVALUES;
-		} else if (tuple_size == TUPLE_SIZE_MOD) {
-			attribute = PyTuple_GET_ITEM(attribute_spec, 0);
-			value = PyTuple_GET_ITEM(attribute_spec, 1);
-			mod_op = (int)PyLong_AsLong(PyTuple_GET_ITEM(attribute_spec, 2)) | LDAP_MOD_BVALUES;
-		} else {
-			free_LDAPMods(mods);
-			PyErr_SetString(LDAPError, "Each tuple item MUST have two or three items");
+		values = attribute_values(value);
+		if (values == NULL || PyList_Append(keep, values) == -1) {
+			XDECREF_MANY(keep, values);
 			return NULL;
 		}
-		mods[i] = attribute_spec2LDAPMod(attribute, value, mod_op);
-		if (mods[i] == NULL) {
+		Py_DECREF(values);
+		nvalues += PySequence_Fast_GET_SIZE(values);
+	}
+
+	/* Allocate everything at once */
+	arena = (LDAPModsArena *)PyMem_RawMalloc(sizeof(LDAPModsArena) +
+			sizeof(LDAPMod *) * (nmods + 1) +
+			sizeof(BufferBerval) * nvalues +
+			sizeof(LDAPMod) * nmods +
+			sizeof(struct berval *) * (nvalues + nmods));
+	if (arena == NULL) {
+		Py_DECREF(keep);
+		PyErr_NoMemory();
+		return NULL;
+	}
+	mods = (LDAPMod **)(arena + 1);
+	arena->keep = keep;
+	arena->values = (BufferBerval *)(mods + nmods + 1);
+	arena->nvalues = 0;
+	mod = (LDAPMod *)(arena->values + nvalues);
+	bvp = (struct berval **)(mod + nmods);
+
+	/* Second pass: fill */
+	for (i = 0; i < nmods; i++, mod++) {
+		attribute_spec(PySequence_Fast_GET_ITEM(specs, i), &attribute, &value, &mod_op);
+		values = PyList_GET_ITEM(keep, i + 1);
+		mod->mod_op = mod_op | LDAP_MOD_BVALUES;
+		mod->mod_type = (char *)PyUnicode_AsUTF8(attribute);
+		mod->mod_bvalues = bvp;
+		mods[i] = mod;
+		if (mod->mod_type == NULL) {
 			free_LDAPMods(mods);
 			return NULL;
 		}
+		for (j = 0; j < PySequence_Fast_GET_SIZE(values); j++) {
+			BufferBerval *bbv = &arena->values[arena->nvalues];
+			if (str2berval(PySequence_Fast_GET_ITEM(values, j), bbv) == -1) {
+				free_LDAPMods(mods);
+				return NULL;
+			}
+			arena->nvalues++;
+			*bvp++ = &bbv->bv;
+		}
+		*bvp++ = NULL;
 	}
-	mods[len] = NULL;
+	mods[nmods] = NULL;
 	return mods;
 }
 
@@ -77,6 +77,103 @@ create_sort_control(LDAPObjectControl *self, struct berval *bv, int iscritical)
 }
 
 
+static LDAPControl *
+create_assertion_control(struct berval *bv, int iscritical)
+{
+	LDAPControl *ctrl = NULL;
+	int rc;
+	LDAP *ldap;
+	char *filter;
+
+	filter = (char *)malloc(bv->bv_len + 1);
+	if (filter == NULL) {
+		PyErr_NoMemory();
+		return NULL;
+	}
+	memcpy(filter, bv->bv_val, bv->bv_len);
+	filter[bv->bv_len] = '\0';
+
+	/* Dummy session */
+	rc = ldap_initialize(&ldap, NULL);
+	if (rc != LDAP_SUCCESS) {
+		free(filter);
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
+		return NULL;
+	}
+
+	rc = ldap_create_assertion_control(ldap, filter, iscritical, &ctrl);
+	ldap_unbind_ext_s(ldap, NULL, NULL);
+	free(filter);
+	if (rc != LDAP_SUCCESS) {
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
+		return NULL;
+	}
+	return ctrl;
+}
+
+
+static LDAPControl *
+create_read_control(const char *oid, struct berval *bv, int iscritical)
+{
+	LDAPControl *ctrl = NULL;
+	BerElement *ber = NULL;
+	struct berval value = {0, NULL};
+	char *buf = NULL;
+	char **attrs = NULL;
+	char *attr, *saveptr = NULL;
+	int count = 0;
+	int rc;
+	ber_len_t i;
+
+	/* Split attribute list such as "entryCSN modifyTimestamp" */
+	buf = (char *)malloc(bv->bv_len + 1);
+	attrs = (char **)malloc(sizeof(char *) * (bv->bv_len / 2 + 2));
+	if (buf == NULL || attrs == NULL) {
+		free(buf);
+		free(attrs);
+		PyErr_NoMemory();
+		return NULL;
+	}
+	memcpy(buf, bv->bv_val, bv->bv_len);
+	buf[bv->bv_len] = '\0';
+	for (i = 0; i < bv->bv_len; i++) {
+		if (buf[i] == ',')
+			buf[i] = ' ';
+	}
+	for (attr = strtok_r(buf, " \t\r\n", &saveptr);
+			attr != NULL;
+			attr = strtok_r(NULL, " \t\r\n", &saveptr)) {
+		attrs[count++] = attr;
+	}
+	attrs[count] = NULL;
+
+	/* AttributeSelection ::= SEQUENCE OF selector LDAPString */
+	ber = ber_alloc_t(LBER_USE_DER);
+	if (ber == NULL) {
+		free(buf);
+		free(attrs);
+		PyErr_NoMemory();
+		return NULL;
+	}
+	if (ber_printf(ber, "{v}", attrs) == -1 || ber_flatten2(ber, &value, 0) == -1) {
+		ber_free(ber, 1);
+		free(buf);
+		free(attrs);
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(LDAP_ENCODING_ERROR), LDAP_ENCODING_ERROR);
+		return NULL;
+	}
+	rc = ldap_control_create(oid, iscritical, &value, 1, &ctrl);
+	ber_free(ber, 1);
+	free(buf);
+	free(attrs);
+	if (rc != LDAP_SUCCESS) {
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
+		return NULL;
+	}
+	return ctrl;
+}
+
+
 static PyObject *
 LDAPObjectControl_add_control(LDAPObjectControl *self, PyObject *args)
 {
@@ -123,6 +220,29 @@ LDAPObjectControl_add_control(LDAPObjectControl *self, PyObject *args)
 			PyBuffer_Release(&view);
 			return NULL;
 		}
+	} else if (strcmp(oid, LDAP_CONTROL_ASSERT) == 0) {
+		if (bvp == NULL) {
+			PyBuffer_Release(&view);
+			PyErr_SetString(LDAPError, "LDAP_CONTROL_ASSERT requires value");
+			return NULL;
+		}
+		ctrl = create_assertion_control(bvp, iscritical);
+		if (ctrl == NULL) {
+			PyBuffer_Release(&view);
+			return NULL;
+		}
+	} else if (strcmp(oid, LDAP_CONTROL_PRE_READ) == 0 ||
+			strcmp(oid, LDAP_CONTROL_POST_READ) == 0) {
+		if (bvp == NULL) {
+			PyBuffer_Release(&view);
+			PyErr_Format(LDAPError, "%s requires attribute list", oid);
+			return NULL;
+		}
+		ctrl = create_read_control(oid, bvp, iscritical);
+		if (ctrl == NULL) {
+			PyBuffer_Release(&view);
+			return NULL;
+		}
 	} else {
 		rc = ldap_control_create(oid, iscritical, bvp, 0, &ctrl);
 		if (rc != LDAP_SUCCESS) {
@@ -266,6 +386,48 @@ LDAPObjectControl_get_pr_cookie(LDAPObjectControl *self, PyObject *args)
 }
 
 
+static PyObject *
+LDAPObjectControl_set_pagesize(LDAPObjectControl *self, PyObject *args)
+{
+	int pagesize;
+	LDAPControl *ctrl = NULL;
+	struct berval value = {0, NULL};
+	LDAP *ldap;
+	int rc;
+
+	if (!PyArg_ParseTuple(args, "i", &pagesize))
+		return NULL;
+
+	if (self->sctrls)
+		ctrl = ldap_control_find(LDAP_CONTROL_PAGEDRESULTS, self->sctrls, NULL);
+	if (ctrl == NULL) {
+		PyErr_Format(LDAPError, "Specified control %s is not found", LDAP_CONTROL_PAGEDRESULTS);
+		return NULL;
+	}
+
+	/* Dummy session */
+	rc = ldap_initialize(&ldap, NULL);
+	if (rc != LDAP_SUCCESS) {
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
+		return NULL;
+	}
+
+	/* Zero size with the cookie releases server-side resources (RFC 2696) */
+	rc = ldap_create_page_control_value(ldap, (ber_int_t)pagesize, &self->pr_cookie, &value);
+	ldap_unbind_ext_s(ldap, NULL, NULL);
+	if (rc != LDAP_SUCCESS) {
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
+		return NULL;
+	}
+	if (ctrl->ldctl_value.bv_val)
+		ber_memfree(ctrl->ldctl_value.bv_val);
+	ctrl->ldctl_value.bv_val = value.bv_val;
+	ctrl->ldctl_value.bv_len = value.bv_len;
+	self->pagesize = (ber_int_t)pagesize;
+	Py_RETURN_NONE;
+}
+
+
 static void
 LDAPObjectControl_dealloc(LDAPObjectControl *self)
 {
@@ -316,6 +478,8 @@ static PyMethodDef LDAPObjectControl_methods[] = {
 		METH_VARARGS, "list_controls"},
 	{"get_pr_cookie",  (PyCFunction)LDAPObjectControl_get_pr_cookie,
 		METH_VARARGS, "get_pr_cookie"},
+	{"set_pagesize",  (PyCFunction)LDAPObjectControl_set_pagesize,
+		METH_VARARGS, "set_pagesize"},
 	{NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
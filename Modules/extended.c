@@ -0,0 +1,56 @@
+/*
+ * A Python binding for libldap.
+ *
+ * Copyright (C) 2015 Yutaka Kamei
+ *
+ */
+
+#include "libldap.h"
+
+
+PyObject *
+LDAPObject_extended(LDAPObject *self, PyObject *args)
+{
+	char *oid = NULL;
+	Py_buffer view = {NULL, NULL};
+	struct berval bv = {0, NULL};
+	struct berval *bvp = NULL;
+	PyObject *controls = NULL;
+	LDAPObjectControl *ldapoc = NULL;
+	LDAPControl **sctrls = NULL;
+	LDAPControl **cctrls = NULL;
+	int msgid;
+	int rc;
+
+	if (self->ldap == NULL) {
+		PyErr_SetString(LDAPError, "This instance has already been deallocated.");
+		return NULL;
+	}
+
+	if (!PyArg_ParseTuple(args, "s|z*O!", &oid, &view, &LDAPObjectControlType, &controls))
+		return NULL;
+
+	if (view.buf != NULL) {
+		bv.bv_val = (char *)view.buf;
+		bv.bv_len = (ber_len_t)view.len;
+		bvp = &bv;
+	}
+
+	if (controls) {
+		ldapoc = (LDAPObjectControl *)controls;
+		sctrls = ldapoc->sctrls;
+		cctrls = ldapoc->cctrls;
+	}
+
+	LDAP_BEGIN_ALLOW_THREADS
+	rc = ldap_extended_operation(self->ldap, oid, bvp, sctrls, cctrls, &msgid);
+	LDAP_END_ALLOW_THREADS
+	PyBuffer_Release(&view);
+	if (rc != LDAP_SUCCESS) {
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
+		return NULL;
+	}
+	return PyLong_FromLong(msgid);
+}
+
+/* vi: set noexpandtab : */
@@ -24,6 +24,7 @@ LDAPObject_get_option(LDAPObject *self, PyObject *args)
 	LDAPAPIInfo api_info;
 	PyObject *py_outvalue = NULL;
 	PyObject *py_extensions = NULL;
+	void *tls_ctx = NULL;
 
 	if (self->ldap == NULL) {
 		PyErr_SetString(LDAPError, "This instance has already been deallocated.");
@@ -186,11 +187,20 @@ LDAPObject_get_option(LDAPObject *self, PyObject *args)
 				ldap_memvfree((void **)api_info.ldapai_extensions);
 			XDECREF_MANY(py_extensions);
 			break;
+		case LDAP_OPT_X_TLS_CTX:
+			LDAP_BEGIN_ALLOW_THREADS
+			rc = ldap_get_option(ctx, option, &tls_ctx);
+			LDAP_END_ALLOW_THREADS
+			if (rc != LDAP_OPT_SUCCESS) {
+				PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
+				return NULL;
+			}
+			py_outvalue = tls_ctx2python(tls_ctx);
+			break;
 		case LDAP_OPT_CONNECT_CB:
 		case LDAP_OPT_SOCKBUF:
 		case LDAP_OPT_X_TLS_CONNECT_ARG:
 		case LDAP_OPT_X_TLS_CONNECT_CB:
-		case LDAP_OPT_X_TLS_CTX:
 		case LDAP_OPT_X_TLS_SSL_CTX:
 		default:
 			PyErr_SetString(LDAPError, "Specified option is not supported");
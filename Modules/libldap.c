@@ -73,6 +73,13 @@ LDAPObject_init(LDAPObject *self, PyObject *args, PyObject *kwargs)
 		return -1;
 	}
 
+	/* Release old session when instance is initialized again (reconnect) */
+	if (self->ldap) {
+		LDAP_BEGIN_ALLOW_THREADS
+		ldap_unbind_ext(self->ldap, NULL, NULL);
+		LDAP_END_ALLOW_THREADS
+	}
+
 	/* Create new instance */
 	self->ldap = ld;
 	return 0;
@@ -93,10 +100,14 @@ static PyMethodDef LDAPObject_methods[] = {
 	{"whoami",  (PyCFunction)LDAPObject_whoami, METH_VARARGS, "whoami"},
 	{"passwd",  (PyCFunction)LDAPObject_passwd, METH_VARARGS, "passwd"},
 	{"cancel",  (PyCFunction)LDAPObject_cancel, METH_VARARGS, "cancel"},
+	{"extended",  (PyCFunction)LDAPObject_extended, METH_VARARGS, "extended"},
 	{"start_tls",  (PyCFunction)LDAPObject_start_tls, METH_VARARGS, "start_tls"},
+	{"install_tls",  (PyCFunction)LDAPObject_install_tls, METH_VARARGS, "install_tls"},
 	{"set_option",  (PyCFunction)LDAPObject_set_option, METH_VARARGS, "set_option"},
 	{"get_option",  (PyCFunction)LDAPObject_get_option, METH_VARARGS, "get_option"},
 	{"result",  (PyCFunction)LDAPObject_result, METH_VARARGS, "result"},
+	{"get_timings",  (PyCFunction)LDAPObject_get_timings, METH_VARARGS, "get_timings"},
+	{"cache_tls_sessions",  (PyCFunction)LDAPObject_cache_tls_sessions, METH_VARARGS, "cache_tls_sessions"},
 	{NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
@@ -9,11 +9,18 @@
 #include <ldap.h>
 #include <lber.h>
 #include <signal.h>
+#include <time.h>
 
 
 typedef struct {
 	PyObject_HEAD
 	LDAP *ldap;
+	/* The last request and result (see get_timings()) */
+	double send_time;       /* Seconds in ldap_search_ext() */
+	double wait_time;       /* Seconds in ldap_result() */
+	double decode_time;     /* Seconds to convert messages into Python objects */
+	long entries;           /* Entries which are decoded */
+	Py_ssize_t bytes;       /* Bytes of decoded attribute names and values */
 } LDAPObject;
 
 
@@ -28,6 +35,9 @@ typedef struct {
 } LDAPObjectControl;
 
 
+/* Result code of LDAPBudgetExceeded, which is not used by libldap */
+#define LIBLDAP_BUDGET_EXCEEDED (-100)
+
 #define LDAP_BEGIN_ALLOW_THREADS          \
 	{                                     \
 		PyGILState_STATE gstate;          \
@@ -49,9 +59,12 @@ extern PyTypeObject LDAPObjectControlType;
 
 /* Functions */
 void _XDECREF_MANY(PyObject *objs[], size_t count);
-void int2timeval(struct timeval *tv, int i);
+void double2timeval(struct timeval *tv, double d);
+double monotonic(void);
 void free_LDAPMods(LDAPMod **mods);
 LDAPMod **python2LDAPMods(PyObject *list);
+PyObject *tls_ctx2python(void *ctx);
+int python2tls_ctx(LDAP *ld, PyObject *capsule);
 
 /* LDAPObject Instance methods */
 PyObject *LDAPObject_bind(LDAPObject *self, PyObject *args);
@@ -66,9 +79,13 @@ PyObject *LDAPObject_abandon(LDAPObject *self, PyObject *args);
 PyObject *LDAPObject_whoami(LDAPObject *self, PyObject *args);
 PyObject *LDAPObject_passwd(LDAPObject *self, PyObject *args);
 PyObject *LDAPObject_cancel(LDAPObject *self, PyObject *args);
+PyObject *LDAPObject_extended(LDAPObject *self, PyObject *args);
 PyObject *LDAPObject_start_tls(LDAPObject *self, PyObject *args);
+PyObject *LDAPObject_install_tls(LDAPObject *self, PyObject *args);
 PyObject *LDAPObject_set_option(LDAPObject *self, PyObject *args);
 PyObject *LDAPObject_get_option(LDAPObject *self, PyObject *args);
 PyObject *LDAPObject_result(LDAPObject *self, PyObject *args);
+PyObject *LDAPObject_get_timings(LDAPObject *self, PyObject *args);
+PyObject *LDAPObject_cache_tls_sessions(LDAPObject *self, PyObject *args);
 
 /* vi: set noexpandtab : */
@@ -8,8 +8,27 @@
 #include "libldap.h"
 
 
+/* Remaining budget of one result() call (see ResultBudget in core.py).
+ * Negative value implies unlimited. */
+typedef struct {
+	long entries;           /* Entries which can be decoded */
+	Py_ssize_t bytes;       /* Bytes of attribute names and values */
+	long values;            /* Values per attribute */
+	int exceeded;           /* Set when one of the limits is crossed */
+} ResultBudget;
+
+
+static void
+budget_exceeded(ResultBudget *budget, const char *limit)
+{
+	budget->exceeded = 1;
+	PyErr_Format(LDAPError, "Result budget exceeded: %s (%d)",
+			limit, LIBLDAP_BUDGET_EXCEEDED);
+}
+
+
 static PyObject *
-get_entry(LDAP *ldap, LDAPMessage *msg)
+get_entry(LDAP *ldap, LDAPMessage *msg, Py_ssize_t *bytes, ResultBudget *budget)
 {
 	PyObject *entry = NULL, *order = NULL, *values = NULL;
 	BerElement *ber = NULL;
@@ -68,21 +87,41 @@ get_entry(LDAP *ldap, LDAPMessage *msg)
 			return NULL;
 		}
 		Py_XDECREF(v);
+		*bytes += bv.bv_len;
 
 		if ((PyDict_SetItemString(entry, bv.bv_val, values)) == -1) {
 			XDECREF_MANY(entry, order, values);
 			return NULL;
 		}
 
+		/* Check budget before values are copied */
+		if (bvals && budget->values >= 0) {
+			for (i = 0; bvals[i].bv_val != NULL; i++)
+				;
+			if (i > budget->values) {
+				budget_exceeded(budget, "values per attribute");
+				goto exceeded;
+			}
+		}
+		if (budget->bytes >= 0 && *bytes > budget->bytes) {
+			budget_exceeded(budget, "bytes");
+			goto exceeded;
+		}
+
 		/* Set values */
 		if (bvals) {
 			for (i = 0; bvals[i].bv_val != NULL; i++) {
+				if (budget->bytes >= 0 && *bytes + (Py_ssize_t)bvals[i].bv_len > budget->bytes) {
+					budget_exceeded(budget, "bytes");
+					goto exceeded;
+				}
 				v = PyBytes_FromStringAndSize(bvals[i].bv_val, bvals[i].bv_len);
 				if (PyList_Append(values, v) == -1) {
 					XDECREF_MANY(entry, order, values);
 					return NULL;
 				}
 				Py_XDECREF(v);
+				*bytes += bvals[i].bv_len;
 			}
 			ber_memfree(bvals);
 		}
@@ -92,6 +131,87 @@ get_entry(LDAP *ldap, LDAPMessage *msg)
 		ber_free(ber, 0);
 
 	return entry;
+
+exceeded:
+	if (bvals)
+		ber_memfree(bvals);
+	if (ber != NULL)
+		ber_free(ber, 0);
+	XDECREF_MANY(entry, values);
+	return NULL;
+}
+
+
+static PyObject *
+get_read_entry(LDAPControl *ctrl)
+{
+	PyObject *entry = NULL, *order = NULL, *values = NULL;
+	BerElementBuffer berbuf;
+	BerElement *ber = (BerElement *)&berbuf;
+	struct berval bv;
+	BerVarray bvals = NULL;
+	int i;
+	PyObject *v = NULL;
+
+	/* Initialize container */
+	entry = PyDict_New();
+	order = PyList_New(0);
+	if (entry == NULL || order == NULL) {
+		XDECREF_MANY(entry, order);
+		return PyErr_NoMemory();
+	}
+
+	/* Control value is SearchResultEntry (RFC 4527) */
+	ber_init2(ber, &ctrl->ldctl_value, LBER_USE_DER);
+	if (ber_scanf(ber, "{m{" /*}}*/, &bv) == LBER_ERROR) {
+		XDECREF_MANY(entry, order);
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(LDAP_DECODING_ERROR), LDAP_DECODING_ERROR);
+		return NULL;
+	}
+
+	/* Set DN and __order__ */
+	v = PyUnicode_FromStringAndSize(bv.bv_val, bv.bv_len);
+	if (v == NULL || PyDict_SetItemString(entry, "dn", v) == -1) {
+		XDECREF_MANY(entry, order, v);
+		return NULL;
+	}
+	Py_DECREF(v);
+	if (PyDict_SetItemString(entry, "__order__", order) == -1) {
+		XDECREF_MANY(entry, order);
+		return NULL;
+	}
+	Py_DECREF(order);
+
+	/* Parse attributes */
+	while (ber_scanf(ber, "{m" /*}*/, &bv) != LBER_ERROR) {
+		if (ber_scanf(ber, "[W]", &bvals) == LBER_ERROR) {
+			Py_DECREF(entry);
+			PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(LDAP_DECODING_ERROR), LDAP_DECODING_ERROR);
+			return NULL;
+		}
+		values = PyList_New(0);
+		v = PyUnicode_FromStringAndSize(bv.bv_val, bv.bv_len);
+		if (values == NULL || v == NULL || PyList_Append(order, v) == -1 ||
+				PyDict_SetItem(entry, v, values) == -1) {
+			ber_bvarray_free(bvals);
+			XDECREF_MANY(entry, values, v);
+			return NULL;
+		}
+		Py_DECREF(v);
+		for (i = 0; bvals && bvals[i].bv_val != NULL; i++) {
+			v = PyBytes_FromStringAndSize(bvals[i].bv_val, bvals[i].bv_len);
+			if (v == NULL || PyList_Append(values, v) == -1) {
+				ber_bvarray_free(bvals);
+				XDECREF_MANY(entry, values, v);
+				return NULL;
+			}
+			Py_DECREF(v);
+		}
+		Py_DECREF(values);
+		ber_bvarray_free(bvals);
+		bvals = NULL;
+	}
+	return entry;
 }
 
 
@@ -144,6 +264,18 @@ parse_ctrls_result(LDAP *ldap, LDAPObjectControl *ldapoc, LDAPControl **sctrls,
 			set_rc = PyDict_SetItemString(result, "ppolicy_grace", PyLong_FromLong(grace));
 			if (set_rc == -1)
 				return -1;
+		} else if (strcmp(sctrls[i]->ldctl_oid, LDAP_CONTROL_PRE_READ) == 0 ||
+				strcmp(sctrls[i]->ldctl_oid, LDAP_CONTROL_POST_READ) == 0) {
+			PyObject *entry = get_read_entry(sctrls[i]);
+			if (entry == NULL)
+				return -1;
+			if (strcmp(sctrls[i]->ldctl_oid, LDAP_CONTROL_PRE_READ) == 0)
+				set_rc = PyDict_SetItemString(result, "pre_read", entry);
+			else
+				set_rc = PyDict_SetItemString(result, "post_read", entry);
+			Py_DECREF(entry);
+			if (set_rc == -1)
+				return -1;
 		}
 	}
 	return 0;
@@ -261,7 +393,8 @@ parse_result(LDAP *ldap, LDAPMessage *msg, int with_extended, LDAPObjectControl
 			ber_memfree(oid);
 		}
 		if (data) {
-			set_rc = PyDict_SetItemString(result, "data", PyBytes_FromString(data->bv_val));
+			set_rc = PyDict_SetItemString(result, "data",
+					PyBytes_FromStringAndSize(data->bv_val, data->bv_len));
 			set_rc = PyDict_SetItemString(result, "data_length", PyLong_FromLong(data->bv_len));
 			ber_bvfree(data);
 		}
@@ -275,9 +408,11 @@ LDAPObject_result(LDAPObject *self, PyObject *args)
 {
 	int msgid = LDAP_RES_ANY;
 	int all = LDAP_MSG_ALL;
-	int timeout = LDAP_NO_LIMIT;
+	double timeout = LDAP_NO_LIMIT;
 	PyObject *controls = NULL;
+	PyObject *limits = NULL;
 	LDAPObjectControl *ldapoc = NULL;
+	ResultBudget budget = {-1, -1, -1, 0};
 	struct timeval tv;
 	struct timeval *tvp = NULL;
 	PyObject *result = NULL;
@@ -285,19 +420,31 @@ LDAPObject_result(LDAPObject *self, PyObject *args)
 	LDAPMessage *res;
 	PyObject *message = NULL;
 	LDAPMessage *msg;
+	double begin;
 
 	if (self->ldap == NULL) {
 		PyErr_SetString(LDAPError, "This instance has already been deallocated.");
 		return NULL;
 	}
 
-	if (!PyArg_ParseTuple(args, "|iiiO!", &msgid, &all, &timeout,
-				&LDAPObjectControlType, &controls))
+	if (!PyArg_ParseTuple(args, "|iidOO", &msgid, &all, &timeout, &controls, &limits))
+		return NULL;
+
+	if (controls == Py_None) {
+		controls = NULL;
+	} else if (controls && !PyObject_TypeCheck(controls, &LDAPObjectControlType)) {
+		PyErr_SetString(PyExc_TypeError, "controls must be _LDAPObjectControl or None");
+		return NULL;
+	}
+
+	/* limits is (entries, bytes, values per attribute) which remain */
+	if (limits && limits != Py_None &&
+			!PyArg_ParseTuple(limits, "lnl", &budget.entries, &budget.bytes, &budget.values))
 		return NULL;
 
 	if (timeout > 0) {
 		tvp = &tv;
-		int2timeval(tvp, timeout);
+		double2timeval(tvp, timeout);
 	} else {
 		tvp = NULL;
 	}
@@ -311,10 +458,16 @@ LDAPObject_result(LDAPObject *self, PyObject *args)
 	if (result == NULL)
 		return PyErr_NoMemory();
 
+	self->entries = 0;
+	self->bytes = 0;
+	self->decode_time = 0;
+
 	/* Get result */
+	begin = monotonic();
 	LDAP_BEGIN_ALLOW_THREADS
 	rc = ldap_result(self->ldap, msgid, all, tvp, &res);
 	LDAP_END_ALLOW_THREADS
+	self->wait_time = monotonic() - begin;
 	if (rc < 0) {
 		XDECREF_MANY(result);
 		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
@@ -325,13 +478,21 @@ LDAPObject_result(LDAPObject *self, PyObject *args)
 		return NULL;
 	}
 
+	begin = monotonic();
 	for (msg = ldap_first_message(self->ldap, res);
 			msg != NULL;
 			msg = ldap_next_message(self->ldap, msg)) {
 		switch (ldap_msgtype(msg)) {
 			case LDAP_RES_SEARCH_ENTRY:
-				message = get_entry(self->ldap, msg);
+				if (budget.entries >= 0 && self->entries >= budget.entries) {
+					budget_exceeded(&budget, "entries");
+					goto exceeded;
+				}
+				self->entries++;
+				message = get_entry(self->ldap, msg, &self->bytes, &budget);
 				if (message == NULL) {
+					if (budget.exceeded)
+						goto exceeded;
 					ldap_msgfree(res);
 					XDECREF_MANY(result);
 					return NULL;
@@ -373,8 +534,32 @@ LDAPObject_result(LDAPObject *self, PyObject *args)
 		}
 	}
 done:
+	self->decode_time = monotonic() - begin;
 	ldap_msgfree(res);
 	return result;
+
+exceeded:
+	/* The rest of results is not received */
+	LDAP_BEGIN_ALLOW_THREADS
+	ldap_abandon_ext(self->ldap, ldap_msgid(msg), NULL, NULL);
+	LDAP_END_ALLOW_THREADS
+	self->decode_time = monotonic() - begin;
+	ldap_msgfree(res);
+	XDECREF_MANY(result);
+	return NULL;
+}
+
+
+/* Timings and sizes of the last search request and result */
+PyObject *
+LDAPObject_get_timings(LDAPObject *self, PyObject *args)
+{
+	return Py_BuildValue("{s:d, s:d, s:d, s:l, s:n}",
+			"send", self->send_time,
+			"wait", self->wait_time,
+			"decode", self->decode_time,
+			"entries", self->entries,
+			"bytes", self->bytes);
 }
 
 /* vi: set noexpandtab : */
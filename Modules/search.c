@@ -18,7 +18,7 @@ LDAPObject_search(LDAPObject *self, PyObject *args)
 	int attrsonly = 0;
 	PyObject *controls = NULL;
 	LDAPObjectControl *ldapoc = NULL;
-	int timeout = LDAP_NO_LIMIT;
+	double timeout = LDAP_NO_LIMIT;
 	int sizelimit = LDAP_NO_LIMIT;
 	struct timeval tv;
 	struct timeval *tvp = NULL;
@@ -29,20 +29,21 @@ LDAPObject_search(LDAPObject *self, PyObject *args)
 	Py_ssize_t size;
 	int rc;
 	int msgid;
+	double begin;
 
 	if (self->ldap == NULL) {
 		PyErr_SetString(LDAPError, "This instance has already been deallocated.");
 		return NULL;
 	}
 
-	if (!PyArg_ParseTuple(args, "sis|OiiiO!", &base, &scope, &filter,
+	if (!PyArg_ParseTuple(args, "sis|OidiO!", &base, &scope, &filter,
 				&attributes, &attrsonly, &timeout, &sizelimit,
 				&LDAPObjectControlType, &controls))
 		return NULL;
 
 	if (timeout > 0) {
 		tvp = &tv;
-		int2timeval(tvp, timeout);
+		double2timeval(tvp, timeout);
 	} else {
 		tvp = NULL;
 	}
@@ -71,10 +72,12 @@ LDAPObject_search(LDAPObject *self, PyObject *args)
 		cctrls = ldapoc->cctrls;
 	}
 
+	begin = monotonic();
 	LDAP_BEGIN_ALLOW_THREADS
 	rc = ldap_search_ext(self->ldap, base, scope, filter, attrs,
 			attrsonly, sctrls, cctrls, tvp, sizelimit, &msgid);
 	LDAP_END_ALLOW_THREADS
+	self->send_time = monotonic() - begin;
 	if (rc != LDAP_SUCCESS) {
 		if (attrs)
 			PyMem_RawFree(attrs);
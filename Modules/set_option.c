@@ -19,7 +19,7 @@ LDAPObject_set_option(LDAPObject *self, PyObject *args)
 	int integer = 0;
 	ber_len_t bv_len;
 	char *string = NULL;
-	int timeout;
+	double timeout;
 	struct timeval tv;
 	struct timeval *tvp = NULL;
 	int i;
@@ -55,6 +55,7 @@ LDAPObject_set_option(LDAPObject *self, PyObject *args)
 		case LDAP_OPT_X_KEEPALIVE_INTERVAL:
 		case LDAP_OPT_X_TLS_CRLCHECK:
 		case LDAP_OPT_X_TLS_PROTOCOL_MIN:
+		case LDAP_OPT_X_TLS_NEWCTX:
 		case LDAP_OPT_X_TLS_REQUIRE_CERT:
 		case LDAP_OPT_X_SASL_NOCANON:
 			integer = (int)PyLong_AsLong(value);
@@ -86,11 +87,12 @@ LDAPObject_set_option(LDAPObject *self, PyObject *args)
 			break;
 		case LDAP_OPT_NETWORK_TIMEOUT:
 		case LDAP_OPT_TIMEOUT:
-			if ((timeout = (int)PyLong_AsLong(value)) == -1)
+			timeout = PyFloat_AsDouble(value);
+			if (timeout == -1.0 && PyErr_Occurred())
 				return NULL;
 			if (timeout > 0) {
 				tvp = &tv;
-				int2timeval(tvp, timeout);
+				double2timeval(tvp, timeout);
 			} else {
 				tvp = NULL;
 			}
@@ -113,6 +115,10 @@ LDAPObject_set_option(LDAPObject *self, PyObject *args)
 			referral_urls[size] = NULL;
 			ptr = referral_urls;
 			break;
+		case LDAP_OPT_X_TLS_CTX:
+			if (python2tls_ctx(ctx, value) == -1)
+				return NULL;
+			Py_RETURN_NONE;
 		default:
 			PyErr_SetString(LDAPError, "Specified option is not supported or read-only");
 			return NULL;
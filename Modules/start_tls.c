@@ -41,4 +41,25 @@ LDAPObject_start_tls(LDAPObject *self, PyObject *args)
 	Py_RETURN_NONE;
 }
 
+/* Install TLS after StartTLS extended operation was done asynchronously */
+PyObject *
+LDAPObject_install_tls(LDAPObject *self, PyObject *args)
+{
+	int rc;
+
+	if (self->ldap == NULL) {
+		PyErr_SetString(LDAPError, "This instance has already been deallocated.");
+		return NULL;
+	}
+
+	LDAP_BEGIN_ALLOW_THREADS
+	rc = ldap_install_tls(self->ldap);
+	LDAP_END_ALLOW_THREADS
+	if (rc != LDAP_SUCCESS) {
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
+		return NULL;
+	}
+	Py_RETURN_NONE;
+}
+
 /* vi: set noexpandtab : */
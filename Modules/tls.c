@@ -0,0 +1,171 @@
+/*
+ * A Python binding for libldap.
+ *
+ * Copyright (C) 2015 Yutaka Kamei
+ *
+ */
+
+#include "libldap.h"
+#include <string.h>
+#include <pthread.h>
+#include <openssl/ssl.h>
+
+#define TLS_CTX_CAPSULE "_libldap.tls_ctx"
+
+/* This is exported by libldap (OpenLDAP 2.4 and later), but it is private
+ * API and ldap_pvt.h is not installed. There is no public function which
+ * releases the reference taken by ldap_get_option(LDAP_OPT_X_TLS_CTX). */
+extern void ldap_pvt_tls_ctx_free(void *ctx);
+
+/* SSL_CTX ex_data index of the latest client session */
+static int session_index = -1;
+
+/* Handshakes run without GIL, so the session slot is guarded by this lock */
+static pthread_mutex_t session_lock = PTHREAD_MUTEX_INITIALIZER;
+
+
+static int
+is_openssl(void)
+{
+#ifdef LDAP_OPT_X_TLS_PACKAGE
+	char *package = NULL;
+	int openssl;
+
+	if (ldap_get_option(NULL, LDAP_OPT_X_TLS_PACKAGE, &package) != LDAP_OPT_SUCCESS || package == NULL)
+		return 0;
+	openssl = strcmp(package, "OpenSSL") == 0;
+	ldap_memfree(package);
+	return openssl;
+#else
+	return 0;
+#endif
+}
+
+
+static void
+free_session(void *parent, void *ptr, CRYPTO_EX_DATA *ad, int idx, long argl, void *argp)
+{
+	if (ptr)
+		SSL_SESSION_free((SSL_SESSION *)ptr);
+}
+
+
+/* Remember the latest session, which is offered by the next handshake */
+static int
+new_session(SSL *ssl, SSL_SESSION *session)
+{
+	SSL_CTX *ssl_ctx = SSL_get_SSL_CTX(ssl);
+	SSL_SESSION *old;
+	int rc;
+
+	pthread_mutex_lock(&session_lock);
+	old = SSL_CTX_get_ex_data(ssl_ctx, session_index);
+	rc = SSL_CTX_set_ex_data(ssl_ctx, session_index, session);
+	pthread_mutex_unlock(&session_lock);
+	if (rc != 1)
+		return 0;
+	/* Handshakes which have got old session hold their own reference */
+	if (old)
+		SSL_SESSION_free(old);
+	return 1;  /* The reference of session is kept */
+}
+
+
+/* LDAP_OPT_X_TLS_CONNECT_CB which is called before handshake */
+static int
+resume_session(LDAP *ld, void *ssl, void *ctx, void *arg)
+{
+	SSL_SESSION *session;
+
+	pthread_mutex_lock(&session_lock);
+	session = SSL_CTX_get_ex_data((SSL_CTX *)ctx, session_index);
+	if (session)
+		SSL_SESSION_up_ref(session);
+	pthread_mutex_unlock(&session_lock);
+
+	if (session) {
+		/* SSL_set_session() takes its own reference */
+		SSL_set_session((SSL *)ssl, session);
+		SSL_SESSION_free(session);
+	}
+	return 0;
+}
+
+
+static void
+tls_ctx_destructor(PyObject *capsule)
+{
+	void *ctx = PyCapsule_GetPointer(capsule, TLS_CTX_CAPSULE);
+
+	if (ctx)
+		ldap_pvt_tls_ctx_free(ctx);
+}
+
+
+/* Wrap TLS context which is got by LDAP_OPT_X_TLS_CTX.
+ * The capsule owns the reference which ldap_get_option() took.
+ * The context itself is not changed. */
+PyObject *
+tls_ctx2python(void *ctx)
+{
+	PyObject *capsule;
+
+	if (ctx == NULL)
+		Py_RETURN_NONE;
+
+	if ((capsule = PyCapsule_New(ctx, TLS_CTX_CAPSULE, tls_ctx_destructor)) == NULL)
+		ldap_pvt_tls_ctx_free(ctx);
+	return capsule;
+}
+
+
+/* Remember the latest client session of TLS context, so that it is offered
+ * by the next handshake. This is called only for the context which is
+ * created by TLSContext. Return False if libldap does not use OpenSSL. */
+PyObject *
+LDAPObject_cache_tls_sessions(LDAPObject *self, PyObject *args)
+{
+	PyObject *capsule;
+	void *ctx;
+
+	if (!PyArg_ParseTuple(args, "O", &capsule))
+		return NULL;
+	if ((ctx = PyCapsule_GetPointer(capsule, TLS_CTX_CAPSULE)) == NULL)
+		return NULL;
+
+	if (session_index < 0 && is_openssl())
+		session_index = SSL_CTX_get_ex_new_index(0, NULL, NULL, NULL, free_session);
+	if (session_index < 0)
+		Py_RETURN_FALSE;
+
+	/* Sessions are not looked up by OpenSSL itself on client side */
+	SSL_CTX_set_session_cache_mode((SSL_CTX *)ctx,
+			SSL_SESS_CACHE_CLIENT | SSL_SESS_CACHE_NO_INTERNAL_STORE);
+	SSL_CTX_sess_set_new_cb((SSL_CTX *)ctx, new_session);
+	Py_RETURN_TRUE;
+}
+
+
+/* Share TLS context with ld (NULL implies global options) */
+int
+python2tls_ctx(LDAP *ld, PyObject *capsule)
+{
+	void *ctx;
+	int rc;
+
+	if ((ctx = PyCapsule_GetPointer(capsule, TLS_CTX_CAPSULE)) == NULL)
+		return -1;
+
+	LDAP_BEGIN_ALLOW_THREADS
+	rc = ldap_set_option(ld, LDAP_OPT_X_TLS_CTX, ctx);
+	if (rc == LDAP_OPT_SUCCESS && session_index >= 0)
+		rc = ldap_set_option(ld, LDAP_OPT_X_TLS_CONNECT_CB, (void *)resume_session);
+	LDAP_END_ALLOW_THREADS
+	if (rc != LDAP_OPT_SUCCESS) {
+		PyErr_Format(LDAPError, "%s (%d)", ldap_err2string(rc), rc);
+		return -1;
+	}
+	return 0;
+}
+
+/* vi: set noexpandtab : */
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""Benchmark for C decode and encode hot paths
+
+This does not require LDAP server. Synthetic BER-encoded messages are
+replayed by a responder process on loopback, so that result decoding
+(get_entry(), parse_result()), search_result() wrapper and mod encoding
+(python2LDAPMods()) are measured with realistic shapes::
+
+    python -m Tests.bench_codec
+    python -m Tests.bench_codec --save-baseline
+    python -m Tests.bench_codec --cases narrow wide --tolerance 0.05
+
+Each case reports entries/s, memory blocks retained per entry and peak
+traced memory. Rates of decode cases are computed from decode time taken
+in C (see _LDAPObject.get_timings()), and search_result cases exclude time
+waiting for the responder.
+
+If baseline file exists, results are compared with it and exit status is 1
+when any case regresses more than tolerance.
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from _libldap import _LDAPObject
+from libldap import LDAP
+from libldap.constants import LDAP_SCOPE_SUB
+from libldap.core import _ber_tlv
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_codec.json')
+SUFFIX = 'dc=bench'
+
+
+def _b(text):
+    return text.encode('utf-8')
+
+
+def narrow_entry(i):
+    uid = _b('user%d' % (i,))
+    return [
+        ('objectClass', [b'top', b'person', b'inetOrgPerson']),
+        ('uid', [uid]),
+        ('cn', [b'User ' + uid]),
+        ('sn', [b'User']),
+        ('mail', [uid + b'@example.com']),
+    ]
+
+
+def wide_entry(i):
+    return [('attr%d' % (j,), [_b('value %d of entry %d' % (j, i))]) for j in range(60)]
+
+
+def multivalued_entry(i):
+    return [
+        ('objectClass', [b'top', b'groupOfNames']),
+        ('cn', [_b('group%d' % (i,))]),
+        ('member', [_b('uid=user%d,ou=Users,dc=example,dc=com' % (j,)) for j in range(5000)]),
+    ]
+
+
+def binary_entry(i):
+    return [
+        ('objectClass', [b'top', b'person']),
+        ('cn', [_b('photo%d' % (i,))]),
+        ('jpegPhoto', [bytes(range(256)) * 1024]),
+    ]
+
+
+# name: (number of entries, attributes of i-th entry)
+SHAPES = OrderedDict((
+    ('narrow', (10000, narrow_entry)),
+    ('wide', (2000, wide_entry)),
+    ('multivalued', (20, multivalued_entry)),
+    ('binary', (20, binary_entry)),
+))
+
+# Lower is better for these metrics, higher is better for the others
+LOWER_IS_BETTER = ('blocks_per_entry', 'peak_kib')
+
+
+def entry_dn(shape, i):
+    return 'cn=%d,cn=%s,%s' % (i, shape, SUFFIX)
+
+
+# Responder
+
+# LDAPResult of success: resultCode, matchedDN and diagnosticMessage
+_SUCCESS = b'\x0a\x01\x00\x04\x00\x04\x00'
+# Request tag: response tag (bind, modify, add)
+_RESPONSES = {0x60: 0x61, 0x66: 0x67, 0x68: 0x69}
+
+
+def _read_tlv(data, pos):
+    # Return (tag, start, end) of BER element at pos, or None if it is incomplete
+    if len(data) < pos + 2:
+        return None
+    tag, length = data[pos], data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        size = length & 0x7f
+        if len(data) < pos + size:
+            return None
+        length = int.from_bytes(bytes(data[pos:pos + size]), 'big')
+        pos += size
+    if len(data) < pos + length:
+        return None
+    return tag, pos, pos + length
+
+
+def _message(msgid, op):
+    # LDAPMessage ::= SEQUENCE { messageID INTEGER, protocolOp }
+    return _ber_tlv(0x30, _ber_tlv(0x02, msgid.to_bytes(msgid.bit_length() // 8 + 1, 'big')) + op)
+
+
+def _search_entry(dn, attributes):
+    # SearchResultEntry ::= [APPLICATION 4] SEQUENCE { objectName, attributes }
+    encoded = b''.join(
+        _ber_tlv(0x30, _ber_tlv(0x04, name.encode('utf-8')) +
+                 _ber_tlv(0x31, b''.join(_ber_tlv(0x04, value) for value in values)))
+        for name, values in attributes)
+    return _ber_tlv(0x64, _ber_tlv(0x04, dn.encode('utf-8')) + _ber_tlv(0x30, encoded))
+
+
+def _search_entries(shape):
+    count, make = SHAPES[shape]
+    return [_search_entry(entry_dn(shape, i), make(i)) for i in range(count)]
+
+
+def serve(sock):
+    """Answer requests on the first connection of sock with synthetic messages"""
+    conn, _ = sock.accept()
+    entries = {}
+    data = bytearray()
+    while True:
+        received = conn.recv(1 << 16)
+        if not received:
+            break
+        data += received
+        while True:
+            element = _read_tlv(data, 0)
+            if element is None:
+                break
+            _, start, end = element
+            _, _, pos = _read_tlv(data, start)
+            msgid = int.from_bytes(bytes(data[start + 2:pos]), 'big')
+            tag, op_start, _ = _read_tlv(data, pos)
+            if tag == 0x63:
+                # Search base is 'cn=<shape>,dc=bench'
+                _, base_start, base_end = _read_tlv(data, op_start)
+                shape = bytes(data[base_start:base_end]).decode('utf-8').split(',')[0][3:]
+                if shape not in entries:
+                    entries[shape] = _search_entries(shape)
+                conn.sendall(b''.join(_message(msgid, x) for x in entries[shape]) +
+                             _message(msgid, _ber_tlv(0x65, _SUCCESS)))
+            elif tag in _RESPONSES:
+                conn.sendall(_message(msgid, _ber_tlv(_RESPONSES[tag], _SUCCESS)))
+            elif tag == 0x42:
+                # UnbindRequest
+                conn.close()
+                return
+            del data[:end]
+    conn.close()
+
+
+# Measurement
+
+def measure(run, entries, repeat):
+    """
+    run() returns (seconds, result). The fastest of repeat calls is taken.
+    Memory is measured by separate calls, so that it does not slow the others.
+    """
+    seconds = min(run()[0] for _ in range(repeat))
+
+    gc.collect()
+    gc.disable()
+    try:
+        blocks = sys.getallocatedblocks()
+        _, result = run()
+        blocks = sys.getallocatedblocks() - blocks
+        del result
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        _, result = run()
+        peak = tracemalloc.get_traced_memory()[1]
+        del result
+    finally:
+        tracemalloc.stop()
+
+    return OrderedDict((
+        ('entries', entries),
+        ('entries_per_sec', entries / seconds),
+        ('blocks_per_entry', blocks / entries),
+        ('peak_kib', peak / 1024.0),
+    ))
+
+
+def bench_decode(ld, shape, repeat):
+    # _LDAPObject.result(): ldap_result(), get_entry() and parse_result()
+    base = 'cn=%s,%s' % (shape, SUFFIX)
+
+    def run():
+        msgid = _LDAPObject.search(ld, base, LDAP_SCOPE_SUB, '(objectClass=*)', None, 0, 0.0, 0)
+        result = _LDAPObject.result(ld, msgid, 1, 0.0)
+        return _LDAPObject.get_timings(ld)['decode'], result
+    return measure(run, SHAPES[shape][0], repeat)
+
+
+def bench_search_result(ld, shape, repeat):
+    # LDAP.search() including conversion by search_result()
+    base = 'cn=%s,%s' % (shape, SUFFIX)
+
+    def run():
+        start = time.perf_counter()
+        result = ld.search(base, LDAP_SCOPE_SUB)
+        elapsed = time.perf_counter() - start
+        return elapsed - _LDAPObject.get_timings(ld)['wait'], result
+    return measure(run, SHAPES[shape][0], repeat)
+
+
+def bench_encode(ld, shape, repeat):
+    # _LDAPObject.add(): python2LDAPMods() and request encoding
+    count, make = SHAPES[shape]
+    requests = [(entry_dn(shape, i), make(i)) for i in range(count)]
+
+    def run():
+        elapsed = 0.0
+        for dn, attributes in requests:
+            start = time.perf_counter()
+            msgid = _LDAPObject.add(ld, dn, attributes)
+            elapsed += time.perf_counter() - start
+            _LDAPObject.result(ld, msgid, 1, 0.0)
+        return elapsed, None
+    return measure(run, count, repeat)
+
+
+BENCHMARKS = OrderedDict((
+    ('decode', bench_decode),
+    ('search_result', bench_search_result),
+    ('encode', bench_encode),
+))
+
+
+def compare(results, baseline, tolerance):
+    # Return names of regressed metrics
+    regressions = []
+    for name, metrics in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for key, value in metrics.items():
+            if key == 'entries' or key not in previous or not previous[key]:
+                continue
+            change = value / previous[key] - 1
+            if (-change if key in LOWER_IS_BETTER else change) < -tolerance:
+                regressions.append('%s %s %.1f -> %.1f (%+.1f%%)' % (
+                    name, key, previous[key], value, change * 100))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='+', choices=list(SHAPES), default=list(SHAPES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Allowed ratio of regression (the default is 0.1)')
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(1)
+    responder = multiprocessing.Process(target=serve, args=(sock,))
+    responder.daemon = True
+    responder.start()
+    ld = LDAP('ldap://127.0.0.1:%d/' % (sock.getsockname()[1],))
+    sock.close()
+
+    results = OrderedDict()
+    try:
+        for shape in args.cases:
+            for kind, bench in BENCHMARKS.items():
+                name = '%s/%s' % (kind, shape)
+                results[name] = metrics = bench(ld, shape, args.repeat)
+                print('%-26s %6d entries %12.0f entries/s %10.2f blocks/entry %10.1f KiB peak' % (
+                    name, metrics['entries'], metrics['entries_per_sec'],
+                    metrics['blocks_per_entry'], metrics['peak_kib']))
+    finally:
+        ld.unbind()
+        responder.join(5)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print('Baseline is saved to %s' % (args.baseline,))
+        return 0
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print('REGRESSION %s' % (line,))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""Benchmark for client-side filter evaluation
+
+This does not require LDAP server::
+
+    python -m Tests.bench_filter --entries 1000000
+"""
+
+import argparse
+import time
+
+from libldap.core import _DictEntry
+from libldap.filter import parse_filter
+
+FILTERS = (
+    '(uid=user500000)',
+    '(&(objectClass=posixAccount)(uidNumber>=999000))',
+    '(|(mail=*@example.org)(cn=User 12*))',
+    '(&(objectClass=person)(!(loginShell=/bin/false)))',
+)
+
+
+def generate_entries(count):
+    for i in range(count):
+        uid = 'user%d' % (i,)
+        yield _DictEntry('uid=%s,ou=Users,dc=example,dc=com' % (uid,), [
+            ('objectClass', [b'top', b'person', b'inetOrgPerson', b'posixAccount']),
+            ('uid', [uid.encode('utf-8')]),
+            ('cn', [('User %d' % (i,)).encode('utf-8')]),
+            ('uidNumber', [str(i).encode('utf-8')]),
+            ('mail', [('%s@example.%s' % (uid, 'org' if i % 10 == 0 else 'com')).encode('utf-8')]),
+            ('loginShell', [b'/bin/false' if i % 3 == 0 else b'/bin/bash']),
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1000000)
+    args = parser.parse_args()
+
+    entries = list(generate_entries(args.entries))
+    for text in FILTERS:
+        match = parse_filter(text).matcher()
+        start = time.perf_counter()
+        matched = sum(1 for entry in entries if match(entry))
+        elapsed = time.perf_counter() - start
+        print('%-50s %8d matched %8.3fs %12.0f entries/s' % (
+            text, matched, elapsed, len(entries) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
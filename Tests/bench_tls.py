@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+"""Benchmark for TLS handshakes with and without shared TLSContext
+
+This requires LDAP server which supports StartTLS (see Tests/environ.py)::
+
+    python -m Tests.bench_tls --connections 200
+"""
+
+import argparse
+import os
+import time
+
+from libldap import LDAP, TLSContext
+from libldap.constants import LDAP_OPT_X_TLS_CACERTFILE, LDAP_OPT_X_TLS_NEWCTX
+
+from .environ import Environment, cacert_file
+
+
+def handshakes(uri, count, tls_context):
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for _ in range(count):
+        if tls_context is None:
+            # Per-connection context, which loads CA certificates every time
+            ld = LDAP(uri, options=[(LDAP_OPT_X_TLS_CACERTFILE, str(cacert_file), False),
+                                    (LDAP_OPT_X_TLS_NEWCTX, 0, False)])
+        else:
+            ld = LDAP(uri, tls_context=tls_context)
+        ld.start_tls()
+        ld.unbind()
+    return time.process_time() - cpu, time.perf_counter() - wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=200)
+    parser.add_argument('--server', default=os.environ.get('TEST_SERVER', 'ldap-server'))
+    args = parser.parse_args()
+
+    uri = Environment[args.server]['uri_389']
+    shared = TLSContext([(LDAP_OPT_X_TLS_CACERTFILE, str(cacert_file))])
+    for name, tls_context in (('per-connection context', None), ('shared TLSContext', shared)):
+        cpu, wall = handshakes(uri, args.connections, tls_context)
+        print('%-24s %6d handshakes cpu %8.3fs (%7.3fms each) wall %8.3fs' % (
+            name, args.connections, cpu, cpu * 1000 / args.connections, wall))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,20 +2,31 @@
 # Copyright (C) 2015 Yutaka Kamei
 
 import os
+import socket
 import time
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 from types import GeneratorType
+from uuid import uuid4
 
 from .environ import Environment, cacert_file, create_user_entry
-from libldap import LDAP, LDAPControl, LDAPError
+from libldap import (LDAP, BindVerifier, LDAPAssertionFailed, LDAPBudgetExceeded, LDAPControl, LDAPError,
+                     LDAPTimeout, Equal, Metrics, ResultBudget, RetryPolicy, TLSContext, Tracer)
+from libldap.core import _DictEntry, _diff_entry, _txn_end_value
 from libldap.constants import (
         LDAP_CONTROL_PASSWORDPOLICYREQUEST,
+        LDAP_CONTROL_POST_READ,
+        LDAP_CONTROL_PRE_READ,
         LDAP_CONTROL_RELAX,
+        LDAP_EXOP_TXN_START,
         LDAP_SCOPE_SUB,
+        LDAP_MOD_ADD,
         LDAP_MOD_REPLACE,
         LDAP_MOD_DELETE,
+        LDAP_OPT_DESC,
+        LDAP_OPT_SIZELIMIT,
         LDAP_OPT_X_TLS_CACERTFILE,
+        LDAP_OPT_X_TLS_CTX,
 )
 
 
@@ -57,6 +68,49 @@ class LDAPBindTests(unittest.TestCase):
         self.assertEqual(result['return_code'], 49)
 
 
+class LDAPConnectManyTests(unittest.TestCase):
+    def setUp(self):
+        server = os.environ.get('TEST_SERVER', 'ldap-server')
+        self.env = Environment[server]
+
+    def test_connect_many(self):
+        pool = LDAP.connect_many(self.env['uri_389'], 4, self.env['root_dn'], self.env['root_pw'],
+                                 options=[(LDAP_OPT_X_TLS_CACERTFILE, str(cacert_file), True)],
+                                 start_tls=True)
+        self.assertEqual(len(pool), 4)
+        for ld in pool:
+            self.assertEqual(list(ld.timings), ['initialize', 'start_tls', 'tls_handshake', 'bind', 'total'])
+            self.assertEqual(ld.whoami(), 'dn:' + self.env['root_dn'])
+            ld.unbind()
+
+
+class BindVerifierTests(unittest.TestCase):
+    def setUp(self):
+        server = os.environ.get('TEST_SERVER', 'ldap-server')
+        self.env = Environment[server]
+        (dn, attributes) = create_user_entry()
+        self.user_dn = dn
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        ld.add(dn, attributes)
+
+    def tearDown(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        ld.delete(self.user_dn)
+
+    def test_verify_many(self):
+        with BindVerifier(LDAP.connect_many(self.env['uri_389'], 2)) as verifier:
+            results = verifier.verify_many([(self.user_dn, 'secret'), (self.user_dn, 'bad password')])
+        self.assertEqual([x['who'] for x in results], [self.user_dn, self.user_dn])
+        self.assertEqual([x['return_code'] for x in results], [0, 49])
+        # Password policy response is parsed from BIND response
+        for result in results:
+            self.assertIn('ppolicy_msg', result)
+            self.assertIn('ppolicy_expire', result)
+            self.assertIn('ppolicy_grace', result)
+
+
 class LDAPSearchTests(unittest.TestCase):
     def setUp(self):
         server = os.environ.get('TEST_SERVER', 'ldap-server')
@@ -93,6 +147,86 @@ class LDAPSearchTests(unittest.TestCase):
             ld.search(self.env['suffix'], LDAP_SCOPE_SUB, sizelimit=1)
         self.assertEqual(cm.exception.return_code, 4)  # Size limit exceeded (4)
 
+    def test_search_deadline(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'], deadline=timedelta(seconds=5))
+        entries = ld.search(self.env['suffix'], timeout=0.5, deadline=1.5)
+        self.assertEqual(len(entries), 1)
+        with self.assertRaises(LDAPTimeout):
+            ld.search(self.env['suffix'], LDAP_SCOPE_SUB, deadline=0.000001)
+        with self.assertRaises(LDAPTimeout):
+            # Positional deadline
+            ld.compare(self.env['auth_user'], 'cn', 'auth', None, 0.000001)
+
+    def test_search_tracer(self):
+        class RecordTracer(Tracer):
+            def __init__(self):
+                self.calls = []
+
+            def start(self, context):
+                self.calls.append(('start', context.operation))
+
+            def send(self, context):
+                self.calls.append(('send', context.msgid))
+
+            def first_result(self, context):
+                self.calls.append(('first_result', context.operation))
+
+            def last_result(self, context):
+                self.calls.append(('last_result', context.entries))
+
+            def error(self, context, error):
+                self.calls.append(('error', error.return_code))
+
+        tracer = RecordTracer()
+        ld = LDAP(self.env['uri_389'], tracer=tracer)
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        del tracer.calls[:]
+        entries = ld.search(self.env['suffix'], LDAP_SCOPE_SUB, filter='cn=auth')
+        self.assertEqual([name for name, _ in tracer.calls],
+                         ['start', 'send', 'first_result', 'last_result'])
+        self.assertEqual(tracer.calls[-1], ('last_result', len(entries)))
+        del tracer.calls[:]
+        msgid = ld.search(self.env['suffix'], LDAP_SCOPE_SUB, filter='cn=auth', async=True)
+        self.assertEqual(tracer.calls[-1], ('send', msgid))
+        ld.search_result(msgid)
+        self.assertEqual(tracer.calls[-1], ('last_result', len(entries)))
+        with self.assertRaises(LDAPError):
+            ld.search(self.env['suffix'], LDAP_SCOPE_SUB, sizelimit=1)
+        self.assertEqual(tracer.calls[-1], ('error', 4))
+        del tracer.calls[:]
+        self.assertEqual(ld.whoami(), 'dn:' + self.env['root_dn'])
+        self.assertEqual([name for name, _ in tracer.calls],
+                         ['start', 'send', 'first_result', 'last_result'])
+        self.assertEqual(tracer.calls[0], ('start', 'whoami'))
+
+    def test_search_metrics(self):
+        metrics = Metrics()
+        ld = LDAP(self.env['uri_389'], metrics=metrics)
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        entries = ld.search(self.env['suffix'], LDAP_SCOPE_SUB, filter='cn=auth')
+        # Synchronous operations are counted once
+        self.assertEqual(metrics.operations, {'bind': 1, 'search': 1})
+        self.assertEqual(metrics.entries['search'].sum, len(entries))
+        msgid = ld.search(self.env['suffix'], LDAP_SCOPE_SUB, filter='cn=auth', async=True)
+        ld.search_result(msgid)
+        self.assertEqual(metrics.operations, {'bind': 1, 'search': 2, 'result': 1})
+        self.assertEqual(metrics.entries['result'].sum, len(entries))
+        self.assertEqual(metrics.in_flight, {'bind': 0, 'search': 0, 'result': 0})
+
+    def test_search_budget(self):
+        ld = LDAP(self.env['uri_389'], budget=ResultBudget(max_entries=1))
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        self.assertEqual(len(ld.search(self.env['suffix'])), 1)
+        with self.assertRaises(LDAPBudgetExceeded):
+            ld.search(self.env['suffix'], LDAP_SCOPE_SUB)
+        with self.assertRaises(LDAPBudgetExceeded):
+            ld.search(self.env['suffix'], budget=ResultBudget(max_bytes=10))
+        with self.assertRaises(LDAPBudgetExceeded):
+            list(ld.paged_search(self.env['suffix'], LDAP_SCOPE_SUB, pagesize=1))
+        entries = ld.search(self.env['suffix'], LDAP_SCOPE_SUB, budget=ResultBudget(max_values=100))
+        self.assertGreater(len(entries), 1)
+
     def test_paged_search(self):
         ld = LDAP(self.env['uri_389'])
         ld.bind(self.env['root_dn'], self.env['root_pw'])
@@ -100,6 +234,30 @@ class LDAPSearchTests(unittest.TestCase):
         self.assertIsInstance(gen, GeneratorType)
         [x for x in gen]
 
+    def test_paged_search_close(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        gen = ld.paged_search(self.env['suffix'], LDAP_SCOPE_SUB, pagesize=1)
+        next(gen)
+        gen.close()
+        entries = list(ld.paged_search(self.env['suffix'], LDAP_SCOPE_SUB, pagesize=1))
+        self.assertGreater(len(entries), 1)
+
+    def test_lookup_many(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        found = ld.lookup_many('cn', ['auth', 'no-such-cn*'], self.env['suffix'], chunk=1)
+        self.assertEqual(found['auth'].dn, self.env['auth_user'])
+        self.assertEqual(found.missing, ['no-such-cn*'])
+
+    def test_lookup_many_dn(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        missing_dn = 'cn=no-such-entry,%s' % (self.env['suffix'],)
+        found = ld.lookup_many('dn', [self.env['auth_user'], missing_dn], self.env['suffix'])
+        self.assertIn(self.env['auth_user'], found)
+        self.assertEqual(found.missing, [missing_dn])
+
 
 class LDAPAddTests(unittest.TestCase):
     def setUp(self):
@@ -119,6 +277,21 @@ class LDAPAddTests(unittest.TestCase):
         ld.bind(self.env['root_dn'], self.env['root_pw'])
         ld.add(self.new_user_dn, self.new_user_attributes)
 
+    def test_add_buffer(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        attributes = [(key, [memoryview(x.encode('utf-8')) for x in values])
+                      for key, values in self.new_user_attributes]
+        attributes.append(('title', [bytearray(b'bytearray value')]))
+        ld.add(self.new_user_dn, attributes)
+
+    def test_add_dict(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        attributes = dict((key, tuple(values)) for key, values in self.new_user_attributes)
+        attributes['mail'] = set(attributes['mail'])
+        ld.add(self.new_user_dn, attributes)
+
     def test_add_async(self):
         ld = LDAP(self.env['uri_389'])
         ld.bind(self.env['root_dn'], self.env['root_pw'])
@@ -179,6 +352,60 @@ class LDAPModifyTests(unittest.TestCase):
         ]
         ld.modify(self.env['target_user'], changes, controls=c)
 
+    def test_modify_with_read_controls(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        c = LDAPControl()
+        c.add_control(LDAP_CONTROL_PRE_READ, b'description')
+        c.add_control(LDAP_CONTROL_POST_READ, b'description, modifyTimestamp')
+        dtime = datetime.utcnow().strftime('%Y%m%d%H%M%S.%fZ')
+        changes = [
+            ('description', ['Modified at %s' % (dtime,)], LDAP_MOD_REPLACE)
+        ]
+        result = ld.modify(self.env['target_user'], changes, controls=c)
+        self.assertEqual(result['pre_read'].dn, self.env['target_user'])
+        self.assertEqual(result['post_read']['description'], [('Modified at %s' % (dtime,)).encode('utf-8')])
+        self.assertIn('modifyTimestamp', result['post_read'])
+
+    def test_sync_entry(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        dtime = datetime.utcnow().strftime('%Y%m%d%H%M%S.%fZ')
+        desired = {'description': ['Synchronized at %s' % (dtime,)]}
+        changes = ld.sync_entry(self.env['target_user'], desired)
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(ld.sync_entry(self.env['target_user'], desired), [])
+
+    def test_compare_and_modify(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        dtime = datetime.utcnow().strftime('%Y%m%d%H%M%S.%fZ')
+        current = 'Asserted at %s' % (dtime,)
+        ld.modify(self.env['target_user'], [('description', [current], LDAP_MOD_REPLACE)])
+        changes = [('description', ['Updated at %s' % (dtime,)], LDAP_MOD_REPLACE)]
+        with self.assertRaises(LDAPAssertionFailed):
+            ld.compare_and_modify(self.env['target_user'], Equal('description', 'Not %s' % (current,)), changes)
+        entry = ld.search(self.env['target_user'], attributes=['description'])[0]
+        self.assertEqual(entry['description'], [current.encode('utf-8')])
+        self.assertEqual(ld.compare_and_modify(self.env['target_user'], Equal('description', current), changes),
+                         changes)
+        entry = ld.search(self.env['target_user'], attributes=['description'])[0]
+        self.assertEqual(entry['description'], [('Updated at %s' % (dtime,)).encode('utf-8')])
+
+    def test_diff_entry(self):
+        current = _DictEntry('cn=test', [('cn', [b'test']), ('mail', [b'a', b'b', b'c', b'd']),
+                                         ('description', [b'x'])])
+        desired = [('CN', ['test']), ('mail', [b'a', b'b', b'c', b'e']), ('description', None),
+                   ('sn', ['test']), ('title', [])]
+        self.assertEqual(_diff_entry(current, desired), [
+            ('mail', [b'd'], LDAP_MOD_DELETE),
+            ('mail', [b'e'], LDAP_MOD_ADD),
+            ('description', [], LDAP_MOD_DELETE),
+            ('sn', [b'test'], LDAP_MOD_ADD),
+        ])
+        self.assertEqual(_diff_entry(current, {'cn': ['other']}), [('cn', [b'other'], LDAP_MOD_REPLACE)])
+        self.assertEqual(_diff_entry(current, {'mail': [b'd', b'c', b'b', b'a']}), [])
+
 
 class LDAPDeleteTests(unittest.TestCase):
     def setUp(self):
@@ -203,6 +430,20 @@ class LDAPDeleteTests(unittest.TestCase):
         result = ld.result(msgid)
         self.assertEqual(result['return_code'], 0)
 
+    def test_delete_tree(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        ou = 'ou=tree-%s,%s' % (uuid4().hex, self.env['suffix'])
+        ld.add(ou, [('objectClass', ['organizationalUnit']), ('ou', [ou.split(',')[0][3:]])])
+        for i in range(10):
+            ld.add('cn=leaf%d,%s' % (i, ou), [('objectClass', ['organizationalRole']), ('cn', ['leaf%d' % (i,)])])
+        ld2 = LDAP(self.env['uri_389'])
+        ld2.bind(self.env['root_dn'], self.env['root_pw'])
+        stats = ld.delete_tree(ou, connections=[ld2], use_control=False)
+        self.assertEqual(stats['deleted'], 11)
+        with self.assertRaises(LDAPError):
+            ld.search(ou)
+
 
 class LDAPRenameTests(unittest.TestCase):
     def setUp(self):
@@ -251,6 +492,44 @@ class LDAPRenameTests(unittest.TestCase):
         ld.rename('%s,%s' % (newrdn, newparent), self.env['target_user'].split(',', 1)[0], newparent)
 
 
+class LDAPTransactionTests(unittest.TestCase):
+    def setUp(self):
+        server = os.environ.get('TEST_SERVER', 'ldap-server')
+        self.env = Environment[server]
+        ld = LDAP(self.env['uri_389'])
+        root_dse = ld.search('', attributes=['supportedExtension'])[0]
+        if LDAP_EXOP_TXN_START.encode('utf-8') not in root_dse.get('supportedExtension', []):
+            self.skipTest('LDAP server does not support transactions (RFC 5805)')
+
+    def test_transaction(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        (dn, attributes) = create_user_entry()
+        with ld.transaction() as txn:
+            txn.add(dn, attributes)
+            txn.modify(dn, [('description', ['In transaction'], LDAP_MOD_REPLACE)])
+        entry = ld.search(dn, attributes=['description'])[0]
+        self.assertEqual(entry['description'], [b'In transaction'])
+        ld.delete(dn)
+
+    def test_transaction_abort(self):
+        ld = LDAP(self.env['uri_389'])
+        ld.bind(self.env['root_dn'], self.env['root_pw'])
+        (dn, attributes) = create_user_entry()
+        with self.assertRaises(RuntimeError):
+            with ld.transaction() as txn:
+                txn.add(dn, attributes)
+                raise RuntimeError()
+        with self.assertRaises(LDAPError):
+            ld.search(dn)
+
+
+class TransactionValueTests(unittest.TestCase):
+    def test_txn_end_value(self):
+        self.assertEqual(_txn_end_value(b'1', True), b'\x30\x03\x04\x01\x31')
+        self.assertEqual(_txn_end_value(b'1', False), b'\x30\x06\x01\x01\x00\x04\x01\x31')
+
+
 class LDAPCompareTests(unittest.TestCase):
     def setUp(self):
         server = os.environ.get('TEST_SERVER', 'ldap-server')
@@ -286,6 +565,28 @@ class LDAPWhoAmITests(unittest.TestCase):
         result = ld.whoami()
         self.assertEqual('dn:' + self.env['auth_user'], result)
 
+    def test_whoami_reconnect(self):
+        class CountingLDAP(LDAP):
+            reconnects = 0
+
+            def reconnect(self, next_uri=False):
+                self.reconnects += 1
+                super().reconnect(next_uri)
+
+        ld = CountingLDAP(self.env['uri_389'], retry=RetryPolicy(backoff=0.01))
+        ld.set_option(LDAP_OPT_SIZELIMIT, 10)
+        ld.set_option(LDAP_OPT_SIZELIMIT, 20)
+        ld.bind(self.env['auth_user'], self.env['auth_pw'])
+        # Connection is lost mid-session, so whoami() fails with LDAPServerDown once
+        sock = socket.socket(fileno=ld.get_option(LDAP_OPT_DESC))
+        sock.shutdown(socket.SHUT_RDWR)
+        sock.detach()
+        result = ld.whoami()
+        self.assertEqual(ld.reconnects, 1)
+        # bind() and options are replayed on new session
+        self.assertEqual('dn:' + self.env['auth_user'], result)
+        self.assertEqual(ld.get_option(LDAP_OPT_SIZELIMIT), 20)
+
 
 class LDAPPasswdTests(unittest.TestCase):
     def setUp(self):
@@ -318,3 +619,12 @@ class LDAPTlsTests(unittest.TestCase):
         ld.set_option(LDAP_OPT_X_TLS_CACERTFILE, str(cacert_file), is_global=True)
         ld.start_tls()
         ld.bind(self.env['auth_user'], self.env['auth_pw'])
+
+    def test_tls_context(self):
+        ctx = TLSContext([(LDAP_OPT_X_TLS_CACERTFILE, str(cacert_file))])
+        for _ in range(3):
+            ld = LDAP(self.env['uri_389'], start_tls=True, tls_context=ctx)
+            ld.bind(self.env['auth_user'], self.env['auth_pw'])
+            ld.unbind()
+        ld = LDAP(self.env['uri_389'], tls_context=ctx)
+        self.assertIsNotNone(ld.get_option(LDAP_OPT_X_TLS_CTX))
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+
+import unittest
+
+from libldap.filter import (
+        And,
+        Equal,
+        GreaterOrEqual,
+        Not,
+        Or,
+        Param,
+        Present,
+        Substring,
+        compile_filter,
+        escape_filter_value,
+        filter_fingerprint,
+        normalize_value,
+        parse_filter,
+)
+from libldap.exceptions import LDAPFilterError
+
+
+class EscapeFilterValueTests(unittest.TestCase):
+    def test_escape_str(self):
+        self.assertEqual(escape_filter_value('a*(b)\\c\x00'), 'a\\2a\\28b\\29\\5cc\\00')
+
+    def test_escape_bytes(self):
+        self.assertEqual(escape_filter_value(b'a*\xff'), 'a\\2a\\ff')
+
+
+class FilterBuilderTests(unittest.TestCase):
+    def test_render(self):
+        f = And(Equal('objectClass', 'person'),
+                Or(Equal('uid', 'a)(uid=*'), Substring('cn', 'ab', ['c'], 'd')),
+                Not(Present('mail')),
+                GreaterOrEqual('uidNumber', 1000))
+        self.assertEqual(str(f), '(&(objectClass=person)(|(uid=a\\29\\28uid=\\2a)(cn=ab*c*d))'
+                                 '(!(mail=*))(uidNumber>=1000))')
+
+    def test_operators(self):
+        f = (Equal('uid', 'a') | Equal('uid', 'b')) & ~Present('mail')
+        self.assertEqual(str(f), '(&(|(uid=a)(uid=b))(!(mail=*)))')
+
+    def test_compile_params(self):
+        template = And(Equal('objectClass', 'person'), Equal('uid', Param('uid'))).compile()
+        self.assertEqual(template.params, ('uid',))
+        self.assertEqual(template(uid='x*'), '(&(objectClass=person)(uid=x\\2a))')
+        with self.assertRaises(ValueError):
+            template()
+
+    def test_compile_filter(self):
+        template = compile_filter('(&(cn={cn})(sn={{x}}))')
+        self.assertIs(template, compile_filter('(&(cn={cn})(sn={{x}}))'))
+        self.assertEqual(template(cn='(a)'), '(&(cn=\\28a\\29)(sn={x}))')
+
+
+class FilterMatchTests(unittest.TestCase):
+    def setUp(self):
+        self.entry = {
+            'objectClass': [b'top', b'Person'],
+            'UID': [b'USER1'],
+            'uidNumber': [b'1001'],
+            'cn': [b'A*B (c)'],
+            'sn': ['\u30e6\u30fc\u30b6\u30fc'.encode('utf-8')],
+            'seeAlso': [b'uid=User2,ou=Users,dc=example,dc=com'],
+        }
+
+    def test_parse(self):
+        text = '(&(objectClass=person)(|(cn=a\\2a*)(!(mail=*)))(uidNumber>=1000))'
+        self.assertEqual(str(parse_filter(text)), text)
+        self.assertEqual(str(parse_filter('cn=auth')), '(cn=auth)')
+
+    def test_parse_error(self):
+        for text in ('(cn=a', '(&)', '(cn=a))', '(cn=\\zz)', '(!(a=b)(c=d))'):
+            with self.assertRaises(LDAPFilterError):
+                parse_filter(text)
+
+    def test_fingerprint(self):
+        for text, expected in (
+                ('(&(uid=user1)(objectClass=person))', '(&(objectclass=?)(uid=?))'),
+                ('(&(objectClass=person)(UID=user2))', '(&(objectclass=?)(uid=?))'),
+                ('(|(uid=a)(uid=b)(uid=c))', '(|(uid=?))'),
+                ('(cn=a*b*c)', '(cn=?*?*?)'),
+                ('(cn=*b*)', '(cn=*?*)'),
+                ('(!(mail=*))', '(!(mail=*))'),
+                ('(uidNumber>=1000)', '(uidnumber>=?)'),
+                ('(cn:dn:=auth)', '(cn:dn:=?)'),
+        ):
+            self.assertEqual(filter_fingerprint(text), expected, text)
+        self.assertEqual(filter_fingerprint(Equal('uid', 'a') & Present('mail')), '(&(mail=*)(uid=?))')
+
+    def test_match(self):
+        for text, expected in (
+                ('(objectClass=PERSON)', True),
+                ('(uid=user1)', True),
+                ('(uid=user2)', False),
+                ('(mail=*)', False),
+                ('(!(mail=*))', True),
+                ('(uidNumber>=999)', True),
+                ('(uidNumber<=999)', False),
+                ('(cn=a\\2ab*\\28c*)', True),
+                ('(cn=*b*c*b*)', False),
+                ('(sn=\u30e6*)', True),
+                ('(&(objectClass=person)(|(uid=nobody)(cn=*)))', True),
+                ('(seeAlso=uid=user2, ou=users, dc=example, dc=com)', True),
+        ):
+            self.assertEqual(parse_filter(text).match(self.entry), expected, text)
+
+    def test_normalize_value(self):
+        self.assertEqual(normalize_value(b'USER1'), 'user1')
+        self.assertEqual(normalize_value('uid=A, dc=X'), 'uid=a, dc=x')
+        self.assertEqual(normalize_value(b'uid=A, dc=X', 'Member'), 'uid=a,dc=x')
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+
+import unittest
+
+from libldap.core import _DictEntry, _LookupResult
+from libldap.group import GroupResolver
+
+GROUPS = {
+    'cn=a,dc=example,dc=com': ['cn=b,dc=example,dc=com', 'uid=user1,dc=example,dc=com'],
+    'cn=b,dc=example,dc=com': ['cn=c,dc=example,dc=com', 'uid=user2,dc=example,dc=com'],
+    'cn=c,dc=example,dc=com': ['cn=a,dc=example,dc=com', 'uid=user3,dc=example,dc=com'],
+}
+
+
+class _LDAP(object):
+    """LDAP stub which serves GROUPS"""
+
+    def __init__(self):
+        self.batches = []
+        self.attributes = set()
+
+    def lookup_many(self, attribute, values, base, attributes=None, chunk=100):
+        self.attributes.add(attribute)
+        self.batches.append(list(values))
+        found = _LookupResult()
+        for dn in values:
+            found[dn] = _DictEntry(dn, [('member', [x.encode('utf-8') for x in GROUPS.get(dn.lower(), [])])])
+        return found
+
+    def paged_search(self, base, scope, filter, attributes=None):
+        return [_DictEntry(dn, [('member', [x.encode('utf-8') for x in members])])
+                for dn, members in GROUPS.items()]
+
+
+class GroupResolverTests(unittest.TestCase):
+    def test_members(self):
+        ld = _LDAP()
+        resolver = GroupResolver(ld, 'dc=example,dc=com')
+        self.assertTrue(resolver.is_member('UID=user3,dc=example,dc=com', 'cn=a,dc=example,dc=com'))
+        self.assertEqual(len(resolver.members('cn=a,dc=example,dc=com')), 5)
+        self.assertEqual(resolver.cycles, set(['cn=a,dc=example,dc=com']))
+        # One batch per level, and memoized results are used afterwards
+        self.assertEqual(len(ld.batches), 4)
+        self.assertEqual(ld.attributes, set(['entryDN']))
+        self.assertFalse(resolver.is_member('uid=user4,dc=example,dc=com', 'cn=a,dc=example,dc=com'))
+        self.assertEqual(len(ld.batches), 4)
+
+    def test_invalidate(self):
+        ld = _LDAP()
+        resolver = GroupResolver(ld, 'dc=example,dc=com')
+        resolver.members('cn=b,dc=example,dc=com')
+        batches = len(ld.batches)
+        resolver.invalidate('cn=c,dc=example,dc=com')
+        resolver.members('cn=b,dc=example,dc=com')
+        self.assertEqual(len(ld.batches), batches + 1)
+
+    def test_preload(self):
+        ld = _LDAP()
+        resolver = GroupResolver(ld, 'dc=example,dc=com')
+        self.assertEqual(resolver.preload(), 3)
+        self.assertTrue(resolver.is_member('uid=user1,dc=example,dc=com', 'cn=c,dc=example,dc=com'))
+        self.assertEqual(ld.batches, [])
+
+    def test_preload_invalidate(self):
+        ld = _LDAP()
+        resolver = GroupResolver(ld, 'dc=example,dc=com')
+        resolver.preload()
+        self.assertTrue(resolver.is_member('uid=user3,dc=example,dc=com', 'cn=b,dc=example,dc=com'))
+        resolver.invalidate('cn=c,dc=example,dc=com')
+        # Invalidated group is fetched again even while preloaded groups are valid
+        self.assertTrue(resolver.is_member('uid=user3,dc=example,dc=com', 'cn=b,dc=example,dc=com'))
+        self.assertEqual(ld.batches, [['cn=c,dc=example,dc=com']])
+        self.assertTrue(resolver.is_member('uid=user3,dc=example,dc=com', 'cn=b,dc=example,dc=com'))
+        self.assertEqual(len(ld.batches), 1)
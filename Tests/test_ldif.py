@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+
+import os
+import tempfile
+import unittest
+from io import BytesIO
+
+from libldap.constants import LDAP_MOD_ADD, LDAP_MOD_DELETE
+from libldap.core import _DictEntry
+from libldap.ldif import LDIFImporter, LDIFReader, LDIFWriter
+
+LDIF = b'''version: 1
+
+# comment
+dn: ou=Users,dc=example,dc=com
+objectClass: organizationalUnit
+ou: Users
+
+dn: uid=user1,ou=Users,dc=example,dc=com
+changetype: add
+objectClass: person
+sn:: 44Om44O844K2
+ 44O8
+cn: us
+ er1
+
+dn: uid=user1,ou=Users,dc=example,dc=com
+changetype: modify
+add: mail
+mail: user1@example.com
+-
+delete: description
+-
+
+dn: uid=user1,ou=Users,dc=example,dc=com
+changetype: modrdn
+newrdn: uid=user2
+deleteoldrdn: 1
+
+dn: uid=user2,ou=Users,dc=example,dc=com
+changetype: delete
+'''
+
+
+class LDIFWriterTests(unittest.TestCase):
+    def test_write(self):
+        output = BytesIO()
+        writer = LDIFWriter(output, cols=20)
+        writer.write(_DictEntry('cn=test,dc=example,dc=com', [
+            ('cn', [b'test']),
+            ('sn', ['ユーザー']),
+            ('description', [b' leading space', b'abcdefghijklmnopqrstuvwxyz']),
+        ]))
+        self.assertEqual(output.getvalue(), (
+            b'version: 1\n'
+            b'\n'
+            b'dn: cn=test,dc=examp\n'
+            b' le,dc=com\n'
+            b'cn: test\n'
+            b'sn:: 44Om44O844K244O\n'
+            b' 8\n'
+            b'description:: IGxlYW\n'
+            b' Rpbmcgc3BhY2U=\n'
+            b'description: abcdefg\n'
+            b' hijklmnopqrstuvwxyz\n'
+            b'\n'
+        ))
+        self.assertEqual(writer.entries, 1)
+        self.assertEqual(writer.bytes, len(output.getvalue()))
+
+
+class LDIFReaderTests(unittest.TestCase):
+    def test_read(self):
+        records = list(LDIFReader(BytesIO(LDIF)))
+        self.assertEqual([(x.index, x.changetype) for x in records],
+                         [(0, 'add'), (1, 'add'), (2, 'modify'), (3, 'modrdn'), (4, 'delete')])
+        self.assertEqual(records[0].changes, [('objectClass', [b'organizationalUnit']), ('ou', [b'Users'])])
+        self.assertEqual(records[1].changes[1:], [('sn', ['ユーザー'.encode('utf-8')]), ('cn', [b'user1'])])
+        self.assertEqual(records[2].changes, [('mail', [b'user1@example.com'], LDAP_MOD_ADD),
+                                              ('description', [], LDAP_MOD_DELETE)])
+        self.assertEqual(records[3].changes, ('uid=user2', True, None))
+
+    def test_round_trip(self):
+        output = BytesIO()
+        entry = _DictEntry('cn=test,dc=example,dc=com', [('cn', [b'test']), ('description', [b' x' * 100])])
+        LDIFWriter(output).write(entry)
+        record, = LDIFReader(BytesIO(output.getvalue()))
+        self.assertEqual(record.dn, entry.dn)
+        self.assertEqual(record.changes, list(entry.items()))
+
+
+class _LDAP(object):
+    """LDAP stub which records operations"""
+
+    def __init__(self, log):
+        self.log = log
+        self.sent = []
+
+    def _send(self, *args):
+        self.log.append(args)
+        self.sent.append(args)
+        return len(self.sent)
+
+    def add(self, dn, attributes, **kwargs):
+        return self._send('add', dn)
+
+    def modify(self, dn, changes, **kwargs):
+        return self._send('modify', dn)
+
+    def rename(self, dn, newrdn, newparent, deleteoldrdn, **kwargs):
+        return self._send('rename', dn)
+
+    def delete(self, dn, **kwargs):
+        return self._send('delete', dn)
+
+    def result(self, msgid, **kwargs):
+        if self.sent[msgid - 1][0] == 'modify':
+            return {'return_code': 32, 'message': 'No such object'}
+        return {'return_code': 0, 'message': ''}
+
+
+class _CompletingLDAP(_LDAP):
+    """LDAP stub which also records completions"""
+
+    def result(self, msgid, **kwargs):
+        self.log.append(('result',) + self.sent[msgid - 1])
+        return {'return_code': 0, 'message': ''}
+
+
+RENAME_LDIF = b'''dn: uid=a,ou=Users,dc=example,dc=com
+changetype: modrdn
+newrdn: uid=b
+deleteoldrdn: 1
+
+dn: ou=Users,dc=example,dc=com
+changetype: moddn
+newrdn: ou=People
+deleteoldrdn: 1
+newsuperior: o=example,dc=com
+
+dn: uid=b,ou=People,o=example,dc=com
+changetype: delete
+
+dn: uid=c,ou=Users,dc=example,dc=com
+changetype: delete
+'''
+
+
+class LDIFImporterTests(unittest.TestCase):
+    def test_import(self):
+        log = []
+        importer = LDIFImporter([_LDAP(log), _LDAP(log)], window=2)
+        importer.run(LDIFReader(BytesIO(LDIF)))
+        self.assertEqual([x[0] for x in log], ['add', 'add', 'modify', 'rename', 'delete'])
+        self.assertEqual(importer.completed, 4)
+        self.assertEqual([record.index for record, error in importer.errors], [2])
+
+    def test_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, 'checkpoint')
+            with open(checkpoint, 'w') as f:
+                f.write('2\n')
+            log = []
+            importer = LDIFImporter([_LDAP(log)], checkpoint=checkpoint)
+            importer.run(LDIFReader(BytesIO(LDIF)))
+            self.assertEqual(importer.skipped, 3)
+            self.assertEqual([x[0] for x in log], ['rename', 'delete'])
+            with open(checkpoint) as f:
+                self.assertEqual(f.read(), '4\n')
+
+    def test_rename_order(self):
+        log = []
+        importer = LDIFImporter([_CompletingLDAP(log), _CompletingLDAP(log), _CompletingLDAP(log)])
+        importer.run(LDIFReader(BytesIO(RENAME_LDIF)))
+        self.assertEqual(importer.completed, 4)
+        # Records on new DN and in old or new subtree wait for preceding rename
+        self.assertEqual(log, [
+            ('rename', 'uid=a,ou=Users,dc=example,dc=com'),
+            ('result', 'rename', 'uid=a,ou=Users,dc=example,dc=com'),
+            ('rename', 'ou=Users,dc=example,dc=com'),
+            ('result', 'rename', 'ou=Users,dc=example,dc=com'),
+            ('delete', 'uid=b,ou=People,o=example,dc=com'),
+            ('delete', 'uid=c,ou=Users,dc=example,dc=com'),
+            ('result', 'delete', 'uid=c,ou=Users,dc=example,dc=com'),
+            ('result', 'delete', 'uid=b,ou=People,o=example,dc=com'),
+        ])
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+
+import unittest
+
+from libldap.core import _DictEntry
+from libldap.exceptions import LDAPNoSuchObject
+from libldap.metrics import Metrics
+
+
+class _LDAP(object):
+    """LDAP stub whose search() returns entries"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.in_flight = None
+
+    def search(self, base):
+        self.in_flight = dict(self.metrics.in_flight)
+        if base == 'dc=missing':
+            raise LDAPNoSuchObject('No such object', 0x20)
+        return [_DictEntry('cn=%d,%s' % (i, base), [('cn', [str(i).encode('utf-8')])])
+                for i in range(3)]
+
+
+class MetricsTests(unittest.TestCase):
+    def test_measure(self):
+        metrics = Metrics()
+        ld = _LDAP(metrics)
+        metrics.measure('search', _LDAP.search, ld, ('dc=example',), {})
+        self.assertEqual(ld.in_flight, {'search': 1})
+        with self.assertRaises(LDAPNoSuchObject):
+            metrics.measure('search', _LDAP.search, ld, ('dc=missing',), {})
+        self.assertEqual(metrics.operations, {'search': 2})
+        self.assertEqual(metrics.errors, {('search', 'LDAPNoSuchObject'): 1})
+        self.assertEqual(metrics.in_flight, {'search': 0})
+        self.assertEqual(metrics.latency['search'].count, 2)
+        self.assertEqual(metrics.entries['search'].sum, 3)
+        self.assertEqual(metrics.bytes['search'], 3 * len('cn1'))
+
+    def test_prometheus(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.observe('bind', 0.05)
+        metrics.observe('bind', 0.5, error='LDAPInvalidCredentials')
+        metrics.observe('search', 2.0, entries=(10, 100))
+        text = metrics.prometheus()
+        self.assertIn('libldap_operations_total{operation="bind"} 2\n', text)
+        self.assertIn('libldap_errors_total{operation="bind",error="LDAPInvalidCredentials"} 1\n', text)
+        self.assertIn('libldap_operation_duration_seconds_bucket{operation="bind",le="0.1"} 1\n', text)
+        self.assertIn('libldap_operation_duration_seconds_bucket{operation="bind",le="1.0"} 2\n', text)
+        self.assertIn('libldap_operation_duration_seconds_bucket{operation="search",le="+Inf"} 1\n', text)
+        self.assertIn('libldap_entries_bucket{operation="search",le="10.0"} 1\n', text)
+        self.assertIn('libldap_entry_bytes_total{operation="search"} 100\n', text)
+        self.assertIn('# TYPE libldap_in_flight gauge\n', text)
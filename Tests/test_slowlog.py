@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+
+import json
+import unittest
+
+from libldap.exceptions import LDAPSizelimitExceeded
+from libldap.slowlog import SlowLog
+from libldap.tracing import TraceContext
+
+
+def _search(slowlog, filter, entries=0):
+    context = TraceContext('search', {'base': 'dc=example,dc=com', 'scope': 2, 'filter': filter})
+    slowlog.start(context)
+    context.entries = entries
+    return context
+
+
+class SlowLogTests(unittest.TestCase):
+    def test_threshold(self):
+        slowlog = SlowLog(latency=None, entries=10, log=False)
+        slowlog.last_result(_search(slowlog, '(uid=user1)', entries=1))
+        self.assertEqual(len(slowlog.records), 0)
+        slowlog.last_result(_search(slowlog, '(uid=user1)', entries=10))
+        record = slowlog.records[0]
+        self.assertEqual(record['fingerprint'], '(uid=?)')
+        self.assertEqual(record['base'], 'dc=example,dc=com')
+        self.assertEqual(record['scope'], 2)
+        self.assertIn('test_slowlog.py', record['call_site'])
+        self.assertIsNone(record['error'])
+
+        slowlog = SlowLog(latency=0, entries=None, log=False)
+        context = _search(slowlog, '(uid=user1)')
+        slowlog.error(context, LDAPSizelimitExceeded('Size limit exceeded', 4))
+        self.assertEqual(slowlog.records[0]['error'], 'LDAPSizelimitExceeded')
+
+    def test_top(self):
+        slowlog = SlowLog(latency=0, log=False)
+        for filter in ('(uid=user1)', '(uid=user2)', '(&(cn=*a*)(objectClass=person))'):
+            slowlog.last_result(_search(slowlog, filter, entries=5))
+        top = slowlog.top(1, key='count')
+        self.assertEqual(len(top), 1)
+        self.assertEqual(top[0]['fingerprint'], '(uid=?)')
+        self.assertEqual(top[0]['count'], 2)
+        self.assertEqual(top[0]['entries'], 10)
+        self.assertEqual(top[0]['bases'], ['dc=example,dc=com'])
+        json.dumps(slowlog.top())
+        slowlog.reset()
+        self.assertEqual(slowlog.top(), [])
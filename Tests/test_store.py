@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+
+import unittest
+
+from libldap.core import _DictEntry
+from libldap.constants import LDAP_MOD_ADD, LDAP_MOD_DELETE, LDAP_SCOPE_ONE
+from libldap.store import EntryStore
+
+
+def _entry(dn, **attributes):
+    return _DictEntry(dn, [(key, [x.encode('utf-8') for x in values]) for key, values in attributes.items()])
+
+
+class EntryStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.store = EntryStore(indexes=['uid', 'member'], entries=[
+            _entry('dc=example,dc=com', objectClass=['dcObject']),
+            _entry('ou=Users,dc=example,dc=com', objectClass=['organizationalUnit']),
+            _entry('uid=user1,ou=Users,dc=example,dc=com', objectClass=['person'], uid=['user1']),
+            _entry('uid=user2,ou=Users,dc=example,dc=com', objectClass=['person'], uid=['User2']),
+            _entry('cn=group1,dc=example,dc=com', objectClass=['groupOfNames'],
+                   member=['uid=user1,ou=Users,dc=example,dc=com']),
+        ])
+
+    def test_find(self):
+        self.assertEqual([x.dn for x in self.store.find('uid', 'USER2')],
+                         ['uid=user2,ou=Users,dc=example,dc=com'])
+        self.assertEqual(len(self.store.find('objectClass', 'person')), 2)
+
+    def test_dn_index(self):
+        self.assertIn('UID=user1, ou=users,dc=example,dc=com', self.store)
+        self.assertEqual(self.store.parent('uid=user1,ou=Users,dc=example,dc=com').dn,
+                         'ou=Users,dc=example,dc=com')
+        self.assertEqual(len(self.store.children('dc=example,dc=com')), 2)
+        self.assertEqual(len(list(self.store.subtree('dc=example,dc=com'))), 5)
+        self.assertEqual(len(list(self.store.subtree('ou=Users,dc=example,dc=com', include_base=False))), 2)
+
+    def test_modify_delete(self):
+        self.store.modify('uid=user1,ou=Users,dc=example,dc=com', [
+            ('uid', ['user1'], LDAP_MOD_DELETE),
+            ('uid', ['user3'], LDAP_MOD_ADD),
+        ])
+        self.assertEqual(self.store.find('uid', 'user1'), [])
+        self.assertEqual(len(self.store.find('uid', 'user3')), 1)
+        self.store.delete('uid=user1,ou=Users,dc=example,dc=com')
+        self.assertEqual(self.store.find('uid', 'user3'), [])
+        self.assertEqual(len(self.store.children('ou=Users,dc=example,dc=com')), 1)
+
+    def test_search(self):
+        r = self.store.search('dc=example,dc=com', filter='(&(uid=user1)(objectClass=person))')
+        self.assertEqual([x.dn for x in r], ['uid=user1,ou=Users,dc=example,dc=com'])
+        r = self.store.search('dc=example,dc=com', LDAP_SCOPE_ONE, '(objectClass=*)')
+        self.assertEqual(len(r), 2)
+        r = self.store.search(filter='(member=uid=user1,ou=Users,dc=example,dc=com)')
+        self.assertEqual([x.dn for x in r], ['cn=group1,dc=example,dc=com'])
+
+    def test_dn_valued_attribute(self):
+        self.assertEqual([x.dn for x in self.store.find('member', 'UID=user1, ou=Users,dc=example,dc=com')],
+                         ['cn=group1,dc=example,dc=com'])
+        r = self.store.search(filter='(member=uid=user1, ou=users, dc=example, dc=com)')
+        self.assertEqual([x.dn for x in r], ['cn=group1,dc=example,dc=com'])
+        self.store.modify('cn=group1,dc=example,dc=com', [
+            ('member', ['uid=user2, ou=Users, dc=example, dc=com'], LDAP_MOD_ADD),
+            ('member', ['uid=user1,ou=users,dc=example,dc=com'], LDAP_MOD_DELETE),
+        ])
+        self.assertEqual(self.store.find('member', 'uid=user1,ou=Users,dc=example,dc=com'), [])
+        self.assertEqual(len(self.store.find('member', 'uid=user2,ou=Users,dc=example,dc=com')), 1)
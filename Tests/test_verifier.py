@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Yutaka Kamei
+
+import unittest
+
+from libldap.exceptions import LDAPServerDown, LDAPTimeout
+from libldap.verifier import BindVerifier
+
+PASSWORDS = {
+    'uid=user1,dc=example,dc=com': 'secret1',
+    'uid=user2,dc=example,dc=com': 'secret2',
+}
+
+
+class _LDAP(object):
+    """LDAP stub which answers BIND after polls"""
+
+    def __init__(self, polls=2, down=False):
+        self.polls = polls
+        self.down = down
+        self.pending = {}
+        self.requests = []
+
+    def bind(self, who, password, controls=None, async=False):
+        if self.pending:
+            raise AssertionError('BIND is pipelined on one connection')
+        if self.down:
+            self.down = False
+            raise LDAPServerDown("Can't contact LDAP server", -1)
+        self.requests.append(who)
+        msgid = len(self.requests)
+        self.pending[msgid] = [who, password, self.polls]
+        return msgid
+
+    def _poll(self, msgid, controls=None):
+        who, password, polls = self.pending[msgid]
+        if polls > 0:
+            self.pending[msgid][2] -= 1
+            return None
+        del self.pending[msgid]
+        if PASSWORDS.get(who) != password:
+            return {'return_code': 49, 'message': 'Invalid credentials',
+                    'error_message': None, 'referrals': []}
+        return {'return_code': 0, 'message': 'Success', 'error_message': None, 'referrals': [],
+                'ppolicy_msg': '', 'ppolicy_expire': -1, 'ppolicy_grace': 2}
+
+    def reconnect(self, next_uri=False):
+        self.pending.clear()
+        self.requests.append('reconnect')
+
+    def unbind(self):
+        pass
+
+
+class BindVerifierTests(unittest.TestCase):
+    def test_verify_many(self):
+        connections = [_LDAP(1), _LDAP(3)]
+        credentials = [('uid=user1,dc=example,dc=com', 'secret1'),
+                       ('uid=user2,dc=example,dc=com', 'bad'),
+                       ('uid=user2,dc=example,dc=com', 'secret2'),
+                       ('uid=user3,dc=example,dc=com', 'secret3')] * 3
+        with BindVerifier(connections) as verifier:
+            results = verifier.verify_many(credentials)
+        self.assertEqual([x['who'] for x in results], [x[0] for x in credentials])
+        self.assertEqual([x['return_code'] for x in results], [0, 49, 0, 49] * 3)
+        self.assertEqual(results[0]['ppolicy_grace'], 2)
+        # Both connections are used
+        self.assertTrue(all(x.requests for x in connections))
+
+    def test_server_down(self):
+        ld = _LDAP(down=True)
+        result = BindVerifier([ld]).verify('uid=user1,dc=example,dc=com', 'secret1')
+        self.assertEqual(result['return_code'], 0)
+        self.assertEqual(ld.requests, ['reconnect', 'uid=user1,dc=example,dc=com'])
+
+    def test_timeout(self):
+        ld = _LDAP(polls=1000000)
+        result = BindVerifier([ld], timeout=0.01).verify('uid=user1,dc=example,dc=com', 'secret1')
+        self.assertEqual(result['return_code'], -5)
+        self.assertIsInstance(result['error'], LDAPTimeout)
+        self.assertEqual(ld.requests[-1], 'reconnect')
@@ -30,14 +30,16 @@ ext_module = Extension('_libldap',
                                 'Modules/whoami.c',
                                 'Modules/passwd.c',
                                 'Modules/cancel.c',
+                                'Modules/extended.c',
                                 'Modules/start_tls.c',
+                                'Modules/tls.c',
                                 'Modules/set_option.c',
                                 'Modules/get_option.c',
                                 'Modules/controls.c',
                                 'Modules/result.c',
                                 ],
                        include_dirs=['Modules'],
-                       libraries=['ldap_r'],
+                       libraries=['ldap_r', 'ssl', 'crypto'],
                        extra_compile_args=['-g', '-O2'])
 
 setup(